@@ -0,0 +1,148 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+import psycopg
+from fastapi import Request, Response
+
+from app.core.config import CACHE_TTL, CACHE_VERSAO_TTL, CACHE_MAX_ENTRADAS
+from app.core.database import conexao
+
+
+@dataclass(frozen=True)
+class VersaoDados:
+    """ Versão da carga atual do banco (tabela carga_dados). """
+    versao: int
+    concluida_em: datetime | None
+
+
+class CacheVersionado:
+    """
+    Cache LRU em memória com TTL. Cada entrada guarda a versão dos dados
+    com que foi calculada: uma nova carga no banco invalida tudo automaticamente.
+    """
+
+    def __init__(self, ttl: float, max_entradas: int):
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        self._entradas: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def obter_ou_calcular(self, chave: str, versao: int, calcular):
+        """ `calcular` é uma função assíncrona sem argumentos, chamada só quando falta a entrada. """
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada and entrada[0] == versao and agora - entrada[1] < self.ttl:
+                self._entradas.move_to_end(chave)
+                return entrada[2]
+
+        # Calcula fora do lock: requisições concorrentes podem recalcular, mas não se bloqueiam
+        valor = await calcular()
+
+        with self._lock:
+            self._entradas[chave] = (versao, agora, valor)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+        return valor
+
+    def invalidar(self):
+        with self._lock:
+            self._entradas.clear()
+
+
+cache_estatisticas = CacheVersionado(CACHE_TTL, CACHE_MAX_ENTRADAS)
+cache_contagens = CacheVersionado(CACHE_TTL, CACHE_MAX_ENTRADAS)
+
+_versao_atual: VersaoDados | None = None
+_versao_lida_em = 0.0
+_versao_lock = threading.Lock()
+
+
+async def _ler_versao(conn) -> VersaoDados:
+    async with conn.cursor() as cur:
+        try:
+            await cur.execute("SELECT versao, concluida_em FROM carga_dados ORDER BY versao DESC LIMIT 1")
+            row = await cur.fetchone()
+            return VersaoDados(row[0], row[1]) if row else VersaoDados(0, None)
+        except psycopg.Error:
+            # Banco sem a tabela carga_dados (DDL antigo): cache vale só pelo TTL
+            await conn.rollback()
+            return VersaoDados(0, None)
+
+
+async def versao_dados(conn=None) -> VersaoDados:
+    """
+    Retorna a versão da última carga concluída. A consulta ao banco é feita
+    no máximo a cada CACHE_VERSAO_TTL segundos. Sem `conn`, uma conexão do pool
+    é emprestada só para essa leitura.
+    """
+    global _versao_atual, _versao_lida_em
+
+    with _versao_lock:
+        if _versao_atual is not None and time.monotonic() - _versao_lida_em < CACHE_VERSAO_TTL:
+            return _versao_atual
+
+    if conn is None:
+        async with conexao() as conn:
+            versao = await _ler_versao(conn)
+    else:
+        versao = await _ler_versao(conn)
+
+    with _versao_lock:
+        if _versao_atual is not None and _versao_atual.versao != versao.versao:
+            cache_estatisticas.invalidar()
+            cache_contagens.invalidar()
+        _versao_atual = versao
+        _versao_lida_em = time.monotonic()
+
+    return versao
+
+
+def cabecalhos_cache(chave: str, versao: VersaoDados) -> dict:
+    """
+    ETag (versão dos dados + recurso) e Last-Modified (fim da carga) para revalidação.
+    Sem versão conhecida (carga_dados vazia ou ausente) não há validador: o ETag
+    ficaria fixo em W/"0-…" e o cliente receberia 304 para dados já recarregados.
+    """
+    if versao.versao == 0:
+        return {"Cache-Control": "no-store"}
+
+    digest = hashlib.sha1(chave.encode()).hexdigest()[:12]
+    cabecalhos = {
+        "ETag": f'W/"{versao.versao}-{digest}"',
+        "Cache-Control": "public, no-cache",
+    }
+    if versao.concluida_em is not None:
+        cabecalhos["Last-Modified"] = format_datetime(versao.concluida_em.astimezone(timezone.utc), usegmt=True)
+    return cabecalhos
+
+
+def resposta_nao_modificada(request: Request, cabecalhos: dict) -> Response | None:
+    """ Retorna um 304 se o cliente já tem a versão atual (If-None-Match / If-Modified-Since). """
+    if "ETag" not in cabecalhos:
+        return None
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        etags = [e.strip() for e in if_none_match.split(",")]
+        if cabecalhos["ETag"] in etags or "*" in etags:
+            return Response(status_code=304, headers=cabecalhos)
+        return None
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and "Last-Modified" in cabecalhos:
+        try:
+            desde = parsedate_to_datetime(if_modified_since)
+            if parsedate_to_datetime(cabecalhos["Last-Modified"]) <= desde:
+                return Response(status_code=304, headers=cabecalhos)
+        except (TypeError, ValueError):
+            pass
+
+    return None
@@ -10,3 +10,15 @@ DB_PORT = os.environ.get("POSTGRES_PORT", "5432")
 DB_NAME = os.environ.get("POSTGRES_DB", "ans_db")
 DB_USER = os.environ.get("POSTGRES_USER", "ans_user")
 DB_PASSWORD = os.environ.get("POSTGRES_PASSWORD", "ans_pass")
+DB_SSLMODE = os.environ.get("POSTGRES_SSLMODE", "require")
+
+# Pool de conexões (ver app/core/database.py)
+DB_POOL_MIN = int(os.environ.get("POSTGRES_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.environ.get("POSTGRES_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("POSTGRES_POOL_TIMEOUT", "30"))        # espera máxima por uma conexão livre (s)
+DB_CONNECT_TIMEOUT = int(os.environ.get("POSTGRES_CONNECT_TIMEOUT", "10"))    # timeout do handshake com o banco (s)
+
+# Cache de respostas da API (ver app/core/cache.py)
+CACHE_TTL = float(os.environ.get("API_CACHE_TTL", "300"))                  # validade de um resultado em cache (s)
+CACHE_VERSAO_TTL = float(os.environ.get("API_CACHE_VERSAO_TTL", "10"))     # intervalo entre consultas à versão dos dados (s)
+CACHE_MAX_ENTRADAS = int(os.environ.get("API_CACHE_MAX_ENTRADAS", "2048"))
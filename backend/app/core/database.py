@@ -1,18 +1,161 @@
-import psycopg2
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+from psycopg_pool import AsyncConnectionPool, PoolTimeout as PoolTimeoutPsycopg
 from app.core.config import (
-    DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD
+    DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD, DB_SSLMODE,
+    DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT, DB_CONNECT_TIMEOUT
 )
 
-def get_connection():
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        port=DB_PORT,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASSWORD,
-        sslmode='require'
-    )
+
+class PoolTimeout(Exception):
+    """ Nenhuma conexão ficou livre dentro do tempo limite do pool. """
+
+
+class ConnectionPool:
+    """
+    Pool de conexões assíncronas (psycopg 3) compartilhado pelo processo.
+    Espera (até `timeout`) por uma conexão livre em vez de falhar imediatamente,
+    e mantém estatísticas de uso. As rotas rodam no event loop: enquanto uma
+    consulta espera o banco, o worker atende outras requisições.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, timeout: float, **conn_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+
+        # autocommit: as rotas só leem, sem transações abertas entre as consultas
+        self._pool = AsyncConnectionPool(
+            min_size=minconn,
+            max_size=maxconn,
+            timeout=timeout,
+            kwargs={**conn_kwargs, "autocommit": True},
+            open=False,
+        )
+
+        self._em_uso = 0
+        self._emprestimos = 0
+        self._timeouts = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+
+    async def open(self):
+        await self._pool.open()
+
+    async def getconn(self):
+        inicio = time.perf_counter()
+        try:
+            conn = await self._pool.getconn()
+        except PoolTimeoutPsycopg:
+            self._timeouts += 1
+            raise PoolTimeout(f"Nenhuma conexão livre em {self.timeout}s")
+
+        espera = time.perf_counter() - inicio
+        self._em_uso += 1
+        self._emprestimos += 1
+        self._espera_total += espera
+        self._espera_max = max(self._espera_max, espera)
+
+        return conn
+
+    async def putconn(self, conn):
+        try:
+            # Conexões quebradas são descartadas pelo próprio pool
+            await self._pool.putconn(conn)
+        finally:
+            self._em_uso -= 1
+
+    async def closeall(self):
+        await self._pool.close()
+
+    def stats(self) -> dict:
+        emprestimos = self._emprestimos
+        return {
+            "min": self.minconn,
+            "max": self.maxconn,
+            "em_uso": self._em_uso,
+            "ociosas": self._pool.get_stats().get("pool_available", 0),
+            "emprestimos": emprestimos,
+            "timeouts": self._timeouts,
+            "espera_media_ms": round(self._espera_total / emprestimos * 1000, 3) if emprestimos else 0.0,
+            "espera_max_ms": round(self._espera_max * 1000, 3),
+        }
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = asyncio.Lock()
+
+
+async def init_pool() -> ConnectionPool:
+    """ Cria o pool do processo (idempotente). Chamado no startup da aplicação. """
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            pool = ConnectionPool(
+                DB_POOL_MIN,
+                DB_POOL_MAX,
+                DB_POOL_TIMEOUT,
+                host=DB_HOST,
+                port=DB_PORT,
+                dbname=DB_NAME,
+                user=DB_USER,
+                password=DB_PASSWORD,
+                sslmode=DB_SSLMODE,
+                connect_timeout=DB_CONNECT_TIMEOUT,
+            )
+            await pool.open()
+            _pool = pool
+        return _pool
+
+
+async def close_pool():
+    """ Fecha todas as conexões do pool. Chamado no shutdown da aplicação. """
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            await _pool.closeall()
+            _pool = None
+
+
+def pool_stats() -> dict:
+    return _pool.stats() if _pool is not None else {}
+
+
+async def _emprestar(pool: ConnectionPool):
+    try:
+        return await pool.getconn()
+    except PoolTimeout:
+        raise HTTPException(503, "Banco de dados sobrecarregado, tente novamente")
+
+
+@asynccontextmanager
+async def conexao():
+    """ Empresta uma conexão do pool só pelo tempo do bloco `async with`. """
+    pool = _pool or await init_pool()
+    conn = await _emprestar(pool)
     try:
         yield conn
     finally:
-        conn.close()
+        await pool.putconn(conn)
+
+
+async def get_connection():
+    async with conexao() as conn:
+        yield conn
+
+
+async def buscar_todos(sql: str, params=None) -> list[tuple]:
+    """
+    Executa uma consulta numa conexão própria do pool e retorna todas as linhas.
+    Uma conexão só executa uma consulta por vez: consultas independentes de uma mesma
+    rota usam esta função com asyncio.gather para rodar em paralelo. Rotas que fazem
+    isso não devem segurar também uma conexão de Depends(get_connection): cada requisição
+    ocuparia uma conexão a mais do pool enquanto espera as outras.
+    """
+    async with conexao() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(sql, params)
+            return await cur.fetchall()
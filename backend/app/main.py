@@ -1,11 +1,24 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core.database import init_pool, close_pool, pool_stats
 from app.routers import operadoras, estatisticas
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pool de conexões criado no startup e drenado no shutdown
+    await init_pool()
+    yield
+    await close_pool()
+
+
 app = FastAPI(
     title="API Operadoras ANS",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -18,3 +31,9 @@ app.add_middleware(
 
 app.include_router(operadoras.router)
 app.include_router(estatisticas.router)
+
+
+@app.get("/api/health/pool", tags=["Saúde"])
+def estatisticas_pool():
+    """ Estatísticas do pool de conexões (em uso, ociosas, tempo de espera). """
+    return pool_stats()
@@ -18,11 +18,24 @@ class Despesa(BaseModel):
     valor: float
 
 
+# Total da operadora em um trimestre (mv_despesa_operadora_trimestre), não uma despesa individual
+class DespesaTrimestral(BaseModel):
+    ano: int
+    trimestre: int
+    total_despesas: float
+
+
+class LoteOperadorasRequest(BaseModel):
+    cnpjs: List[str] = []
+    registros_ans: List[int] = []
+
+
 class PaginatedOperadoras(BaseModel):
     data: List[Operadora]
-    total: int
-    page: int
     limit: int
+    next_cursor: Optional[str] = None   # None = última página
+    total: Optional[int] = None         # só preenchido com incluir_total=true (ou page)
+    page: Optional[int] = None          # eco do parâmetro obsoleto `page`
 
 
 class TopOperadora(BaseModel):
@@ -56,4 +69,14 @@ class EstatisticasGlobais(BaseModel):
     total_despesas: float
     media_despesas: float
     top_5_operadoras: List[TopOperadora]
-    despesas_por_uf: List[DespesaPorUF]
\ No newline at end of file
+    despesas_por_uf: List[DespesaPorUF]
+
+class OperadoraLote(BaseModel):
+    operadora: Operadora
+    estatisticas: EstatisticaOperadora
+    despesas: List[DespesaTrimestral]   # em ordem cronológica
+
+
+class LoteOperadoras(BaseModel):
+    data: List[OperadoraLote]
+    nao_encontrados: List[str]          # CNPJs / registros ANS pedidos sem operadora
@@ -1,32 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.core.database import get_connection
+import asyncio
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from app.core.cache import cache_estatisticas, versao_dados, cabecalhos_cache, resposta_nao_modificada
+from app.core.database import buscar_todos
 from app.utils.cnpj import normalize_cnpj
 from app.models.schemas import EstatisticasGlobais, EstatisticaOperadora, TopOperadora, DespesaPorUF
 
 router = APIRouter(prefix="/api/estatisticas", tags=["Estatísticas"])
 
 @router.get("", response_model=EstatisticasGlobais)
-def estatisticas_globais(conn=Depends(get_connection)):
-    cur = conn.cursor()
-
-    # 1. Busca Total e Média Geral
-    cur.execute("""
-        SELECT COALESCE(SUM(total_despesas),0),
-               COALESCE(AVG(media_trimestral),0)
-        FROM despesa_agregada
-    """)
-    total, media = cur.fetchone()
-
-    # 2. Busca as Top 5 Operadoras
-    cur.execute("""
-        SELECT o.id_operadora, o.cnpj, o.razao_social,
-               SUM(da.total_despesas)
-        FROM despesa_agregada da
-        JOIN operadora o ON o.id_operadora = da.id_operadora
-        GROUP BY o.id_operadora, o.cnpj, o.razao_social
-        ORDER BY SUM(da.total_despesas) DESC
-        LIMIT 5
-    """)
+async def estatisticas_globais(request: Request, response: Response):
+    # Sem conexão presa à requisição: a versão e cada consulta emprestam a sua do pool
+    # só enquanto executam (no máximo 3 ao mesmo tempo, no cálculo)
+    versao = await versao_dados()
+    cabecalhos = cabecalhos_cache("globais", versao)
+
+    nao_modificada = resposta_nao_modificada(request, cabecalhos)
+    if nao_modificada:
+        return nao_modificada
+
+    response.headers.update(cabecalhos)
+    return await cache_estatisticas.obter_ou_calcular(
+        "globais", versao.versao, _calcular_estatisticas_globais
+    )
+
+async def _calcular_estatisticas_globais() -> EstatisticasGlobais:
+    # Tudo vem dos resumos materializados (sql/ddl/08_create_materialized_views.sql),
+    # atualizados a cada carga: nenhuma consulta agrega despesa/despesa_agregada aqui.
+    # As três consultas são independentes: cada uma usa sua conexão e rodam em paralelo.
+    totais, top_5_rows, uf_rows = await asyncio.gather(
+        # 1. Busca Total e Média Geral (linha única)
+        buscar_todos("""
+            SELECT total_despesas, media_despesas
+            FROM mv_resumo_global
+        """),
+        # 2. Busca as Top 5 Operadoras (início do índice por total)
+        buscar_todos("""
+            SELECT o.id_operadora, o.cnpj, o.razao_social, r.total_despesas
+            FROM mv_resumo_operadora r
+            JOIN operadora o ON o.id_operadora = r.id_operadora
+            ORDER BY r.total_despesas DESC
+            LIMIT 5
+        """),
+        # 3. Distribuição de Despesas por UF (Para o Gráfico): UFs x trimestres, poucas linhas
+        buscar_todos("""
+            SELECT uf, SUM(total_despesas)
+            FROM mv_despesa_uf_trimestre
+            GROUP BY uf
+            ORDER BY SUM(total_despesas) DESC
+        """),
+    )
+
+    total, media = totais[0] if totais else (0, 0)
 
     top_5 = [
         TopOperadora(
@@ -34,25 +59,14 @@ def estatisticas_globais(conn=Depends(get_connection)):
             cnpj=r[1],
             razao_social=r[2],
             total_despesas=float(r[3])
-        ) for r in cur.fetchall()
+        ) for r in top_5_rows
     ]
 
-    # 3. NOVA QUERY: Distribuição de Despesas por UF (Para o Gráfico)
-    cur.execute("""
-        SELECT o.uf, SUM(da.total_despesas)
-        FROM despesa_agregada da
-        JOIN operadora o ON o.id_operadora = da.id_operadora
-        GROUP BY o.uf
-        ORDER BY SUM(da.total_despesas) DESC
-    """)
-    
     distribuicao_uf = [
-        DespesaPorUF(uf=r[0], total=float(r[1])) 
-        for r in cur.fetchall()
+        DespesaPorUF(uf=r[0], total=float(r[1]))
+        for r in uf_rows
     ]
 
-    cur.close()
-
     return EstatisticasGlobais(
         total_despesas=float(total),
         media_despesas=float(media),
@@ -61,26 +75,37 @@ def estatisticas_globais(conn=Depends(get_connection)):
     )
 
 @router.get("/{cnpj}", response_model=EstatisticaOperadora)
-def estatisticas_operadora(cnpj: str, conn=Depends(get_connection)):
+async def estatisticas_operadora(cnpj: str, request: Request, response: Response):
     cnpj = normalize_cnpj(cnpj)
-    cur = conn.cursor()
+    chave = f"operadora:{cnpj}"
+
+    versao = await versao_dados()
+    cabecalhos = cabecalhos_cache(chave, versao)
 
-    cur.execute("""
+    nao_modificada = resposta_nao_modificada(request, cabecalhos)
+    if nao_modificada:
+        return nao_modificada
+
+    response.headers.update(cabecalhos)
+    return await cache_estatisticas.obter_ou_calcular(
+        chave, versao.versao, lambda: _calcular_estatisticas_operadora(cnpj)
+    )
+
+async def _calcular_estatisticas_operadora(cnpj: str) -> EstatisticaOperadora:
+    # Resumo pré-calculado por operadora (mv_resumo_operadora): uma leitura por chave
+    rows = await buscar_todos("""
         SELECT o.id_operadora, o.cnpj, o.razao_social,
-               COALESCE(SUM(da.total_despesas),0),
-               COALESCE(AVG(da.media_trimestral),0),
-               COALESCE(AVG(da.desvio_padrao),0)
+               COALESCE(r.total_despesas,0),
+               COALESCE(r.media_despesas,0),
+               COALESCE(r.desvio_padrao,0)
         FROM operadora o
-        LEFT JOIN despesa_agregada da ON da.id_operadora = o.id_operadora
+        LEFT JOIN mv_resumo_operadora r ON r.id_operadora = o.id_operadora
         WHERE o.cnpj = %s
-        GROUP BY o.id_operadora, o.cnpj, o.razao_social
     """, (cnpj,))
 
-    row = cur.fetchone()
-    cur.close()
-
-    if not row:
+    if not rows:
         raise HTTPException(404, "Operadora não encontrada")
+    row = rows[0]
 
     return EstatisticaOperadora(
         id_operadora=row[0],
@@ -90,4 +115,3 @@ def estatisticas_operadora(cnpj: str, conn=Depends(get_connection)):
         media_despesas=float(row[4]),
         desvio_padrao=float(row[5])
     )
-
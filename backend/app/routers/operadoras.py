@@ -1,68 +1,154 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
 from typing import Optional, List
+import asyncio
 import re
 
-from app.core.database import get_connection
+from app.core.cache import cache_contagens, versao_dados
+from app.core.database import get_connection, buscar_todos
 from app.utils.cnpj import normalize_cnpj
-from app.models.schemas import Operadora, Despesa, PaginatedOperadoras
+from app.utils.cursor import encode_cursor, decode_cursor
+from app.models.schemas import (
+    Operadora, Despesa, DespesaTrimestral, PaginatedOperadoras, EstatisticaOperadora,
+    LoteOperadorasRequest, OperadoraLote, LoteOperadoras
+)
 
 router = APIRouter(prefix="/api/operadoras", tags=["Operadoras"])
 
+# Tamanho máximo de página aceito pela listagem
+MAX_LIMIT = 100
+
+# Máximo de operadoras (CNPJs + registros ANS) por requisição em /lote
+MAX_LOTE = 100
+
+# Texto pesquisável (sem acento, minúsculo); é a mesma expressão do índice idx_operadora_busca_trgm
+EXPR_BUSCA = "f_unaccent(lower(razao_social || ' ' || coalesce(nome_fantasia, '')))"
+
+# Busca tratada como CNPJ: apenas dígitos e pontuação de CNPJ
+REGEX_BUSCA_CNPJ = re.compile(r"[\d./\-\s]+")
+
+
+def _escapar_like(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
 @router.get("", response_model=PaginatedOperadoras)
-def listar_operadoras(
-    page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1),
+async def listar_operadoras(
+    limit: int = Query(20, ge=1, le=MAX_LIMIT),
+    cursor: Optional[str] = None,
+    page: Optional[int] = Query(
+        None, ge=1, deprecated=True,
+        description="Paginação antiga por OFFSET; use `cursor`. Ignorado quando `cursor` é enviado."
+    ),
     q: Optional[str] = None,
     include_sem_despesas: bool = Query(False), # Novo parâmetro
+    incluir_total: bool = Query(False),
     conn=Depends(get_connection)
 ):
-    offset = (page - 1) * limit
-    cur = conn.cursor()
-
     # 1. Construção dinâmica das condições (WHERE)
     conditions = []
     params = []
 
+    # Ranking da busca textual (None = ordem alfabética)
+    rank_sql = None
+    rank_params = []
+
     # Filtro de busca (Nome ou CNPJ)
-    if q:
+    if q and q.strip():
         q_norm = re.sub(r"\D", "", q)
-        if q_norm:
+        if q_norm and REGEX_BUSCA_CNPJ.fullmatch(q):
+            # Caminho rápido: prefixo do CNPJ usa o índice idx_operadora_cnpj_prefixo
             conditions.append("cnpj LIKE %s")
-            params.append(f"%{q_norm}%")
+            params.append(f"{q_norm}%")
         else:
-            conditions.append("razao_social ILIKE %s")
-            params.append(f"%{q}%")
+            # Razão social / nome fantasia sem acento, via índice trigram (pg_trgm)
+            termo = q.strip().lower()
+            conditions.append(
+                f"({EXPR_BUSCA} LIKE '%%' || f_unaccent(%s) || '%%' "
+                f"OR f_unaccent(%s) <%% {EXPR_BUSCA})"
+            )
+            params += [_escapar_like(termo), termo]
+            rank_sql = f"word_similarity(f_unaccent(%s), {EXPR_BUSCA})"
+            rank_params = [termo]
 
     # Filtro de despesas: Se include_sem_despesas for False (padrão), 
-    # filtramos apenas as que possuem registros na tabela despesa.
+    # filtramos apenas as que possuem despesas (uma linha por operadora em mv_resumo_operadora).
     if not include_sem_despesas:
         conditions.append("""
             EXISTS (
-                SELECT 1 FROM despesa d 
-                WHERE d.id_operadora = operadora.id_operadora
+                SELECT 1 FROM mv_resumo_operadora r
+                WHERE r.id_operadora = operadora.id_operadora
             )
         """)
 
+    # Compatibilidade com a paginação antiga (?page=N): OFFSET sobre a mesma ordenação,
+    # com `total` sempre preenchido como antes. Só vale sem cursor.
+    if cursor:
+        page = None
+    offset = (page - 1) * limit if page else 0
+
+    # 2. Total (opcional): contagem cara, guardada em cache por filtro e versão dos dados
+    total = None
+    if incluir_total or page:
+        where_total = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        chave = f"operadoras:{q or ''}:{include_sem_despesas}"
+
+        async def contar():
+            async with conn.cursor() as cur:
+                await cur.execute(f"SELECT COUNT(*) FROM operadora {where_total}", params)
+                return (await cur.fetchone())[0]
+
+        versao = await versao_dados(conn)
+        total = await cache_contagens.obter_ou_calcular(chave, versao.versao, contar)
+
+    # 3. Keyset: continua a partir da chave de ordenação do último item recebido
+    #    - listagem: (razao_social, id_operadora)
+    #    - busca textual: (relevância desc, razao_social, id_operadora)
+    page_params = list(params)
+    if cursor:
+        try:
+            if rank_sql:
+                rank_cursor, razao_cursor, id_cursor = decode_cursor(cursor, 3)
+            else:
+                razao_cursor, id_cursor = decode_cursor(cursor, 2)
+        except ValueError:
+            raise HTTPException(400, "Cursor inválido")
+
+        if rank_sql:
+            conditions.append(
+                f"({rank_sql} < %s OR ({rank_sql} = %s AND (razao_social, id_operadora) > (%s, %s)))"
+            )
+            page_params += rank_params + [rank_cursor] + rank_params + [rank_cursor, razao_cursor, id_cursor]
+        else:
+            conditions.append("(razao_social, id_operadora) > (%s, %s)")
+            page_params += [razao_cursor, id_cursor]
+
     # Une as condições com AND
     where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
 
-    # 2. Busca o total para a paginação
-    cur.execute(f"SELECT COUNT(*) FROM operadora {where_clause}", params)
-    total = cur.fetchone()[0]
+    select_rank = f", {rank_sql} AS relevancia" if rank_sql else ""
+    order_by = "relevancia DESC, razao_social, id_operadora" if rank_sql else "razao_social, id_operadora"
 
-    # 3. Busca os dados paginados
+    # 4. Busca uma linha a mais que o limite para saber se existe próxima página
     # Nota: data_registro_ans convertido para str para evitar erro de validação
-    cur.execute(f"""
-        SELECT id_operadora, registro_ans, cnpj, razao_social,
-               nome_fantasia, modalidade, uf, data_registro_ans
-        FROM operadora
-        {where_clause}
-        ORDER BY razao_social
-        OFFSET %s LIMIT %s
-    """, params + [offset, limit])
-
-    rows = cur.fetchall()
-    cur.close()
+    async with conn.cursor() as cur:
+        await cur.execute(f"""
+            SELECT id_operadora, registro_ans, cnpj, razao_social,
+                   nome_fantasia, modalidade, uf, data_registro_ans{select_rank}
+            FROM operadora
+            {where_clause}
+            ORDER BY {order_by}
+            OFFSET %s LIMIT %s
+        """, (rank_params if rank_sql else []) + page_params + [offset, limit + 1])
+
+        rows = await cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        ultimo = rows[-1]
+        if rank_sql:
+            next_cursor = encode_cursor(ultimo[8], ultimo[3], ultimo[0])
+        else:
+            next_cursor = encode_cursor(ultimo[3], ultimo[0])
 
     return {
         "data": [
@@ -77,25 +163,109 @@ def listar_operadoras(
                 data_registro_ans=str(r[7]) if r[7] else ""
             ) for r in rows
         ],
+        "limit": limit,
+        "next_cursor": next_cursor,
         "total": total,
-        "page": page,
-        "limit": limit
+        "page": page
+    }
+
+@router.post("/lote", response_model=LoteOperadoras)
+async def operadoras_lote(pedido: LoteOperadorasRequest):
+    """
+    Cadastro, estatísticas e série trimestral de despesas de várias operadoras
+    (por CNPJ e/ou registro ANS) em uma resposta: duas consultas com `= ANY(%s)`,
+    em paralelo, em vez de três requisições por operadora.
+    """
+    cnpjs = list(dict.fromkeys(c for c in map(normalize_cnpj, pedido.cnpjs) if c))
+    registros = list(dict.fromkeys(pedido.registros_ans))
+
+    if not cnpjs and not registros:
+        raise HTTPException(400, "Informe ao menos um CNPJ ou registro ANS")
+    if len(cnpjs) + len(registros) > MAX_LOTE:
+        raise HTTPException(400, f"Máximo de {MAX_LOTE} operadoras por lote")
+
+    # Casts explícitos: mantêm os índices de cnpj (CHAR) e registro_ans (INTEGER) utilizáveis
+    filtro = "o.cnpj = ANY(%s::bpchar[]) OR o.registro_ans = ANY(%s::int[])"
+    params = (cnpjs, registros)
+
+    linhas, series = await asyncio.gather(
+        buscar_todos(f"""
+            SELECT o.id_operadora, o.registro_ans, o.cnpj, o.razao_social,
+                   o.nome_fantasia, o.modalidade, o.uf, o.data_registro_ans,
+                   COALESCE(r.total_despesas,0),
+                   COALESCE(r.media_despesas,0),
+                   COALESCE(r.desvio_padrao,0)
+            FROM operadora o
+            LEFT JOIN mv_resumo_operadora r ON r.id_operadora = o.id_operadora
+            WHERE {filtro}
+        """, params),
+        buscar_todos(f"""
+            SELECT m.id_operadora, m.ano, m.trimestre, m.total_despesas
+            FROM mv_despesa_operadora_trimestre m
+            JOIN operadora o ON o.id_operadora = m.id_operadora
+            WHERE {filtro}
+            ORDER BY m.id_operadora, m.ano, m.trimestre
+        """, params),
+    )
+
+    despesas = {}
+    for id_operadora, ano, trimestre, total in series:
+        despesas.setdefault(id_operadora, []).append(
+            DespesaTrimestral(ano=ano, trimestre=trimestre, total_despesas=float(total))
+        )
+
+    # Resposta na ordem do pedido (primeiro os CNPJs, depois os registros ANS)
+    ordem_cnpj = {c: i for i, c in enumerate(cnpjs)}
+    ordem_registro = {r: len(cnpjs) + i for i, r in enumerate(registros)}
+    linhas.sort(key=lambda r: min(ordem_cnpj.get(r[2], MAX_LOTE), ordem_registro.get(r[1], MAX_LOTE)))
+
+    encontrados_cnpj = {r[2] for r in linhas}
+    encontrados_registro = {r[1] for r in linhas}
+    nao_encontrados = (
+        [c for c in cnpjs if c not in encontrados_cnpj]
+        + [str(r) for r in registros if r not in encontrados_registro]
+    )
+
+    return {
+        "data": [
+            OperadoraLote(
+                operadora=Operadora(
+                    id_operadora=r[0],
+                    registro_ans=r[1],
+                    cnpj=r[2],
+                    razao_social=r[3],
+                    nome_fantasia=r[4],
+                    modalidade=r[5],
+                    uf=r[6],
+                    data_registro_ans=str(r[7])
+                ),
+                estatisticas=EstatisticaOperadora(
+                    id_operadora=r[0],
+                    cnpj=r[2],
+                    razao_social=r[3],
+                    total_despesas=float(r[8]),
+                    media_despesas=float(r[9]),
+                    desvio_padrao=float(r[10])
+                ),
+                despesas=despesas.get(r[0], [])
+            ) for r in linhas
+        ],
+        "nao_encontrados": nao_encontrados
     }
 
 # ... (os outros métodos obter_operadora e despesas_operadora permanecem iguais)
 @router.get("/{cnpj}", response_model=Operadora)
-def obter_operadora(cnpj: str, conn=Depends(get_connection)):
+async def obter_operadora(cnpj: str, conn=Depends(get_connection)):
     cnpj = normalize_cnpj(cnpj)
-    cur = conn.cursor()
 
-    cur.execute("""
-        SELECT id_operadora, registro_ans, cnpj, razao_social,
-               nome_fantasia, modalidade, uf, data_registro_ans
-        FROM operadora WHERE cnpj = %s
-    """, (cnpj,))
+    async with conn.cursor() as cur:
+        await cur.execute("""
+            SELECT id_operadora, registro_ans, cnpj, razao_social,
+                   nome_fantasia, modalidade, uf, data_registro_ans
+            FROM operadora WHERE cnpj = %s
+        """, (cnpj,))
 
-    row = cur.fetchone()
-    cur.close()
+        row = await cur.fetchone()
 
     if not row:
         raise HTTPException(404, "Operadora não encontrada")
@@ -112,20 +282,19 @@ def obter_operadora(cnpj: str, conn=Depends(get_connection)):
     )
 
 @router.get("/{cnpj}/despesas", response_model=List[Despesa])
-def despesas_operadora(cnpj: str, conn=Depends(get_connection)):
+async def despesas_operadora(cnpj: str, conn=Depends(get_connection)):
     cnpj = normalize_cnpj(cnpj)
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT d.ano, d.trimestre, d.valor
-        FROM despesa d
-        JOIN operadora o ON o.id_operadora = d.id_operadora
-        WHERE o.cnpj = %s
-        ORDER BY d.ano, d.trimestre
-    """, (cnpj,))
-
-    rows = cur.fetchall()
-    cur.close()
+
+    async with conn.cursor() as cur:
+        await cur.execute("""
+            SELECT d.ano, d.trimestre, d.valor
+            FROM despesa d
+            JOIN operadora o ON o.id_operadora = d.id_operadora
+            WHERE o.cnpj = %s
+            ORDER BY d.ano, d.trimestre
+        """, (cnpj,))
+
+        rows = await cur.fetchall()
 
     return [Despesa(ano=r[0], trimestre=r[1], valor=float(r[2])) for r in rows]
 
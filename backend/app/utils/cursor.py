@@ -0,0 +1,21 @@
+import base64
+import json
+
+
+def encode_cursor(*valores) -> str:
+    """ Gera um cursor opaco (base64 url-safe) a partir da chave de ordenação do último item. """
+    bruto = json.dumps(valores, ensure_ascii=False, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, tamanho: int) -> list:
+    """ Decodifica um cursor gerado por encode_cursor. Lança ValueError se for inválido. """
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valores = json.loads(bruto)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Cursor inválido") from e
+
+    if not isinstance(valores, list) or len(valores) != tamanho:
+        raise ValueError("Cursor inválido")
+    return valores
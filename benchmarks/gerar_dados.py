@@ -0,0 +1,155 @@
+"""
+Gera dados sintéticos no formato da ANS para os benchmarks (sem acessar o site).
+
+- ZIPs trimestrais de demonstrações contábeis: DATA;REG_ANS;CD_CONTA_CONTABIL;DESCRICAO;VL_SALDO_INICIAL;VL_SALDO_FINAL
+- Relatorio_cadop.csv com as mesmas colunas do cadastro de operadoras ativas
+
+Uso:
+    python -m benchmarks.gerar_dados --linhas 2000000 --destino temp/bench
+"""
+import csv
+import argparse
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.cnpj_utils import PESOS_D1, PESOS_D2, _digito_verificador
+
+# Registros ANS sintéticos: 300000 .. 300000 + N_OPERADORAS - 1
+REGISTRO_INICIAL = 300_000
+N_OPERADORAS = 1_200
+
+# Descrições reais do plano de contas (as duas primeiras casam com REGEX_SINISTROS)
+DESCRICOES = [
+    "Despesas com Eventos / Sinistros",
+    "DESPESAS COM EVENTOS/ SINISTROS CONHECIDOS OU AVISADOS",
+    "EVENTOS INDENIZÁVEIS LÍQUIDOS / SINISTROS RETIDOS",
+    "CONTRAPRESTAÇÕES EFETIVAS DE PLANO DE ASSISTÊNCIA À SAÚDE",
+    "Despesas Administrativas",
+    "PROVISÃO PARA EVENTOS OCORRIDOS E NÃO AVISADOS (PEONA)",
+    "Receitas de Aplicações Financeiras",
+    "Tributos Diretos de Operações com Planos de Assistência à Saúde da Operadora",
+]
+PESOS_DESCRICOES = [0.12, 0.08, 0.05, 0.15, 0.15, 0.1, 0.15, 0.2]
+
+MODALIDADES = [
+    "Cooperativa Médica", "Medicina de Grupo", "Autogestão", "Seguradora Especializada em Saúde",
+    "Filantropia", "Cooperativa Odontológica", "Odontologia de Grupo",
+]
+UFS = ["SP", "RJ", "MG", "RS", "PR", "BA", "SC", "PE", "GO", "CE", "ES", "DF"]
+
+COLUNAS_CADOP = [
+    "REGISTRO_OPERADORA", "CNPJ", "Razao_Social", "Nome_Fantasia", "Modalidade", "Logradouro",
+    "Numero", "Complemento", "Bairro", "Cidade", "UF", "CEP", "DDD", "Telefone", "Fax",
+    "Endereco_eletronico", "Representante", "Cargo_Representante", "Regiao_de_Comercializacao",
+    "Data_Registro_ANS",
+]
+
+BLOCO_LINHAS = 500_000
+
+
+def gerar_cnpjs(n: int, rng: np.random.Generator) -> np.ndarray:
+    """ CNPJs válidos (dígitos verificadores corretos), como texto de 14 dígitos. """
+    base = rng.integers(0, 10, size=(n, 12))
+    d1 = _digito_verificador(base, PESOS_D1)
+    d2 = _digito_verificador(np.column_stack([base, d1]), PESOS_D2)
+    digitos = np.column_stack([base, d1, d2]).astype(np.uint8) + ord("0")
+    return digitos.view("S14").ravel().astype(str)
+
+
+def _bloco_demonstracoes(n: int, ano: int, trimestre: int, rng: np.random.Generator) -> pd.DataFrame:
+    mes = (trimestre - 1) * 3 + 1
+    saldo_final = np.round(rng.lognormal(11, 2, n) * rng.choice([1, -1, 0], n, p=[0.9, 0.07, 0.03]), 2)
+    return pd.DataFrame({
+        "DATA": f"{ano}-{mes:02d}-01",
+        "REG_ANS": rng.integers(REGISTRO_INICIAL, REGISTRO_INICIAL + N_OPERADORAS, n),
+        "CD_CONTA_CONTABIL": rng.integers(31, 469999, n),
+        "DESCRICAO": rng.choice(DESCRICOES, n, p=PESOS_DESCRICOES),
+        "VL_SALDO_INICIAL": np.round(saldo_final * rng.uniform(0.5, 1, n), 2),
+        "VL_SALDO_FINAL": saldo_final,
+    })
+
+
+def gerar_zip_trimestre(
+    destino: Path,
+    ano: int,
+    trimestre: int,
+    linhas: int,
+    encoding: str = "latin1",
+    seed: int = 0,
+) -> Path:
+    """
+    Cria `<trimestre>T<ano>.zip` com um CSV de `linhas` linhas (separador ';', decimal ',',
+    campos entre aspas, como publicado pela ANS). O CSV é escrito em blocos direto no ZIP.
+    """
+    rng = np.random.default_rng(seed)
+    destino = Path(destino)
+    destino.mkdir(parents=True, exist_ok=True)
+    zip_path = destino / f"{trimestre}T{ano}.zip"
+
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        with zf.open(f"{trimestre}T{ano}.csv", "w", force_zip64=True) as fh:
+            for inicio in range(0, linhas, BLOCO_LINHAS):
+                bloco = _bloco_demonstracoes(min(BLOCO_LINHAS, linhas - inicio), ano, trimestre, rng)
+                texto = bloco.to_csv(
+                    sep=";", decimal=",", float_format="%.2f", index=False,
+                    header=inicio == 0, quoting=csv.QUOTE_ALL
+                )
+                fh.write(texto.encode(encoding))
+
+        # Arquivo auxiliar presente em alguns ZIPs da ANS (deve ser ignorado)
+        zf.writestr("leiame.txt", "Demonstrações contábeis - dados sintéticos\n".encode(encoding))
+
+    return zip_path
+
+
+def gerar_cadop(destino: Path, n_operadoras: int = N_OPERADORAS, encoding: str = "latin1", seed: int = 0) -> Path:
+    """ Cria um Relatorio_cadop.csv sintético cobrindo os registros usados nos ZIPs. """
+    rng = np.random.default_rng(seed)
+    destino = Path(destino)
+    destino.mkdir(parents=True, exist_ok=True)
+
+    registros = np.arange(REGISTRO_INICIAL, REGISTRO_INICIAL + n_operadoras)
+    df = pd.DataFrame({c: "" for c in COLUNAS_CADOP}, index=range(n_operadoras))
+    df["REGISTRO_OPERADORA"] = registros
+    df["CNPJ"] = gerar_cnpjs(n_operadoras, rng)
+    df["Razao_Social"] = [f"OPERADORA DE SAÚDE {r} LTDA" for r in registros]
+    df["Modalidade"] = rng.choice(MODALIDADES, n_operadoras)
+    df["UF"] = rng.choice(UFS, n_operadoras)
+    df["Cidade"] = "São Paulo"
+    df["Data_Registro_ANS"] = pd.to_datetime(
+        rng.integers(0, 9000, n_operadoras), unit="D", origin="2000-01-01"
+    ).strftime("%Y-%m-%d")
+
+    path = destino / "Relatorio_cadop.csv"
+    df.to_csv(path, sep=";", index=False, encoding=encoding, quoting=csv.QUOTE_ALL)
+    return path
+
+
+def gerar_dataset(
+    destino: Path,
+    linhas: int,
+    trimestres: list[tuple[int, int]] | None = None,
+    encoding: str = "latin1",
+) -> tuple[list[Path], Path]:
+    """ Gera os ZIPs (um por trimestre, `linhas` cada) e o cadastro de operadoras. """
+    trimestres = trimestres or [(2024, 2), (2024, 3), (2024, 4)]
+    zips = [
+        gerar_zip_trimestre(destino, ano, tri, linhas, encoding=encoding, seed=i)
+        for i, (ano, tri) in enumerate(trimestres)
+    ]
+    return zips, gerar_cadop(destino, encoding=encoding)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos no formato da ANS")
+    parser.add_argument("--destino", type=Path, default=Path("temp/bench"))
+    parser.add_argument("--linhas", type=int, default=1_000_000, help="linhas por trimestre")
+    parser.add_argument("--encoding", default="latin1", choices=["latin1", "utf-8"])
+    args = parser.parse_args()
+
+    zips, cadop = gerar_dataset(args.destino, args.linhas, encoding=args.encoding)
+    for path in zips + [cadop]:
+        print(f"[INFO] {path} ({path.stat().st_size / 2**20:.1f} MiB)")
@@ -0,0 +1,255 @@
+"""
+Benchmarks das etapas do pipeline com dados sintéticos (benchmarks/gerar_dados.py).
+
+Cada etapa roda em um processo novo (spawn), de modo que o pico de RSS medido
+é o da etapa (entrada carregada + processamento), e não o acumulado da execução.
+
+Uso:
+    python -m benchmarks.run_benchmarks --linhas 1000000
+    python -m benchmarks.run_benchmarks --linhas 1000000 --salvar-baseline
+    python -m benchmarks.run_benchmarks --linhas 1000000 --comparar          # sai com código 1 se regredir
+"""
+import sys
+import json
+import time
+import platform
+import argparse
+import zipfile
+import multiprocessing as mp
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows: sem getrusage, o pico de memória não é medido
+    resource = None
+
+from benchmarks.gerar_dados import gerar_dataset
+from scripts.run_integration import process_zip
+from utils.dataframe_utils import iter_zip_member_chunks, normalize_and_parse, separar_consolidados
+from utils.enrich_utils import enriquecer_dados
+from utils.aggregate_utils import agregar_dados
+from utils.file_utils import carregar_despesas
+from utils.operadoras_utils import carregar_dimensao_operadoras
+from utils.storage_utils import salvar_tabela, ler_tabela, existe_tabela
+
+DADOS_DIR = Path("temp/bench")
+BASELINE_PATH = Path("benchmarks/resultados/baseline.json")
+TRIMESTRES = [(2024, 2), (2024, 3), (2024, 4)]
+
+# Aumento relativo tolerado (tempo e memória) antes de acusar regressão
+TOLERANCIA = 0.20
+
+
+def _pico_rss_mb() -> float | None:
+    # Linux: VmHWM é o pico do próprio processo (ru_maxrss herdaria o do pai no spawn)
+    try:
+        with open("/proc/self/status") as f:
+            for linha in f:
+                if linha.startswith("VmHWM:"):
+                    return int(linha.split()[1]) / 2**10
+    except OSError:
+        pass
+
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reporta em bytes; demais sistemas em KiB
+    return pico / 2**20 if sys.platform == "darwin" else pico / 2**10
+
+
+# =========================
+# Etapas (rodam no processo filho)
+# Cada uma carrega a entrada fora da medição e retorna (linhas_entrada, linhas_saida, segundos)
+# =========================
+def _bench_process_zip(dados: Path):
+    zip_path = dados / "2T2024.zip"
+    with zipfile.ZipFile(zip_path) as zf:
+        linhas = sum(1 for _ in zf.open("2T2024.csv")) - 1
+
+    inicio = time.perf_counter()
+    df = process_zip((zip_path, 2024, 2))
+    return linhas, len(df), time.perf_counter() - inicio
+
+
+def _bench_normalize_and_parse(dados: Path):
+    with zipfile.ZipFile(dados / "2T2024.zip") as zf:
+        blocos = list(iter_zip_member_chunks(zf, "2T2024.csv"))
+
+    inicio = time.perf_counter()
+    saida = sum(len(normalize_and_parse(b, "2T2024.csv")) for b in blocos)
+    return sum(len(b) for b in blocos), saida, time.perf_counter() - inicio
+
+
+def _bench_separar_consolidados(dados: Path):
+    df = ler_tabela(dados / "consolidado")
+
+    inicio = time.perf_counter()
+    partes = separar_consolidados(df, validar_cnpj=False)
+    return len(df), len(partes[0]), time.perf_counter() - inicio
+
+
+def _bench_enriquecer_dados(dados: Path):
+    despesas = carregar_despesas(dados / "validos")
+    operadoras = carregar_dimensao_operadoras(dados)
+
+    inicio = time.perf_counter()
+    df = enriquecer_dados(despesas, operadoras)
+    return len(despesas), len(df), time.perf_counter() - inicio
+
+
+def _bench_agregar_dados(dados: Path):
+    df = ler_tabela(dados / "enriquecido")
+
+    inicio = time.perf_counter()
+    agregado = agregar_dados(df)
+    return len(df), len(agregado), time.perf_counter() - inicio
+
+
+ETAPAS = {
+    "process_zip": _bench_process_zip,
+    "normalize_and_parse": _bench_normalize_and_parse,
+    "separar_consolidados": _bench_separar_consolidados,
+    "enriquecer_dados": _bench_enriquecer_dados,
+    "agregar_dados": _bench_agregar_dados,
+}
+
+
+def _executar_etapa(nome: str, dados: str):
+    linhas_entrada, linhas_saida, segundos = ETAPAS[nome](Path(dados))
+    return {
+        "linhas_entrada": linhas_entrada,
+        "linhas_saida": linhas_saida,
+        "segundos": segundos,
+        "pico_rss_mb": _pico_rss_mb(),
+    }
+
+
+# =========================
+# Preparação dos dados
+# =========================
+def preparar_dados(linhas: int, encoding: str) -> Path:
+    """
+    Gera (uma vez por tamanho/encoding) os ZIPs sintéticos e as entradas
+    intermediárias de cada etapa, usando o próprio pipeline.
+    """
+    dados = DADOS_DIR / f"{linhas}_{encoding}"
+    if existe_tabela(dados / "enriquecido"):
+        return dados
+
+    print(f"[INFO] Gerando dados sintéticos em {dados} ({linhas} linhas por trimestre)...")
+    zips, _ = gerar_dataset(dados, linhas, TRIMESTRES, encoding=encoding)
+
+    consolidado = pd.concat(
+        [process_zip((z, ano, tri)) for z, (ano, tri) in zip(zips, TRIMESTRES)],
+        ignore_index=True
+    )
+    salvar_tabela(consolidado, dados / "consolidado", particionar=True)
+
+    validos = separar_consolidados(consolidado, validar_cnpj=False)[0]
+    salvar_tabela(validos, dados / "validos", particionar=True)
+
+    enriquecido = enriquecer_dados(carregar_despesas(dados / "validos"), carregar_dimensao_operadoras(dados))
+    salvar_tabela(enriquecido, dados / "enriquecido", particionar=True)
+
+    return dados
+
+
+# =========================
+# Execução e baseline
+# =========================
+def rodar(linhas: int, etapas: list[str], repeticoes: int = 1, encoding: str = "latin1") -> dict:
+    dados = preparar_dados(linhas, encoding)
+    ctx = mp.get_context("spawn")
+
+    resultados = {}
+    for nome in etapas:
+        execucoes = []
+        for _ in range(repeticoes):
+            with ctx.Pool(1) as pool:
+                execucoes.append(pool.apply(_executar_etapa, (nome, str(dados))))
+
+        # Melhor tempo entre as repetições (menos ruído da máquina)
+        melhor = min(execucoes, key=lambda r: r["segundos"])
+        melhor["linhas_por_s"] = melhor["linhas_entrada"] / melhor["segundos"] if melhor["segundos"] else None
+        resultados[nome] = melhor
+
+        pico = f"{melhor['pico_rss_mb']:.0f} MiB" if melhor["pico_rss_mb"] is not None else "n/d"
+        print(
+            f"[INFO] {nome:<22} {melhor['segundos']:8.3f} s  "
+            f"{melhor['linhas_por_s'] or 0:>12,.0f} linhas/s  pico RSS {pico}"
+        )
+
+    return {
+        "linhas": linhas,
+        "encoding": encoding,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "plataforma": platform.platform(),
+        "gerado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "etapas": resultados,
+    }
+
+
+def comparar(resultado: dict, baseline: dict, tolerancia: float = TOLERANCIA) -> list[str]:
+    """ Lista as regressões (tempo ou pico de memória acima da tolerância) em relação ao baseline. """
+    if baseline.get("linhas") != resultado["linhas"]:
+        print(f"[WARN] Baseline gerado com {baseline.get('linhas')} linhas; execução atual com {resultado['linhas']}.")
+
+    regressoes = []
+    for nome, atual in resultado["etapas"].items():
+        base = baseline.get("etapas", {}).get(nome)
+        if not base:
+            continue
+
+        for metrica in ("segundos", "pico_rss_mb"):
+            if atual.get(metrica) is None or not base.get(metrica):
+                continue
+            variacao = atual[metrica] / base[metrica] - 1
+            if variacao > tolerancia:
+                regressoes.append(
+                    f"{nome}: {metrica} {base[metrica]:.2f} -> {atual[metrica]:.2f} (+{variacao:.0%})"
+                )
+
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline ANS com dados sintéticos")
+    parser.add_argument("--linhas", type=int, default=1_000_000, help="linhas por trimestre sintético")
+    parser.add_argument("--etapas", default=",".join(ETAPAS), help="etapas separadas por vírgula")
+    parser.add_argument("--repeticoes", type=int, default=1)
+    parser.add_argument("--encoding", default="latin1", choices=["latin1", "utf-8"])
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--salvar-baseline", action="store_true", help="grava o resultado como novo baseline")
+    parser.add_argument("--comparar", action="store_true", help="compara com o baseline e falha se houver regressão")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    args = parser.parse_args()
+
+    etapas = [e.strip() for e in args.etapas.split(",") if e.strip()]
+    desconhecidas = set(etapas) - set(ETAPAS)
+    if desconhecidas:
+        parser.error(f"etapas desconhecidas: {', '.join(sorted(desconhecidas))}")
+
+    resultado = rodar(args.linhas, etapas, args.repeticoes, args.encoding)
+
+    if args.comparar:
+        if not args.baseline.exists():
+            print(f"[ERRO] Baseline não encontrado: {args.baseline}")
+            sys.exit(2)
+        regressoes = comparar(resultado, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerancia)
+        for r in regressoes:
+            print(f"[ERRO] Regressão: {r}")
+        if regressoes:
+            sys.exit(1)
+        print("[OK] Nenhuma regressão em relação ao baseline.")
+
+    if args.salvar_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(resultado, indent=2), encoding="utf-8")
+        print(f"[OK] Baseline salvo em {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,12 +13,16 @@ interface Operadora {
 
 interface ApiResponse {
   data: Operadora[]
-  total: number
+  limit: number
+  next_cursor: string | null
+  total: number | null
 }
 
 export function useOperadoras() {
   const operadoras = ref<Operadora[]>([])
   const total = ref(0)
+  const nextCursor = ref<string | null>(null)
+  const hasMore = ref(true)
   const loading = ref(false)
   const error = ref<string | null>(null)
   const page = ref(1)
@@ -35,10 +39,12 @@ export function useOperadoras() {
     try {
       const response = await api.get<ApiResponse>('/operadoras', {
         params: {
-          page: page.value,
           limit,
+          cursor: reset ? undefined : nextCursor.value || undefined,
           q: q.value || undefined,
           include_sem_despesas: includeSemDespesas.value,
+          // o total só é pedido na primeira página (e fica em cache no servidor)
+          incluir_total: reset || undefined,
         },
       })
 
@@ -48,7 +54,11 @@ export function useOperadoras() {
         operadoras.value = [...operadoras.value, ...response.data.data]
       }
 
-      total.value = response.data.total
+      if (response.data.total !== null) {
+        total.value = response.data.total
+      }
+      nextCursor.value = response.data.next_cursor
+      hasMore.value = response.data.next_cursor !== null
     } catch (err: any) {
       error.value = err?.message || 'Erro ao carregar operadoras'
       console.error(err)
@@ -60,13 +70,15 @@ export function useOperadoras() {
   function resetBusca(newQuery: string) {
     q.value = newQuery.trim()
     page.value = 1
+    nextCursor.value = null
+    hasMore.value = true
     operadoras.value = [] // limpa visualmente mais rápido
     fetchOperadoras(true)
   }
 
   function loadMore() {
     if (loading.value) return
-    if (operadoras.value.length >= total.value) return
+    if (!hasMore.value) return
 
     page.value += 1
     fetchOperadoras()
@@ -75,6 +87,7 @@ export function useOperadoras() {
   return {
     operadoras,
     total,
+    hasMore,
     loading,
     error,
     page,
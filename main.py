@@ -1,16 +1,37 @@
 from scripts.run_integration import run as run_integrate
 from scripts.run_aggregate import run as run_aggregate
+from utils.metrics_utils import etapa, METRICAS_PATH
+import os
+
+# A carga esvazia (TRUNCATE) e recarrega as tabelas: só roda com opt-in explícito,
+# nunca apenas por haver um POSTGRES_HOST no ambiente
+CARREGAR_BANCO = os.environ.get("ANS_CARREGAR_BANCO", "") == "1"
 
 
 def main():
     try:
-        print("[STEP 1] Executando integração...")
-        run_integrate()
+        with etapa("pipeline"):
+            print("[STEP 1] Executando integração...")
+            with etapa("integracao"):
+                run_integrate()
+
+            print("[STEP 2] Executando agregação...")
+            with etapa("agregacao_total"):
+                run_aggregate()
+
+            if CARREGAR_BANCO:
+                # Importado só aqui: sem a carga, o driver do PostgreSQL não é necessário
+                from scripts.run_load import run as run_load
 
-        print("[STEP 2] Executando agregação...")
-        run_aggregate()
+                print("[STEP 3] Carregando dados no PostgreSQL...")
+                with etapa("carga"):
+                    run_load()
+            else:
+                print("[INFO] ANS_CARREGAR_BANCO=1 não definido: carga no banco ignorada.")
 
         print("[OK] Pipeline completo executado com sucesso.")
+        if METRICAS_PATH:
+            print(f"[INFO] Métricas por etapa em: {METRICAS_PATH}")
 
     except Exception as e:
         print("[ERRO] Falha na execução do pipeline.")
@@ -1,60 +1,136 @@
 from pathlib import Path
-import zipfile
+import pandas as pd
 
 # Importação de funções utilitárias personalizadas para manipulação de arquivos e dados
-from utils.file_utils import carregar_despesas, carregar_operadoras
+from utils.file_utils import carregar_despesas
+from utils.operadoras_utils import carregar_dimensao_operadoras
 from utils.enrich_utils import enriquecer_dados
-from utils.aggregate_utils import agregar_dados
+from utils.aggregate_utils import agregar_dados, AgregadorDespesas
+from utils.storage_utils import (
+    salvar_tabela, remover_tabela, caminho_tabela, existe_tabela, listar_particoes, resolver_formato, exportar_csv
+)
+from utils.metrics_utils import etapa
+from utils.zip_utils import zip_dir
 
 # Definição dos caminhos base para os diretórios de dados
 BASE_DIR = Path("data/despesas")
 OPERADORAS_DIR = Path("data/operadoras")
 
-# Definição dos caminhos de entrada e saída dos arquivos CSV
-INPUT_VALIDOS = BASE_DIR / "valido" / "consolidado_validos.csv"
-OUTPUT_ENRIQUECIDO = OPERADORAS_DIR / "despesas_enriquecidas.csv"
-OUTPUT_AGREGADO = OPERADORAS_DIR / "despesas_agregadas.csv"
+# Definição dos caminhos de entrada e saída (sem extensão: Parquet ou CSV, ver utils.storage_utils)
+INPUT_VALIDOS = BASE_DIR / "valido" / "consolidado_validos"
+OUTPUT_ENRIQUECIDO = OPERADORAS_DIR / "despesas_enriquecidas"
+OUTPUT_AGREGADO = OPERADORAS_DIR / "despesas_agregadas"
+
+# Únicas colunas de despesas usadas no enriquecimento/agregação
+COLUNAS_DESPESAS = ["REG_ANS", "CNPJ", "RazaoSocial", "Trimestre", "Ano", "ValorDespesas"]
+
+# Cabeçalho do CSV enriquecido de entrega (ordem lida pelo sql/staging/03_load_csv.sql)
+COLUNAS_ENRIQUECIDO = ["REG_ANS", "CNPJ", "RazaoSocial", "Modalidade", "UF", "Trimestre", "Ano", "ValorDespesas"]
 
 # Nome do arquivo ZIP final que será gerado na raiz do projeto
 ZIP_OUTPUT = Path("Teste_Luiz_Fernando_Policarpo_leandro.zip")
 
 
-def zip_dir(source_dir: Path, output_zip: Path):
+def _agregar_em_memoria(operadoras, anos: list[int] | None) -> pd.DataFrame:
+    """ Sem partições Parquet (CSV): lê todas as despesas, enriquece e agrega de uma vez. """
+    with etapa("leitura") as m:
+        despesas = carregar_despesas(INPUT_VALIDOS, colunas=COLUNAS_DESPESAS, anos=anos)
+        m.leu(caminho_tabela(INPUT_VALIDOS))
+        m.linhas_saida = len(despesas)
+        m.memoria(despesas)
+
+    # Etapa de Enriquecimento: Une os dados de despesas com os dados cadastrais das operadoras
+    with etapa("enriquecimento") as m:
+        enriquecido = enriquecer_dados(despesas, operadoras)
+        m.escreveu(salvar_tabela(enriquecido, OUTPUT_ENRIQUECIDO, particionar=True))
+        m.linhas_entrada, m.linhas_saida = len(despesas), len(enriquecido)
+        m.memoria(enriquecido)
+
+    # Etapa de Agregação: total, média e desvio padrão por operadora e ano
+    with etapa("agregacao") as m:
+        agregado = agregar_dados(enriquecido)
+        m.escreveu(salvar_tabela(agregado, OUTPUT_AGREGADO))
+        m.linhas_entrada, m.linhas_saida = len(enriquecido), len(agregado)
+        m.memoria(agregado)
+
+    return agregado
+
+
+def _agregar_por_particao(operadoras, particoes: list[tuple]) -> pd.DataFrame:
     """
-    Compacta todos os arquivos de um diretório em um arquivo ZIP.
+    Em Parquet: leitura → enriquecimento → agregação uma partição Ano/Trimestre por vez.
+    Cada trimestre enriquecido é gravado na sua partição e somado ao agregador incremental,
+    então o pico de memória é o de um trimestre, não o do histórico inteiro.
     """
-    if not source_dir.exists():
-        raise FileNotFoundError(f"Pasta não encontrada: {source_dir.resolve()}")
+    agregador = AgregadorDespesas()
+    remover_tabela(OUTPUT_ENRIQUECIDO)
 
-    # Cria o arquivo ZIP usando o método de compressão DEFLATED
-    with zipfile.ZipFile(output_zip, "w", zipfile.ZIP_DEFLATED) as zf:
-        # Percorre recursivamente todos os arquivos dentro do diretório de origem
-        for file in source_dir.rglob("*"):
-            if file.is_file():
-                # Escreve o arquivo no ZIP mantendo a estrutura relativa de pastas
-                zf.write(file, arcname=file.relative_to(source_dir))
+    with etapa("enriquecimento", particoes=len(particoes)) as m:
+        m.leu(caminho_tabela(INPUT_VALIDOS))
+        m.linhas_entrada = m.linhas_saida = 0
+        maior = None
 
+        for particao in particoes:
+            despesas = carregar_despesas(INPUT_VALIDOS, colunas=COLUNAS_DESPESAS, particoes=[particao])
+            enriquecido = enriquecer_dados(despesas, operadoras)
+            salvar_tabela(enriquecido, OUTPUT_ENRIQUECIDO, particionar=True, acrescentar=True)
+            agregador.adicionar(enriquecido)
 
-def run():
+            m.linhas_entrada += len(despesas)
+            m.linhas_saida += len(enriquecido)
+            if maior is None or len(enriquecido) > len(maior):
+                maior = enriquecido
+
+        # Nenhuma linha enriquecida: grava a tabela vazia, com as colunas, para as etapas seguintes
+        if m.linhas_saida == 0:
+            salvar_tabela(maior, OUTPUT_ENRIQUECIDO, particionar=True)
+
+        # Memória do maior trimestre: é o que fica carregado de cada vez
+        m.memoria(maior)
+        m.escreveu(caminho_tabela(OUTPUT_ENRIQUECIDO))
+        linhas_enriquecidas = m.linhas_saida
+
+    with etapa("agregacao") as m:
+        agregado = agregador.resultado()
+        m.escreveu(salvar_tabela(agregado, OUTPUT_AGREGADO))
+        m.linhas_entrada, m.linhas_saida = linhas_enriquecidas, len(agregado)
+        m.memoria(agregado)
+
+    return agregado
+
+
+def run(anos: list[int] | None = None):
     """
     Função principal que coordena o fluxo de execução (Pipeline) do processamento.
+    `anos` restringe a leitura às partições desses anos (None = todas).
     """
-    # Carregamento dos dados iniciais de despesas validadas e informações das operadoras
-    despesas = carregar_despesas(INPUT_VALIDOS)
-    operadoras = carregar_operadoras(OPERADORAS_DIR)
+    # Dimensão de operadoras em cache: só é remontada quando o Relatorio_cadop.csv muda
+    with etapa("dimensao_operadoras") as m:
+        operadoras = carregar_dimensao_operadoras(OPERADORAS_DIR)
+        m.leu(OPERADORAS_DIR / "Relatorio_cadop.csv")
+        m.linhas_saida = len(operadoras)
 
-    # Etapa de Enriquecimento: Une os dados de despesas com os dados cadastrais das operadoras
-    enriquecido = enriquecer_dados(despesas, operadoras)
-    # Salva o resultado enriquecido em um novo arquivo CSV
-    enriquecido.to_csv(OUTPUT_ENRIQUECIDO, index=False)
+    particoes = []
+    if resolver_formato() == "parquet" and existe_tabela(INPUT_VALIDOS):
+        particoes = [p for p in listar_particoes(INPUT_VALIDOS) if anos is None or p[0] in anos]
+
+    if particoes:
+        _agregar_por_particao(operadoras, particoes)
+    else:
+        _agregar_em_memoria(operadoras, anos)
 
-    # Etapa de Agregação: Consolida os dados enriquecidos (ex: somas por período ou categoria)
-    agregado = agregar_dados(enriquecido)
-    # Salva o resultado agregado em um arquivo CSV final
-    agregado.to_csv(OUTPUT_AGREGADO, index=False)
+    # As etapas trocam Parquet; o ZIP e o sql/staging/03_load_csv.sql continuam recebendo CSV
+    if resolver_formato() != "csv":
+        with etapa("exportacao_csv") as m:
+            m.escreveu(exportar_csv(OUTPUT_ENRIQUECIDO, COLUNAS_ENRIQUECIDO))
+            m.escreveu(exportar_csv(OUTPUT_AGREGADO))
 
-    # Compacta a pasta de operadoras (contendo os resultados) para o arquivo ZIP final
-    zip_dir(OPERADORAS_DIR, ZIP_OUTPUT)
+    # Compacta os CSV da pasta de operadoras (contendo os resultados) para o arquivo ZIP final
+    with etapa("zip_operadoras") as m:
+        contagem = zip_dir(OPERADORAS_DIR, ZIP_OUTPUT, extensoes=(".csv",))
+        print(f"[INFO] ZIP: {contagem['comprimidos']} arquivos comprimidos, {contagem['reaproveitados']} reaproveitados do ZIP anterior")
+        m.leu(OPERADORAS_DIR)
+        m.escreveu(ZIP_OUTPUT)
 
     # Mensagens de confirmação no console
     print("[OK] Pipeline executado com sucesso.")
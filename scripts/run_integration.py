@@ -1,132 +1,456 @@
 from pathlib import Path
 
-import tempfile
+import zipfile
 import pandas as pd
 import os
 import shutil
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
-from utils.dataframe_utils import load_table, normalize_and_parse, separar_consolidados, is_eventos_sinistros_df
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from utils.dataframe_utils import (
+    indices_consolidados, stream_zip_member, inspecionar_membro,
+    EXTENSOES_TEXTO, EXTENSOES_EXCEL
+)
 
 from utils.file_utils import (
     list_files_api,
     download_file,
-    extract_zip,
-    zip_dir
+    metadados_remotos,
+    url_arquivo
+)
+from utils.download_utils import baixar
+from utils.manifest_utils import carregar_manifest, salvar_manifest, arquivo_mudou, registrar_arquivo
+from utils.storage_utils import (
+    salvar_tabela, salvar_parte, ler_tabela, existe_tabela, caminho_tabela, exportar_csv, resolver_formato
 )
-from utils.dataframe_utils import load_table, normalize_and_parse, separar_consolidados
+from utils.schema_utils import concatenar
+from utils.metrics_utils import etapa, tamanho_em_disco
+from utils.zip_utils import zip_dir
 
 FILES_PATH = Path("data/despesas")
 INVAL_PATH = FILES_PATH / "invalidos"
 VAL_PATH = FILES_PATH / "valido"
 
-OUT_ALL = FILES_PATH / "consolidado_despesas.csv"
-OUT_VALIDOS = VAL_PATH / "consolidado_validos.csv"
-OUT_NEGATIVOS = INVAL_PATH / "consolidado_numero_negativo_invalido.csv"
-OUT_ZERO = INVAL_PATH / "consolidado_valor_zero_invalido.csv"
-OUT_CNPJ_INVALIDO = INVAL_PATH / "consolidado_cnpj_invalido.csv"
+# Saídas sem extensão: o formato (Parquet ou CSV) é definido por utils.storage_utils
+OUT_ALL = FILES_PATH / "consolidado_despesas"
+OUT_VALIDOS = VAL_PATH / "consolidado_validos"
+OUT_NEGATIVOS = INVAL_PATH / "consolidado_numero_negativo_invalido"
+OUT_ZERO = INVAL_PATH / "consolidado_valor_zero_invalido"
+OUT_CNPJ_INVALIDO = INVAL_PATH / "consolidado_cnpj_invalido"
+
+# Grupo de indices_consolidados -> (saída, particionar por Ano/Trimestre)
+SAIDAS_VALIDACAO = {
+    "validos": (OUT_VALIDOS, True),
+    "negativos": (OUT_NEGATIVOS, False),
+    "zero": (OUT_ZERO, False),
+    "cnpj_invalido": (OUT_CNPJ_INVALIDO, False),
+}
 
 # ZIP FINAL NO ROOT DO PROJETO
 OUT_ZIP = Path.cwd() / "consolidado_despesas.zip"
 
+# Partições por trimestre (Ano=AAAA/Trimestre=T/<arquivo>) e manifest do modo incremental
+PARTICOES_PATH = Path("data/particoes")
+MANIFEST_PATH = PARTICOES_PATH / "manifest.json"
+
+COLUNAS_CONSOLIDADO = ["REG_ANS", "CNPJ", "RazaoSocial", "Trimestre", "Ano", "ValorDespesas"]
+
+# Processamento paralelo: membros CSV/TXT grandes são divididos em trechos (bytes descomprimidos)
+# de até TAMANHO_TRECHO, e cada trecho vira uma tarefa independente para os workers
+TAMANHO_TRECHO = int(os.environ.get("ANS_TAMANHO_TRECHO_MB", "64")) * 2**20
+MAX_WORKERS = os.cpu_count() or 1
+TAREFAS_POR_WORKER = 2  # tarefas em andamento por worker (limita a fila e a memória do processo principal)
+
 
 def process_zip(zip_path_ano_trimestre):
-    zip_path, _, _ = zip_path_ano_trimestre
-    tmp_extract = zip_path.parent / f"extract_{zip_path.stem}"
-    tmp_extract.mkdir(exist_ok=True)
+    """
+    Processa um ZIP da ANS e retorna as linhas normalizadas de Eventos/Sinistros.
 
-    try:
-        extract_zip(zip_path, tmp_extract)
-        dfs = []
+    Nada é extraído para disco: o cabeçalho de cada membro é lido direto do ZIP
+    (inspecionar_membro) e só os membros tabulares com as colunas das demonstrações
+    da ANS são lidos, em blocos, pelo parser. O formato detectado no cabeçalho é repassado
+    ao parser, então cada membro é inspecionado uma única vez.
+    """
+    zip_path, _, _ = zip_path_ano_trimestre
 
-        for f in tmp_extract.rglob("*"):
-            df = load_table(f)
-            if df.empty:
+    dfs = []
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        for info in zf.infolist():
+            if info.is_dir():
                 continue
 
-            # somente continua se houver evidência de Eventos/Sinistros
-            if not is_eventos_sinistros_df(df):
+            sufixo = Path(info.filename).suffix.lower()
+            formato = inspecionar_membro(zf, info.filename) if sufixo in EXTENSOES_TEXTO else None
+            if formato is None and sufixo not in EXTENSOES_EXCEL:
                 continue
 
-            df_norm = normalize_and_parse(df, f.name)
+            df_norm = stream_zip_member(zf, info.filename, formato=formato)
             if not df_norm.empty:
                 dfs.append(df_norm)
 
+    return concatenar(dfs) if dfs else None
+
 
-        return pd.concat(dfs, ignore_index=True) if dfs else None
+def planejar_tarefas(zip_path: Path, destino: Path, max_workers: int = MAX_WORKERS) -> list[tuple[tuple, int]]:
+    """
+    Divide um ZIP em tarefas (zip, membro, inicio, fim, destino, nome_parte, formato), lendo só o
+    diretório central e o cabeçalho de cada membro, e retorna cada uma com seu tamanho em bytes
+    descomprimidos. Membros que não são tabulares ou cujo cabeçalho não tem as colunas das
+    demonstrações da ANS (inspecionar_membro) não geram tarefa.
 
-    finally:
-        shutil.rmtree(tmp_extract, ignore_errors=True)
-        zip_path.unlink(missing_ok=True)
+    CSV/TXT maiores que TAMANHO_TRECHO viram vários trechos; os demais membros
+    (ex.: Excel) são uma tarefa cada. O deflate não permite pular direto para o meio
+    do arquivo: cada trecho descomprime (sem parsear) tudo o que vem antes dele, por isso
+    um membro nunca é dividido em mais trechos do que há workers.
+    """
+    tarefas = []
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        for i, info in enumerate(zf.infolist()):
+            if info.is_dir():
+                continue
 
+            sufixo = Path(info.filename).suffix.lower()
+            formato = inspecionar_membro(zf, info.filename) if sufixo in EXTENSOES_TEXTO else None
+            if formato is None and sufixo not in EXTENSOES_EXCEL:
+                continue
 
-def run():
-    # ---------------- cria pastas ----------------
-    for p in [FILES_PATH, INVAL_PATH, VAL_PATH]:
-        p.mkdir(parents=True, exist_ok=True)
+            if formato is not None and info.file_size > TAMANHO_TRECHO:
+                n_trechos = min(max_workers, -(-info.file_size // TAMANHO_TRECHO))
+                passo = -(-info.file_size // n_trechos)
+                limites = list(range(0, info.file_size, passo)) + [None]
+            else:
+                limites = [0, None]
 
-    # ---------------- verifica consolidado existente ----------------
-    if OUT_ALL.exists():
-        print(f"[INFO] Usando consolidado existente: {OUT_ALL}")
-        df_full = pd.read_csv(OUT_ALL, encoding="utf-8")
+            for j, (inicio, fim) in enumerate(zip(limites[:-1], limites[1:])):
+                # Nomes ordenáveis: as partes são lidas de volta na ordem original das linhas
+                tarefa = (zip_path, info.filename, inicio, fim, destino, f"parte-{i:03d}-{j:05d}", formato)
+                tarefas.append((tarefa, (fim if fim is not None else info.file_size) - inicio))
 
-    else:
-        with tempfile.TemporaryDirectory(prefix="ans_") as tmp_dir:
-            downloads = Path(tmp_dir) / "downloads"
-            downloads.mkdir(exist_ok=True)
+    return tarefas
 
-            files_list = list_files_api(verbose=True)[-3:]
 
-            if not files_list:
-                print("[ERRO] Nenhum arquivo encontrado na API.")
-                return
+def processar_tarefa(tarefa) -> dict:
+    """
+    Worker: normaliza um trecho de membro do ZIP e grava o resultado como parte da
+    partição de destino. Retorna só um manifest pequeno (nada de DataFrames pelo IPC).
+    """
+    zip_path, member, inicio, fim, destino, nome, formato = tarefa
+    t0 = time.perf_counter()
+
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        df = stream_zip_member(zf, member, inicio=inicio, fim=fim, formato=formato)
+
+    arquivo = str(salvar_parte(df, destino, nome)) if not df.empty else None
+    return {
+        "membro": member,
+        "inicio": inicio,
+        "linhas": len(df),
+        "arquivo": arquivo,
+        "segundos": round(time.perf_counter() - t0, 3),
+    }
+
+
+def _substituir_particao(temporaria: Path, destino: Path):
+    """ Troca a partição antiga (arquivo único ou diretório de partes) pela recém-gerada. """
+    final = caminho_tabela(destino)
+    if final.is_dir():
+        shutil.rmtree(final)
+    elif final.exists():
+        final.unlink()
+    os.replace(caminho_tabela(temporaria), final)
+
+
+def processar_zips(entradas: list[tuple], max_workers: int | None = None):
+    """
+    Processa vários ZIPs em paralelo no nível de trecho de arquivo: todas as tarefas
+    (de todos os ZIPs) vão para o mesmo pool, das maiores para as menores, e cada worker
+    livre pega a próxima. No máximo TAREFAS_POR_WORKER tarefas por worker ficam em andamento.
+
+    `entradas` é uma lista de (chave, zip_path, destino). Cada partição é gravada numa pasta
+    temporária e só substitui a anterior quando todos os trechos do ZIP terminam.
+    Gera (chave, linhas) à medida que cada ZIP fica pronto; linhas = None se o ZIP falhou.
+    """
+    max_workers = max_workers or MAX_WORKERS
+
+    tarefas, pendentes, linhas, falhas, temporarias = [], {}, {}, set(), {}
+    for chave, zip_path, destino in entradas:
+        temporaria = destino.with_name(destino.name + "_tmp")
+        shutil.rmtree(caminho_tabela(temporaria), ignore_errors=True)
+        temporarias[chave] = (temporaria, destino)
+
+        try:
+            tarefas_zip = planejar_tarefas(zip_path, temporaria, max_workers)
+        except (zipfile.BadZipFile, OSError) as e:
+            print(f"[ERRO] ZIP ilegível {zip_path}: {e}")
+            yield chave, None
+            continue
+
+        tarefas += [(tamanho, chave, tarefa) for tarefa, tamanho in tarefas_zip]
+        pendentes[chave] = len(tarefas_zip)
+        linhas[chave] = 0
+
+    # Maiores primeiro: o último trecho a terminar é pequeno e os workers acabam juntos
+    tarefas.sort(key=lambda t: -t[0])
+
+    def concluir(chave):
+        temporaria, destino = temporarias[chave]
+        if chave in falhas:
+            shutil.rmtree(caminho_tabela(temporaria), ignore_errors=True)
+            return chave, None
+        if linhas[chave] == 0:
+            # ZIP sem Eventos/Sinistros: partição vazia, para não ser reprocessado
+            salvar_parte(pd.DataFrame(columns=COLUNAS_CONSOLIDADO), temporaria, "parte-vazia")
+        _substituir_particao(temporaria, destino)
+        return chave, linhas[chave]
+
+    for chave in [c for c, n in pendentes.items() if n == 0]:
+        yield concluir(chave)
+
+    fila = ((chave, tarefa) for _, chave, tarefa in tarefas)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        em_andamento = {}
+
+        def submeter():
+            for chave, tarefa in fila:
+                em_andamento[executor.submit(processar_tarefa, tarefa)] = chave
+                if len(em_andamento) >= max_workers * TAREFAS_POR_WORKER:
+                    return
+
+        submeter()
+        while em_andamento:
+            prontos, _ = wait(em_andamento, return_when=FIRST_COMPLETED)
+            for future in prontos:
+                chave = em_andamento.pop(future)
+                try:
+                    linhas[chave] += future.result()["linhas"]
+                except Exception as e:
+                    print(f"[ERRO] Falha ao processar {chave}: {e}")
+                    falhas.add(chave)
+
+                pendentes[chave] -= 1
+                if pendentes[chave] == 0:
+                    yield concluir(chave)
+            submeter()
+
+
+def caminho_particao(item) -> Path:
+    """ Caminho (sem extensão) da partição de um arquivo da ANS: Ano=AAAA/Trimestre=T/<nome do zip> """
+    ano, trimestre, filepath = item
+    return PARTICOES_PATH / f"Ano={ano}" / f"Trimestre={trimestre}" / Path(filepath).stem
+
+
+def _baixar_com_hash(item):
+    """ Baixa (ou reaproveita do cache) o ZIP do item; o sha256 vem do próprio cache. """
+    try:
+        return baixar(url_arquivo(item[2]))
+    except Exception as e:
+        print(f"[DOWNLOAD FALHOU] {Path(item[2]).name}: {e}")
+        return None, None
 
-            # ---------------- download paralelo ----------------
-            download_results = []
+
+def consolidar_incremental():
+    """
+    Atualiza apenas os trimestres novos ou alterados na ANS e monta o consolidado
+    a partir das partições locais. Retorna o DataFrame consolidado (ou None).
+    """
+    manifest = carregar_manifest(MANIFEST_PATH)
+
+    with etapa("listagem") as m:
+        files_list = list_files_api(verbose=True)[-3:]
+        m.linhas_saida = len(files_list)
+
+    if not files_list:
+        # Sem acesso à listagem: reaproveita o que já foi processado
+        files_list = [
+            (e["ano"], e["trimestre"], e["filepath"])
+            for e in manifest["arquivos"].values()
+            if existe_tabela(caminho_particao((e["ano"], e["trimestre"], e["filepath"])))
+        ]
+        if not files_list:
+            if existe_tabela(OUT_ALL):
+                print(f"[WARN] Listagem indisponível, usando consolidado existente: {caminho_tabela(OUT_ALL)}")
+                return ler_tabela(OUT_ALL)
+            print("[ERRO] Nenhum arquivo encontrado na API.")
+            return None
+        print("[WARN] Listagem indisponível, usando partições locais.")
+        files_list = sorted(files_list)[-3:]
+
+    else:
+        # ---------------- metadados remotos (HEAD) ----------------
+        with etapa("metadados") as m:
             with ThreadPoolExecutor(max_workers=5) as executor:
+                remotos = dict(zip(files_list, executor.map(metadados_remotos, files_list)))
+
+            pendentes = [
+                item for item in files_list
+                if arquivo_mudou(manifest["arquivos"].get(item[2]), remotos[item])
+                or not existe_tabela(caminho_particao(item))
+            ]
+            m.linhas_entrada, m.linhas_saida = len(files_list), len(pendentes)
+
+        print(f"[INFO] {len(files_list) - len(pendentes)} trimestre(s) sem alteração, {len(pendentes)} a atualizar.")
+
+        if pendentes:
+            # ---------------- download paralelo (cache local) ----------------
+            a_processar = []
+            with etapa("download") as m, ThreadPoolExecutor(max_workers=5) as executor:
                 futures = {
-                    executor.submit(download_file, item, downloads): item
-                    for item in files_list
+                    executor.submit(_baixar_com_hash, item): item
+                    for item in pendentes
                 }
 
                 for future in as_completed(futures):
-                    zip_path, ano, trimestre = future.result()
-                    if zip_path:
-                        download_results.append((zip_path, ano, trimestre))
+                    item = futures[future]
+                    zip_path, sha256 = future.result()
+                    if not zip_path:
+                        continue
+                    m.leu(zip_path)
+
+                    entrada = manifest["arquivos"].get(item[2])
+                    if entrada and entrada.get("sha256") == sha256 and existe_tabela(caminho_particao(item)):
+                        # Metadados mudaram, mas o conteúdo é o mesmo: não reprocessa
+                        registrar_arquivo(manifest, item, remotos[item], sha256, entrada.get("linhas", 0))
+                        continue
+
+                    a_processar.append((item, zip_path, sha256))
+
+                m.linhas_entrada, m.linhas_saida = len(pendentes), len(a_processar)
 
             # ---------------- processamento paralelo ----------------
-            all_dfs = []
-            with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
-                futures = [
-                    executor.submit(process_zip, item)
-                    for item in download_results
-                ]
+            # Workers gravam as partições direto no disco; aqui chegam só as contagens.
+            # (o pico de memória registrado é o do processo principal, não o dos workers)
+            with etapa("processamento", arquivos=len(a_processar)) as m:
+                hashes = {item: sha256 for item, _, sha256 in a_processar}
+                m.bytes_lidos = sum(tamanho_em_disco(zip_path) for _, zip_path, _ in a_processar)
+                m.linhas_saida = 0
 
-                for future in as_completed(futures):
-                    df = future.result()
-                    if df is not None and not df.empty:
-                        all_dfs.append(df)
+                entradas = [(item, zip_path, caminho_particao(item)) for item, zip_path, _ in a_processar]
+                for item, linhas in processar_zips(entradas):
+                    if linhas is None:
+                        continue
+
+                    m.escreveu(caminho_tabela(caminho_particao(item)))
+                    m.linhas_saida += linhas
+
+                    registrar_arquivo(manifest, item, remotos[item], hashes[item], linhas)
+                    salvar_manifest(manifest, MANIFEST_PATH)
+
+        salvar_manifest(manifest, MANIFEST_PATH)
 
-            if not all_dfs:
-                print("[ERRO] Nenhum DataFrame processado.")
-                return
+    # ---------------- monta o consolidado a partir das partições ----------------
+    with etapa("consolidacao") as m:
+        particoes = [caminho_particao(item) for item in files_list if existe_tabela(caminho_particao(item))]
+        dfs = [ler_tabela(p) for p in particoes]
+        dfs = [df for df in dfs if not df.empty]
 
-            df_full = pd.concat(all_dfs, ignore_index=True)
-            df_full.to_csv(OUT_ALL, index=False, encoding="utf-8")
+        if not dfs:
+            print("[ERRO] Nenhum DataFrame processado.")
+            return None
+
+        for p in particoes:
+            m.leu(caminho_tabela(p))
+
+        df_full = concatenar(dfs)
+        m.escreveu(salvar_tabela(df_full, OUT_ALL, particionar=True))
+        m.linhas_saida = len(df_full)
+        m.memoria(df_full)
+
+    return df_full
+
+
+def run(incremental: bool = True):
+    """
+    Executa a integração. No modo incremental (padrão) só baixa e processa os
+    trimestres novos ou alterados desde a última execução (ver manifest.json).
+    """
+    # ---------------- cria pastas ----------------
+    for p in [FILES_PATH, INVAL_PATH, VAL_PATH]:
+        p.mkdir(parents=True, exist_ok=True)
+
+    if incremental:
+        df_full = consolidar_incremental()
+        if df_full is None:
+            return
+
+    # ---------------- verifica consolidado existente ----------------
+    elif existe_tabela(OUT_ALL):
+        print(f"[INFO] Usando consolidado existente: {caminho_tabela(OUT_ALL)}")
+        df_full = ler_tabela(OUT_ALL)
+
+    else:
+        with etapa("listagem") as m:
+            files_list = list_files_api(verbose=True)[-3:]
+            m.linhas_saida = len(files_list)
+
+        if not files_list:
+            print("[ERRO] Nenhum arquivo encontrado na API.")
+            return
+
+        # ---------------- download paralelo (cache local) ----------------
+        download_results = []
+        with etapa("download") as m, ThreadPoolExecutor(max_workers=5) as executor:
+            futures = {
+                executor.submit(download_file, item): item
+                for item in files_list
+            }
+
+            for future in as_completed(futures):
+                zip_path, _, _ = future.result()
+                if zip_path:
+                    download_results.append((futures[future], zip_path))
+                    m.leu(zip_path)
+
+            m.linhas_entrada, m.linhas_saida = len(files_list), len(download_results)
+
+        # ---------------- processamento paralelo ----------------
+        with etapa("processamento", arquivos=len(download_results)) as m:
+            entradas = [(item, zip_path, caminho_particao(item)) for item, zip_path in download_results]
+            m.bytes_lidos = sum(tamanho_em_disco(zip_path) for _, zip_path in download_results)
+            m.linhas_saida = 0
+
+            processados = []
+            for item, linhas in processar_zips(entradas):
+                if linhas:
+                    processados.append(item)
+                    m.linhas_saida += linhas
+
+        if not processados:
+            print("[ERRO] Nenhum DataFrame processado.")
+            return
+
+        with etapa("consolidacao") as m:
+            dfs = [ler_tabela(caminho_particao(item)) for item in sorted(processados)]
+            df_full = concatenar(dfs)
+            m.escreveu(salvar_tabela(df_full, OUT_ALL, particionar=True))
+            m.linhas_saida = len(df_full)
+            m.memoria(df_full)
 
     # ---------------- separa válidos e inválidos ----------------
-    df_validos, df_negativos, df_zero, df_cnpj_invalido = separar_consolidados(
-        df_full,
-        validar_cnpj=False
-    )
+    with etapa("validacao") as m:
+        # Um código por linha e as posições de cada grupo; cada grupo é materializado e
+        # gravado em sequência, então só um deles fica em memória além do consolidado
+        grupos = indices_consolidados(df_full, validar_cnpj=False)
+
+        for grupo, posicoes in grupos.items():
+            destino, particionar = SAIDAS_VALIDACAO[grupo]
+            m.escreveu(salvar_tabela(df_full.take(posicoes), destino, particionar=particionar))
+
+        m.linhas_entrada, m.linhas_saida = len(df_full), len(grupos["validos"])
 
-    df_validos.to_csv(OUT_VALIDOS, index=False, encoding="utf-8")
-    df_negativos.to_csv(OUT_NEGATIVOS, index=False, encoding="utf-8")
-    df_zero.to_csv(OUT_ZERO, index=False, encoding="utf-8")
-    df_cnpj_invalido.to_csv(OUT_CNPJ_INVALIDO, index=False, encoding="utf-8")
+    # ---------------- CSV DE ENTREGA ----------------
+    # As etapas trocam Parquet; o ZIP e o sql/staging/03_load_csv.sql continuam recebendo CSV
+    if resolver_formato() != "csv":
+        with etapa("exportacao_csv") as m:
+            for base in [OUT_ALL] + [destino for destino, _ in SAIDAS_VALIDACAO.values()]:
+                m.escreveu(exportar_csv(base, COLUNAS_CONSOLIDADO))
 
     # ---------------- ZIP FINAL DA PASTA DESPESAS ----------------
     print(f"[INFO] Gerando ZIP final em: {OUT_ZIP}")
-    zip_dir(FILES_PATH, OUT_ZIP)
+    with etapa("zip_despesas") as m:
+        # Só os CSV de entrega: as tabelas Parquet são intermediárias
+        contagem = zip_dir(FILES_PATH, OUT_ZIP, extensoes=(".csv",))
+        print(f"[INFO] ZIP: {contagem['comprimidos']} arquivos comprimidos, {contagem['reaproveitados']} reaproveitados do ZIP anterior")
+        m.leu(FILES_PATH)
+        m.escreveu(OUT_ZIP)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+from pathlib import Path
+
+import pandas as pd
+
+# Importação de funções utilitárias personalizadas para manipulação de arquivos e dados
+from utils.operadoras_utils import carregar_dimensao_operadoras
+from utils.storage_utils import ler_tabela
+from utils.db_utils import conectar, copiar_dataframe
+from utils.metrics_utils import etapa
+
+# Definição dos caminhos base (mesmos do run_aggregate)
+OPERADORAS_DIR = Path("data/operadoras")
+INPUT_ENRIQUECIDO = OPERADORAS_DIR / "despesas_enriquecidas"
+
+COLUNAS_OPERADORA = [
+    "registro_ans", "cnpj", "razao_social", "nome_fantasia",
+    "modalidade", "uf", "data_registro_ans"
+]
+COLUNAS_DESPESA = ["id_operadora", "ano", "trimestre", "valor"]
+
+
+def preparar_operadoras(operadoras: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte a dimensão de operadoras (utils.operadoras_utils) para as colunas da tabela
+    operadora, aplicando as mesmas regras de 04_normalize_operadora.sql.
+    """
+    df = operadoras[COLUNAS_OPERADORA].reset_index(drop=True)
+    df["data_registro_ans"] = df["data_registro_ans"].dt.date
+
+    df = df.dropna(subset=["registro_ans", "cnpj", "razao_social", "modalidade", "uf", "data_registro_ans"])
+    return df.drop_duplicates("cnpj")
+
+
+def preparar_despesas(despesas: pd.DataFrame, ids: pd.DataFrame) -> pd.DataFrame:
+    """
+    Resolve id_operadora em memória (registro ANS e, na falta dele, CNPJ) e
+    aplica as restrições da tabela despesa antes do COPY.
+    """
+    por_registro = pd.Series(ids["id_operadora"].to_numpy(), index=ids["registro_ans"].to_numpy())
+    por_cnpj = pd.Series(ids["id_operadora"].to_numpy(), index=ids["cnpj"].to_numpy())
+
+    registro = pd.to_numeric(despesas["REG_ANS"], errors="coerce")
+    id_operadora = registro.map(por_registro)
+    id_operadora = id_operadora.fillna(despesas["CNPJ"].map(por_cnpj))
+
+    df = pd.DataFrame({
+        "id_operadora": id_operadora.astype("Int64"),
+        "ano": despesas["Ano"],
+        "trimestre": despesas["Trimestre"],
+        "valor": despesas["ValorDespesas"].round(2),
+    })
+
+    valido = (
+        df["id_operadora"].notna()
+        & (df["ano"] >= 2000)
+        & df["trimestre"].between(1, 4)
+        & (df["valor"] > 0)
+    )
+    return df[valido.fillna(False)]
+
+
+def run():
+    """
+    Carrega operadoras e despesas enriquecidas no PostgreSQL via COPY FROM STDIN,
+    sem depender de arquivos montados no container do banco.
+    """
+    with etapa("preparacao_carga") as m:
+        operadoras = preparar_operadoras(carregar_dimensao_operadoras(OPERADORAS_DIR))
+        despesas = ler_tabela(
+            INPUT_ENRIQUECIDO,
+            colunas=["REG_ANS", "CNPJ", "Ano", "Trimestre", "ValorDespesas"]
+        )
+        m.linhas_saida = len(despesas)
+        m.memoria(despesas)
+
+    # psycopg 3: o bloco da conexão faz COMMIT no fim (ROLLBACK se houver erro) e a fecha
+    with conectar() as conn:
+        with conn.cursor() as cur:
+            # Recarga completa numa única transação: a API nunca vê dados pela metade
+            cur.execute("TRUNCATE despesa_agregada, despesa, operadora RESTART IDENTITY")
+
+            with etapa("copy_operadoras") as m:
+                n_operadoras = copiar_dataframe(cur, operadoras, "operadora", COLUNAS_OPERADORA)
+                m.linhas_saida = n_operadoras
+
+            cur.execute("SELECT id_operadora, registro_ans, cnpj FROM operadora")
+            ids = pd.DataFrame(cur.fetchall(), columns=["id_operadora", "registro_ans", "cnpj"])
+
+            with etapa("copy_despesas") as m:
+                m.linhas_entrada = len(despesas)
+                despesas = preparar_despesas(despesas, ids)
+                n_despesas = copiar_dataframe(cur, despesas, "despesa", COLUNAS_DESPESA)
+                m.linhas_saida = n_despesas
+
+            # Tabela agregada (mesma regra de 05_normalize_despesa.sql)
+            with etapa("agregacao_banco"):
+                cur.execute("""
+                    INSERT INTO despesa_agregada (id_operadora, ano, total_despesas, media_trimestral, desvio_padrao)
+                    SELECT
+                        id_operadora,
+                        ano,
+                        SUM(valor),
+                        AVG(valor),
+                        STDDEV_POP(valor)
+                    FROM despesa
+                    GROUP BY id_operadora, ano
+                """)
+
+            # Resumos materializados da API/analytics (08_create_materialized_views.sql).
+            # REFRESH CONCURRENTLY: quem lê as views continua vendo a versão anterior até o COMMIT
+            with etapa("resumos_materializados"):
+                cur.execute("SELECT atualizar_resumos()")
+
+            # Nova versão dos dados: invalida os caches da API
+            cur.execute("INSERT INTO carga_dados DEFAULT VALUES")
+
+    print(f"[OK] Carga concluída: {n_operadoras} operadoras, {n_despesas} despesas.")
+
+
+# Ponto de entrada do script
+if __name__ == "__main__":
+    run()
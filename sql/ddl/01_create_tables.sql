@@ -1,3 +1,13 @@
+-- Extensões para a busca de operadoras (similaridade por trigramas e remoção de acentos)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+
+-- unaccent() é STABLE; o wrapper IMMUTABLE permite usá-lo em índices de expressão
+CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$;
+
+-- =========================================================
 DROP TABLE IF EXISTS operadora CASCADE;
 CREATE TABLE operadora (
     id_operadora        BIGSERIAL PRIMARY KEY,  -- Chave técnica estável
@@ -13,6 +23,13 @@ CREATE TABLE operadora (
 -- Índices para performance de joins e filtros
 CREATE INDEX idx_operadora_cnpj ON operadora (cnpj);
 CREATE INDEX idx_operadora_uf ON operadora (uf);
+CREATE INDEX idx_operadora_razao_id ON operadora (razao_social, id_operadora); -- paginação keyset
+
+-- Busca textual sem acento em razão social + nome fantasia (LIKE '%termo%' e word_similarity)
+CREATE INDEX idx_operadora_busca_trgm ON operadora
+    USING gin (f_unaccent(lower(razao_social || ' ' || coalesce(nome_fantasia, ''))) gin_trgm_ops);
+-- Busca por prefixo de CNPJ (LIKE '123%')
+CREATE INDEX idx_operadora_cnpj_prefixo ON operadora (cnpj bpchar_pattern_ops);
 
 -- =========================================================
 DROP TABLE IF EXISTS despesa CASCADE;
@@ -29,7 +46,7 @@ CREATE INDEX idx_despesa_operadora ON despesa (id_operadora);
 CREATE INDEX idx_despesa_tempo ON despesa (ano, trimestre);
 
 -- =========================================================
-DROP TABLE IF EXISTS despesa_agregada;
+DROP TABLE IF EXISTS despesa_agregada CASCADE;
 CREATE TABLE despesa_agregada (
     id_operadora        BIGINT NOT NULL REFERENCES operadora(id_operadora),
     ano                 SMALLINT NOT NULL,
@@ -37,4 +54,12 @@ CREATE TABLE despesa_agregada (
     media_trimestral    DECIMAL(18,2) NOT NULL,
     desvio_padrao       DECIMAL(18,4) NOT NULL,
     PRIMARY KEY (id_operadora, ano)
-);
\ No newline at end of file
+);
+-- =========================================================
+-- Versão das cargas: cada carga concluída insere uma linha.
+-- A API usa a versão mais recente como chave de cache e ETag.
+-- Não é recriada a cada execução, para a versão nunca voltar atrás.
+CREATE TABLE IF NOT EXISTS carga_dados (
+    versao          BIGSERIAL PRIMARY KEY,
+    concluida_em    TIMESTAMPTZ NOT NULL DEFAULT now()
+);
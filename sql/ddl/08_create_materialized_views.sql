@@ -0,0 +1,143 @@
+-- Resumos materializados para a API e as queries analíticas (07_analytics.sql).
+-- Criados vazios (WITH NO DATA) logo após as tabelas; são preenchidos por
+-- atualizar_resumos() ao fim de cada carga (05_normalize_despesa.sql e scripts/run_load.py).
+-- O DROP TABLE ... CASCADE de 01_create_tables.sql também remove estas views.
+
+-- =========================================================
+-- Despesas por operadora e trimestre
+DROP MATERIALIZED VIEW IF EXISTS mv_despesa_operadora_trimestre;
+CREATE MATERIALIZED VIEW mv_despesa_operadora_trimestre AS
+SELECT
+    id_operadora,
+    ano,
+    trimestre,
+    ano * 10 + trimestre    AS periodo,         -- AAAAT, ordenável
+    SUM(valor)              AS total_despesas,
+    COUNT(*)                AS lancamentos
+FROM despesa
+GROUP BY id_operadora, ano, trimestre
+WITH NO DATA;
+
+-- Índice único: obrigatório para REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX ux_mv_despesa_operadora_trimestre
+    ON mv_despesa_operadora_trimestre (id_operadora, ano, trimestre);
+CREATE INDEX idx_mv_despesa_operadora_trimestre_periodo
+    ON mv_despesa_operadora_trimestre (ano, trimestre);
+
+-- =========================================================
+-- Despesas por UF e trimestre
+DROP MATERIALIZED VIEW IF EXISTS mv_despesa_uf_trimestre;
+CREATE MATERIALIZED VIEW mv_despesa_uf_trimestre AS
+SELECT
+    o.uf,
+    d.ano,
+    d.trimestre,
+    d.ano * 10 + d.trimestre        AS periodo,
+    SUM(d.valor)                    AS total_despesas,
+    COUNT(DISTINCT d.id_operadora)  AS operadoras,
+    COUNT(*)                        AS lancamentos
+FROM despesa d
+JOIN operadora o ON o.id_operadora = d.id_operadora
+GROUP BY o.uf, d.ano, d.trimestre
+WITH NO DATA;
+
+CREATE UNIQUE INDEX ux_mv_despesa_uf_trimestre
+    ON mv_despesa_uf_trimestre (uf, ano, trimestre);
+
+-- =========================================================
+-- Resumo por operadora: totais, médias da despesa_agregada e crescimento
+-- entre o primeiro e o último trimestre com despesas
+DROP MATERIALIZED VIEW IF EXISTS mv_resumo_operadora;
+CREATE MATERIALIZED VIEW mv_resumo_operadora AS
+WITH por_trimestre AS (
+    SELECT id_operadora, ano * 10 + trimestre AS periodo, SUM(valor) AS total
+    FROM despesa
+    GROUP BY id_operadora, ano, trimestre
+),
+limites AS (
+    SELECT
+        id_operadora,
+        MIN(periodo)    AS periodo_inicial,
+        MAX(periodo)    AS periodo_final,
+        SUM(total)      AS total_despesas,
+        COUNT(*)        AS trimestres
+    FROM por_trimestre
+    GROUP BY id_operadora
+),
+agregada AS (
+    SELECT
+        id_operadora,
+        AVG(media_trimestral)   AS media_despesas,
+        AVG(desvio_padrao)      AS desvio_padrao
+    FROM despesa_agregada
+    GROUP BY id_operadora
+)
+SELECT
+    l.id_operadora,
+    l.total_despesas,
+    COALESCE(a.media_despesas, 0)   AS media_despesas,
+    COALESCE(a.desvio_padrao, 0)    AS desvio_padrao,
+    l.trimestres,
+    l.periodo_inicial,
+    l.periodo_final,
+    vi.total                        AS valor_inicial,
+    vf.total                        AS valor_final,
+    CASE
+        WHEN vi.total = 0 THEN NULL
+        ELSE ROUND((vf.total - vi.total) / vi.total * 100, 2)
+    END                             AS crescimento_percentual
+FROM limites l
+JOIN por_trimestre vi ON vi.id_operadora = l.id_operadora AND vi.periodo = l.periodo_inicial
+JOIN por_trimestre vf ON vf.id_operadora = l.id_operadora AND vf.periodo = l.periodo_final
+LEFT JOIN agregada a ON a.id_operadora = l.id_operadora
+WITH NO DATA;
+
+CREATE UNIQUE INDEX ux_mv_resumo_operadora ON mv_resumo_operadora (id_operadora);
+-- Rankings (top N por total e por crescimento) viram leitura do início do índice
+CREATE INDEX idx_mv_resumo_operadora_total ON mv_resumo_operadora (total_despesas DESC);
+CREATE INDEX idx_mv_resumo_operadora_crescimento
+    ON mv_resumo_operadora (crescimento_percentual DESC NULLS LAST);
+
+-- =========================================================
+-- Resumo global (uma linha)
+DROP MATERIALIZED VIEW IF EXISTS mv_resumo_global;
+CREATE MATERIALIZED VIEW mv_resumo_global AS
+SELECT
+    1                                                           AS id,
+    (SELECT COALESCE(SUM(total_despesas), 0) FROM despesa_agregada)   AS total_despesas,
+    (SELECT COALESCE(AVG(media_trimestral), 0) FROM despesa_agregada) AS media_despesas,
+    (SELECT AVG(valor) FROM despesa)                            AS media_lancamento,
+    (SELECT COUNT(DISTINCT id_operadora) FROM despesa)          AS operadoras,
+    (SELECT COUNT(*) FROM despesa)                              AS lancamentos
+WITH NO DATA;
+
+CREATE UNIQUE INDEX ux_mv_resumo_global ON mv_resumo_global (id);
+
+-- =========================================================
+-- Atualiza todos os resumos. Usa CONCURRENTLY (leitores não são bloqueados)
+-- quando a view já foi preenchida; a primeira atualização precisa ser completa.
+CREATE OR REPLACE FUNCTION atualizar_resumos() RETURNS void
+    LANGUAGE plpgsql
+    AS $$
+DECLARE
+    v record;
+BEGIN
+    FOR v IN
+        SELECT matviewname, ispopulated
+        FROM pg_matviews
+        WHERE schemaname = current_schema()
+          AND matviewname = ANY (ARRAY[
+              'mv_despesa_operadora_trimestre',
+              'mv_despesa_uf_trimestre',
+              'mv_resumo_operadora',
+              'mv_resumo_global'
+          ])
+    LOOP
+        IF v.ispopulated THEN
+            EXECUTE format('REFRESH MATERIALIZED VIEW CONCURRENTLY %I', v.matviewname);
+        ELSE
+            EXECUTE format('REFRESH MATERIALIZED VIEW %I', v.matviewname);
+        END IF;
+    END LOOP;
+END
+$$;
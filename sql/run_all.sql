@@ -1,6 +1,7 @@
 -- run_all.sql
 -- 3. Criação das tabelas finais
 \i /sql/ddl/01_create_tables.sql
+\i /sql/ddl/08_create_materialized_views.sql
 
 -- 1. Criação das tabelas staging
 \i /sql/staging/02_create_staging.sql
@@ -1,3 +1,4 @@
+-- Lê os CSV de entrega do pipeline (gravados também quando as etapas usam Parquet)
 COPY operadora_raw FROM '/data/operadoras/Relatorio_cadop.csv'
 DELIMITER ';'
 CSV HEADER
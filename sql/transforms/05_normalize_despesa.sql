@@ -20,3 +20,9 @@ SELECT
     STDDEV_POP(valor) AS desvio_padrao
 FROM despesa
 GROUP BY id_operadora, ano;
+
+-- 4.4 Atualiza os resumos materializados (08_create_materialized_views.sql)
+SELECT atualizar_resumos();
+
+-- 4.5 Registra a nova versão dos dados (invalida os caches da API)
+INSERT INTO carga_dados DEFAULT VALUES;
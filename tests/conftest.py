@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Os módulos do pipeline (utils/, scripts/) são importados a partir da raiz do projeto
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
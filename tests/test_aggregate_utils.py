@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from utils.aggregate_utils import agregar_blocos, agregar_dados
+from utils.storage_utils import PARQUET_DISPONIVEL, salvar_tabela, ler_tabela, listar_particoes
+
+
+def _despesas(n: int = 2_000, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    registros = rng.integers(1, 40, n)
+    ano = rng.choice([2023.0, 2024.0, np.nan], n, p=[0.45, 0.45, 0.1])
+    trimestre = rng.choice([1.0, 2.0, 3.0, 4.0, np.nan], n, p=[0.22, 0.22, 0.22, 0.22, 0.12])
+    valores = rng.normal(1_000, 300, n).round(2)
+    valores[rng.random(n) < 0.05] = np.nan
+
+    return pd.DataFrame({
+        "REG_ANS": registros,
+        "CNPJ": [f"{r:014d}" for r in registros],
+        "RazaoSocial": [f"OPERADORA {r}" for r in registros],
+        "Modalidade": np.where(registros % 2, "Cooperativa Médica", "Medicina de Grupo"),
+        "UF": np.where(registros % 3, "SP", None),
+        "Trimestre": trimestre,
+        "Ano": ano,
+        "ValorDespesas": valores,
+    })
+
+
+def _comparavel(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.astype({c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+    return df.sort_values(["RegistroANS", "Ano"], na_position="last", kind="stable").reset_index(drop=True)
+
+
+@pytest.mark.skipif(not PARQUET_DISPONIVEL, reason="pyarrow não instalado")
+def test_agregar_por_particao_igual_a_agregar_dados(tmp_path):
+    base = tmp_path / "enriquecido"
+    salvar_tabela(_despesas(), base, particionar=True, formato="parquet")
+
+    # As linhas sem Ano/Trimestre ficam nas partições nulas e também precisam ser agregadas
+    particoes = listar_particoes(base, formato="parquet")
+    assert (None, 1) in particoes and (2024, None) in particoes
+
+    esperado = agregar_dados(ler_tabela(base, formato="parquet"))
+    # Mesmo caminho do run_aggregate: uma partição Ano/Trimestre por vez no AgregadorDespesas
+    obtido = agregar_blocos(ler_tabela(base, particoes=[p], formato="parquet") for p in particoes)
+
+    assert esperado["Ano"].isna().any()
+    pdt.assert_frame_equal(_comparavel(obtido), _comparavel(esperado), check_exact=False, rtol=1e-9)
+
+
+def test_agregar_dados_em_blocos_igual_a_inteiro():
+    df = _despesas(seed=3)
+    pdt.assert_frame_equal(
+        _comparavel(agregar_dados(df, tamanho_bloco=97)), _comparavel(agregar_dados(df)),
+        check_exact=False, rtol=1e-9,
+    )
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.cnpj_utils import normalizar_cnpj, normalizar_cnpj_series, valida_cnpj, valida_cnpj_series
+
+
+def _com_digitos(base: str) -> str:
+    def digito(parcial, pesos):
+        resto = sum(int(n) * p for n, p in zip(parcial, pesos)) % 11
+        return "0" if resto < 2 else str(11 - resto)
+
+    d1 = digito(base, [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+    return base + d1 + digito(base + d1, [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+
+
+VALIDO = _com_digitos("112223330001")  # 11222333000181
+
+VALORES = [
+    VALIDO,
+    "11.222.333/0001-81",
+    " 11222333000181 ",
+    "11222333000182",              # dígito verificador errado
+    VALIDO[:-1],                   # curto: 13 dígitos
+    "123",
+    "",
+    VALIDO + "0",                  # longo: 15 dígitos
+    "00000000000000",              # todos iguais
+    "11111111111111",
+    "99.999.999/9999-99",
+    _com_digitos("000000000001"),  # zeros à esquerda
+    "1222333000181",               # zero à esquerda perdido (normaliza para 14 dígitos)
+    "abc",
+    None,
+    np.nan,
+    "１１２２２３３３０００１８１",   # dígitos de largura total (não ASCII)
+    "١١٢٢٢٣٣٣٠٠٠١٨١",              # dígitos arábico-índicos (não ASCII)
+    "11.222.333/0001-81 – matriz",  # pontuação não ASCII
+    "ÇÃO",
+]
+
+
+def _aleatorios(n: int = 2_000, seed: int = 11) -> list:
+    rng = np.random.default_rng(seed)
+    valores = []
+    for _ in range(n):
+        base = "".join(rng.choice(list("0123456789"), 12))
+        cnpj = _com_digitos(base) if rng.random() < 0.5 else base + "".join(rng.choice(list("0123456789"), 2))
+        if rng.random() < 0.3:
+            cnpj = f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]}"
+        if rng.random() < 0.1:
+            cnpj = cnpj[: rng.integers(0, len(cnpj))]
+        valores.append(cnpj)
+    return valores
+
+
+SERIES = {
+    "object": lambda v: pd.Series(v, dtype=object),
+    "str": lambda v: pd.Series(v, dtype="str"),
+    "category": lambda v: pd.Series(v, dtype="category"),
+}
+
+
+def _mesmo_valor(a, b) -> bool:
+    return (pd.isna(a) and pd.isna(b)) or a == b
+
+
+@pytest.mark.parametrize("tipo", SERIES)
+@pytest.mark.parametrize("valores", [VALORES, _aleatorios()], ids=["casos", "aleatorios"])
+def test_valida_cnpj_series_igual_ao_escalar(tipo, valores):
+    serie = SERIES[tipo](valores)
+    serie.index = serie.index * 3  # índice não padrão também é preservado
+
+    obtido = valida_cnpj_series(serie)
+
+    assert obtido.dtype == bool
+    assert obtido.index.equals(serie.index)
+    assert obtido.tolist() == [valida_cnpj(v) for v in serie]
+
+
+@pytest.mark.parametrize("tipo", SERIES)
+@pytest.mark.parametrize("valores", [VALORES, _aleatorios()], ids=["casos", "aleatorios"])
+def test_normalizar_cnpj_series_igual_ao_escalar(tipo, valores):
+    serie = SERIES[tipo](valores)
+
+    obtido = normalizar_cnpj_series(serie)
+
+    esperado = [normalizar_cnpj(v) for v in serie]
+    assert all(_mesmo_valor(a, b) for a, b in zip(obtido.tolist(), esperado, strict=True))
+
+
+def test_casos_de_borda():
+    serie = pd.Series(VALORES, dtype=object)
+    valido = dict(zip(VALORES[:14], valida_cnpj_series(serie)))
+
+    assert valido[VALIDO] and valido["11.222.333/0001-81"]
+    assert not valido["00000000000000"] and not valido["11111111111111"]
+    assert not valido[VALIDO[:-1]] and not valido[VALIDO + "0"]
+    assert valida_cnpj_series(pd.Series([], dtype=object)).empty
+    assert not valida_cnpj_series(pd.Series([np.nan, None], dtype="category")).any()
+
+
+@pytest.mark.parametrize("serie", [
+    pd.Series([11222333000181, 1222333000181, 11222333000182, 123]),
+    pd.Series([11222333000181, None, 1222333000181], dtype="Int64"),
+    pd.Series([11222333000181.0, np.nan]),
+], ids=["int64", "Int64", "float64"])
+def test_coluna_numerica_igual_ao_escalar(serie):
+    assert valida_cnpj_series(serie).tolist() == [valida_cnpj(v) for v in serie]
+    esperado = [normalizar_cnpj(v) for v in serie]
+    assert all(_mesmo_valor(a, b) for a, b in zip(normalizar_cnpj_series(serie).tolist(), esperado, strict=True))
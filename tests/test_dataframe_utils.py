@@ -0,0 +1,142 @@
+import zipfile
+from io import BytesIO, StringIO
+
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from utils import dataframe_utils
+from utils.dataframe_utils import inspecionar_membro, iter_zip_member_chunks
+
+CABECALHO = "DATA;REG_ANS;CD_CONTA_CONTABIL;DESCRICAO;VL_SALDO_INICIAL;VL_SALDO_FINAL\n"
+OUTRA = "PROVISAO TECNICA"
+SINISTROS = "DESPESAS COM EVENTOS / SINISTROS"
+
+
+def _linhas(n: int, descricao=lambda i: OUTRA) -> str:
+    return "".join(
+        f"2024-01-01;{300000 + i % 50};41{i % 7};{descricao(i)};{i},10;{i * 2},55\n" for i in range(n)
+    )
+
+
+def _zip(tmp_path, texto: str, encoding: str = "utf-8") -> zipfile.ZipFile:
+    path = tmp_path / "1T2024.zip"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("1T2024.csv", (CABECALHO + texto).encode(encoding))
+    return zipfile.ZipFile(path)
+
+
+def _contar_aberturas(zf, monkeypatch) -> list:
+    aberturas = []
+    abrir = zf.open
+
+    def open(nome, *args, **kwargs):
+        aberturas.append(nome)
+        return abrir(nome, *args, **kwargs)
+
+    monkeypatch.setattr(zf, "open", open)
+    return aberturas
+
+
+def _esperado(texto: str, formato) -> pd.DataFrame:
+    return pd.read_csv(StringIO(CABECALHO + texto), sep=";", dtype=str, usecols=formato.usecols)
+
+
+def _ler(zf, **kwargs) -> pd.DataFrame:
+    blocos = list(iter_zip_member_chunks(zf, "1T2024.csv", chunksize=1_000, **kwargs))
+    return pd.concat(blocos, ignore_index=True) if blocos else pd.DataFrame()
+
+
+@pytest.fixture
+def blocos_pequenos(monkeypatch):
+    monkeypatch.setattr(dataframe_utils, "TAMANHO_BLOCO_TRECHO", 4 * 1024)
+
+
+def test_pre_varredura_e_parser_no_mesmo_stream(tmp_path, monkeypatch, blocos_pequenos):
+    texto = _linhas(20_000, lambda i: SINISTROS if i % 3 == 0 else OUTRA)
+    zf = _zip(tmp_path, texto)
+    formato = inspecionar_membro(zf, "1T2024.csv")
+    aberturas = _contar_aberturas(zf, monkeypatch)
+
+    df = _ler(zf, formato=formato)
+
+    assert len(aberturas) == 1
+    pdt.assert_frame_equal(df, _esperado(texto, formato))
+
+
+def test_membro_sem_sinistros_nao_gera_blocos(tmp_path, monkeypatch, blocos_pequenos):
+    zf = _zip(tmp_path, _linhas(5_000))
+    formato = inspecionar_membro(zf, "1T2024.csv")
+    aberturas = _contar_aberturas(zf, monkeypatch)
+
+    assert _ler(zf, formato=formato).empty
+    assert len(aberturas) == 1
+
+
+def test_primeira_ocorrencia_depois_do_limite(tmp_path, monkeypatch, blocos_pequenos):
+    # Acima de LIMITE_PRE_VARREDURA os blocos deixam de ser guardados e o trecho é reaberto
+    monkeypatch.setattr(dataframe_utils, "LIMITE_PRE_VARREDURA", 16 * 1024)
+    texto = _linhas(20_000, lambda i: SINISTROS if i == 19_990 else OUTRA)
+    zf = _zip(tmp_path, texto)
+    formato = inspecionar_membro(zf, "1T2024.csv")
+    aberturas = _contar_aberturas(zf, monkeypatch)
+
+    df = _ler(zf, formato=formato)
+
+    assert len(aberturas) == 2
+    pdt.assert_frame_equal(df, _esperado(texto, formato))
+
+
+def test_trechos_cobrem_o_membro_sem_repetir_linhas(tmp_path, monkeypatch, blocos_pequenos):
+    texto = _linhas(20_000, lambda i: SINISTROS if i % 5 == 0 else OUTRA)
+    zf = _zip(tmp_path, texto)
+    formato = inspecionar_membro(zf, "1T2024.csv")
+    tamanho = zf.getinfo("1T2024.csv").file_size
+    aberturas = _contar_aberturas(zf, monkeypatch)
+
+    limites = [0, tamanho // 3, 2 * tamanho // 3, None]
+    partes = [_ler(zf, inicio=a, fim=b, formato=formato) for a, b in zip(limites[:-1], limites[1:])]
+
+    assert len(aberturas) == 3
+    pdt.assert_frame_equal(pd.concat(partes, ignore_index=True), _esperado(texto, formato))
+
+
+def _esperado_bytes(dados: bytes, formato, encoding: str) -> pd.DataFrame:
+    return pd.read_csv(BytesIO(dados), sep=";", dtype=str, usecols=formato.usecols, encoding=encoding)
+
+
+def test_latin1_depois_da_amostra_relido_como_latin1(tmp_path, capsys):
+    # Primeiros 64 KiB só com ASCII: a amostra indica UTF-8, mas o arquivo é Latin-1
+    texto = _linhas(30_000, lambda i: SINISTROS if i % 2 else ("PROVISÃO" if i > 20_000 else OUTRA))
+    zf = _zip(tmp_path, texto, encoding="latin1")
+    formato = inspecionar_membro(zf, "1T2024.csv")
+    assert formato.encoding == "utf-8"
+
+    df = _ler(zf, formato=formato)
+
+    assert "relendo como latin1" in capsys.readouterr().out
+    pdt.assert_frame_equal(df, _esperado_bytes((CABECALHO + texto).encode("latin1"), formato, "latin1"))
+    assert (df["DESCRICAO"] == "PROVISÃO").sum() == texto.count("PROVISÃO")
+
+
+def test_trecho_com_latin1_depois_da_amostra(tmp_path):
+    texto = _linhas(30_000, lambda i: SINISTROS if i % 2 else ("PROVISÃO" if i > 25_000 else OUTRA))
+    zf = _zip(tmp_path, texto, encoding="latin1")
+    formato = inspecionar_membro(zf, "1T2024.csv")
+    tamanho = zf.getinfo("1T2024.csv").file_size
+
+    partes = [_ler(zf, inicio=a, fim=b, formato=formato) for a, b in [(0, tamanho // 2), (tamanho // 2, None)]]
+
+    esperado = _esperado_bytes((CABECALHO + texto).encode("latin1"), formato, "latin1")
+    pdt.assert_frame_equal(pd.concat(partes, ignore_index=True), esperado)
+
+
+def test_utf8_com_acentos_nao_e_relido(tmp_path, capsys):
+    texto = _linhas(30_000, lambda i: SINISTROS if i % 2 else "PROVISÃO TÉCNICA")
+    zf = _zip(tmp_path, texto)
+    formato = inspecionar_membro(zf, "1T2024.csv")
+
+    df = _ler(zf, formato=formato)
+
+    assert "relendo" not in capsys.readouterr().out
+    pdt.assert_frame_equal(df, _esperado(texto, formato))
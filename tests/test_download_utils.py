@@ -0,0 +1,250 @@
+import hashlib
+import importlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from utils import download_utils
+
+ARQUIVO = "/demonstracoes_contabeis/2024/1T2024.zip"
+CONTEUDO = bytes(range(256)) * 1_200          # ~300 KB: vários blocos de TAMANHO_BLOCO
+CONTEUDO_NOVO = bytes(reversed(range(256))) * 1_300
+
+
+class _Servidor:
+    """ Estado do servidor local: arquivos publicados, falhas programadas e pedidos recebidos. """
+
+    def __init__(self):
+        self.arquivos = {}      # caminho -> (conteúdo, etag)
+        self.falhas = {}        # caminho -> quantidade de 503 antes de responder
+        self.cortes = {}        # caminho -> bytes enviados antes de derrubar a conexão
+        self.trocas = {}        # caminho -> (conteúdo, etag) publicado logo após o corte
+        self.pedidos = []       # (caminho, cabeçalhos, status)
+
+    def publicar(self, caminho: str, conteudo: bytes, etag: str):
+        self.arquivos[caminho] = (conteudo, etag)
+
+    def status(self, caminho: str) -> list[int]:
+        return [s for c, _, s in self.pedidos if c == caminho]
+
+    def cabecalhos(self, caminho: str) -> list[dict]:
+        return [h for c, h, _ in self.pedidos if c == caminho]
+
+
+def _handler(estado: _Servidor):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _responder(self, status: int, corpo: bytes = b"", cabecalhos: dict | None = None, tamanho: int | None = None):
+            estado.pedidos.append((self.path.removeprefix("/FTP/PDA"), dict(self.headers), status))
+            self.send_response(status)
+            for nome, valor in (cabecalhos or {}).items():
+                self.send_header(nome, valor)
+            self.send_header("Content-Length", str(len(corpo) if tamanho is None else tamanho))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def do_GET(self):
+            caminho = self.path.removeprefix("/FTP/PDA")
+            if estado.falhas.get(caminho):
+                estado.falhas[caminho] -= 1
+                self._responder(503)
+                return
+            if caminho not in estado.arquivos:
+                self._responder(404)
+                return
+
+            conteudo, etag = estado.arquivos[caminho]
+            if self.headers.get("If-None-Match") == etag:
+                self._responder(304, cabecalhos={"ETag": etag})
+                return
+
+            status, inicio = 200, 0
+            faixa, if_range = self.headers.get("Range"), self.headers.get("If-Range")
+            if faixa and (if_range is None or if_range == etag):
+                inicio = int(faixa.removeprefix("bytes=").split("-")[0])
+                if inicio >= len(conteudo):
+                    self._responder(416, cabecalhos={"Content-Range": f"bytes */{len(conteudo)}"})
+                    return
+                status = 206
+
+            cabecalhos = {"ETag": etag, "Last-Modified": "Mon, 01 Apr 2024 00:00:00 GMT"}
+            if status == 206:
+                cabecalhos["Content-Range"] = f"bytes {inicio}-{len(conteudo) - 1}/{len(conteudo)}"
+            corpo = conteudo[inicio:]
+
+            if caminho in estado.cortes:
+                # Anuncia o corpo inteiro, mas derruba a conexão no meio
+                corte = estado.cortes.pop(caminho)
+                self._responder(status, corpo[:corte], cabecalhos, tamanho=len(corpo))
+                self.close_connection = True
+                if caminho in estado.trocas:
+                    estado.arquivos[caminho] = estado.trocas.pop(caminho)
+                return
+
+            self._responder(status, corpo, cabecalhos)
+
+    return Handler
+
+
+@pytest.fixture
+def servidor(tmp_path, monkeypatch):
+    """ Servidor HTTP local no lugar do portal da ANS, apontado via ANS_BASE_URL, e cache em tmp_path. """
+    estado = _Servidor()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _handler(estado))
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setenv("ANS_BASE_URL", f"http://127.0.0.1:{httpd.server_address[1]}/FTP/PDA")
+    monkeypatch.setenv("ANS_CACHE_DIR", str(tmp_path / "cache"))
+    importlib.reload(download_utils)
+
+    esperas = []
+    monkeypatch.setattr(download_utils.time, "sleep", esperas.append)
+    estado.esperas = esperas
+
+    yield estado
+
+    httpd.shutdown()
+    httpd.server_close()
+    thread.join()
+    monkeypatch.undo()
+    importlib.reload(download_utils)
+
+
+def _url(caminho: str = ARQUIVO) -> str:
+    return f"{download_utils.ANS_BASE_URL}{caminho}"
+
+
+def _sha(conteudo: bytes) -> str:
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def test_304_reaproveita_objeto_do_cache(servidor):
+    servidor.publicar(ARQUIVO, CONTEUDO, '"v1"')
+
+    caminho, sha = download_utils.baixar(_url())
+    mtime = caminho.stat().st_mtime_ns
+    caminho2, sha2 = download_utils.baixar(_url())
+
+    assert (caminho2, sha2) == (caminho, sha) and sha == _sha(CONTEUDO)
+    assert servidor.status(ARQUIVO) == [200, 304]
+    assert servidor.cabecalhos(ARQUIVO)[1]["If-None-Match"] == '"v1"'
+    assert caminho.read_bytes() == CONTEUDO and caminho.stat().st_mtime_ns == mtime
+
+
+def test_arquivo_alterado_substitui_objeto_antigo(servidor):
+    servidor.publicar(ARQUIVO, CONTEUDO, '"v1"')
+    antigo, _ = download_utils.baixar(_url())
+
+    servidor.publicar(ARQUIVO, CONTEUDO_NOVO, '"v2"')
+    novo, sha = download_utils.baixar(_url())
+
+    assert servidor.status(ARQUIVO) == [200, 200]
+    assert sha == _sha(CONTEUDO_NOVO) and novo.read_bytes() == CONTEUDO_NOVO
+    assert not antigo.exists()
+
+
+def test_retoma_com_range_apos_corpo_truncado(servidor):
+    servidor.publicar(ARQUIVO, CONTEUDO, '"v1"')
+    servidor.cortes[ARQUIVO] = 200_000
+
+    caminho, sha = download_utils.baixar(_url())
+
+    assert servidor.status(ARQUIVO) == [200, 206]
+    retomada = servidor.cabecalhos(ARQUIVO)[1]
+    assert retomada["If-Range"] == '"v1"'
+    assert int(retomada["Range"].removeprefix("bytes=").rstrip("-")) > 0
+    assert sha == _sha(CONTEUDO) and caminho.read_bytes() == CONTEUDO
+    assert not any((download_utils.CACHE_DIR / "parciais").iterdir())
+    assert servidor.esperas == [download_utils.BACKOFF_INICIAL]
+
+
+def test_if_range_volta_para_200_quando_etag_muda(servidor):
+    servidor.publicar(ARQUIVO, CONTEUDO, '"v1"')
+    servidor.cortes[ARQUIVO] = 200_000
+    servidor.trocas[ARQUIVO] = (CONTEUDO_NOVO, '"v2"')
+
+    caminho, sha = download_utils.baixar(_url())
+
+    # O servidor ignora o Range (validador antigo) e manda o arquivo novo inteiro
+    assert servidor.status(ARQUIVO) == [200, 200]
+    assert servidor.cabecalhos(ARQUIVO)[1]["If-Range"] == '"v1"'
+    assert sha == _sha(CONTEUDO_NOVO) and caminho.read_bytes() == CONTEUDO_NOVO
+    assert download_utils.entrada_cache(_url())["etag"] == '"v2"'
+
+
+def test_parcial_maior_que_o_remoto_recomeca(servidor):
+    servidor.publicar(ARQUIVO, CONTEUDO, '"v1"')
+    chave = download_utils._chave_url(_url())
+    parciais = download_utils.CACHE_DIR / "parciais"
+    parciais.mkdir(parents=True)
+    (parciais / f"{chave}.part").write_bytes(b"x" * (len(CONTEUDO) + 10))
+    download_utils._gravar_json(parciais / f"{chave}.json", {"url": _url(), "validador": '"v1"'})
+
+    caminho, sha = download_utils.baixar(_url())
+
+    assert servidor.status(ARQUIVO) == [416, 200]
+    assert sha == _sha(CONTEUDO) and caminho.read_bytes() == CONTEUDO
+
+
+def test_repete_5xx_com_backoff_exponencial(servidor):
+    servidor.publicar(ARQUIVO, CONTEUDO, '"v1"')
+    servidor.falhas[ARQUIVO] = 2
+
+    _, sha = download_utils.baixar(_url())
+
+    assert servidor.status(ARQUIVO) == [503, 503, 200]
+    assert servidor.esperas == [download_utils.BACKOFF_INICIAL, 2 * download_utils.BACKOFF_INICIAL]
+    assert sha == _sha(CONTEUDO)
+
+
+def test_5xx_persistente_esgota_tentativas(servidor):
+    servidor.publicar(ARQUIVO, CONTEUDO, '"v1"')
+    servidor.falhas[ARQUIVO] = 10
+
+    with pytest.raises(requests.HTTPError):
+        download_utils.baixar(_url(), tentativas=3)
+
+    assert servidor.status(ARQUIVO) == [503, 503, 503]
+    assert len(servidor.esperas) == 2
+
+
+def test_4xx_falha_sem_repetir(servidor):
+    with pytest.raises(requests.HTTPError):
+        download_utils.baixar(_url("/inexistente.zip"))
+
+    assert servidor.status("/inexistente.zip") == [404]
+    assert servidor.esperas == []
+
+
+def test_objeto_truncado_no_cache_e_descartado(servidor):
+    servidor.publicar(ARQUIVO, CONTEUDO, '"v1"')
+    caminho, _ = download_utils.baixar(_url())
+    caminho.write_bytes(CONTEUDO[:1_000])
+
+    caminho2, sha = download_utils.baixar(_url())
+
+    # Sem GET condicional: um 304 reaproveitaria o objeto truncado
+    assert servidor.status(ARQUIVO) == [200, 200]
+    assert "If-None-Match" not in servidor.cabecalhos(ARQUIVO)[1]
+    assert caminho2 == caminho and caminho.read_bytes() == CONTEUDO and sha == _sha(CONTEUDO)
+
+
+@pytest.mark.parametrize("conteudo", [b"{\"url\": ", b"\xff\xfe\x00", b"[]", b"{\"url\": \"x\"}"])
+def test_entrada_corrompida_no_cache_e_descartada(servidor, conteudo):
+    servidor.publicar(ARQUIVO, CONTEUDO, '"v1"')
+    download_utils.baixar(_url())
+    (download_utils.CACHE_DIR / "urls" / f"{download_utils._chave_url(_url())}.json").write_bytes(conteudo)
+
+    assert download_utils.entrada_cache(_url()) is None
+    caminho, sha = download_utils.baixar(_url())
+
+    assert servidor.status(ARQUIVO) == [200, 200]
+    assert sha == _sha(CONTEUDO) and caminho.read_bytes() == CONTEUDO
+    assert download_utils.entrada_cache(_url())["sha256"] == sha
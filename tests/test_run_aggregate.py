@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+import pytest
+
+from scripts import run_aggregate
+from utils.aggregate_utils import agregar_dados
+from utils.storage_utils import PARQUET_DISPONIVEL, salvar_tabela, ler_tabela, listar_particoes
+
+pytestmark = pytest.mark.skipif(not PARQUET_DISPONIVEL, reason="pyarrow não instalado")
+
+PARTICOES = [(2024, 1), (2024, 2), (2024, 3), (None, 4)]
+
+
+def _validos(n: int = 400) -> pd.DataFrame:
+    rng = np.random.default_rng(9)
+    registros = rng.integers(300_000, 300_020, n)
+    particoes = [PARTICOES[i] for i in rng.integers(0, len(PARTICOES), n)]
+    return pd.DataFrame({
+        "REG_ANS": registros,
+        "CNPJ": [f"{r:014d}" for r in registros],
+        "RazaoSocial": [f"OPERADORA {r}" for r in registros],
+        "Trimestre": [t for _, t in particoes],
+        "Ano": [a for a, _ in particoes],
+        "ValorDespesas": rng.normal(1_000, 300, n).round(2),
+    })
+
+
+def _comparavel(df: pd.DataFrame, chaves: list[str]) -> pd.DataFrame:
+    df = df.astype({c: object for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)})
+    return df.sort_values(chaves, na_position="last", kind="stable").reset_index(drop=True)
+
+
+@pytest.mark.parametrize("vazias", [
+    [],
+    [(2024, 1)],                                  # primeira partição sem nenhuma linha enriquecida
+    [(2024, 2)],                                  # partição do meio
+    [(None, 4)],                                  # partição nula, a última
+    [(2024, 1), (2024, 3)],
+    PARTICOES,                                    # nenhuma linha enriquecida
+], ids=["nenhuma", "primeira", "meio", "nula", "primeira_e_meio", "todas"])
+def test_particoes_que_enriquecem_para_zero_linhas(tmp_path, monkeypatch, vazias):
+    monkeypatch.chdir(tmp_path)
+    salvar_tabela(_validos(), run_aggregate.INPUT_VALIDOS, particionar=True, formato="parquet")
+    particoes = listar_particoes(run_aggregate.INPUT_VALIDOS)
+    assert particoes == PARTICOES
+
+    # Simula um trimestre em que nenhum REG_ANS/CNPJ está no cadastro ativo
+    def enriquecer(despesas, operadoras):
+        df = despesas.assign(Modalidade="Medicina de Grupo", UF="SP")[run_aggregate.COLUNAS_ENRIQUECIDO]
+        chave = tuple(None if pd.isna(v) else int(v) for v in df[["Ano", "Trimestre"]].iloc[0])
+        return df.iloc[:0] if chave in vazias else df
+
+    monkeypatch.setattr(run_aggregate, "enriquecer_dados", enriquecer)
+    agregado = run_aggregate._agregar_por_particao(None, particoes)
+
+    esperado = pd.concat([enriquecer(ler_tabela(run_aggregate.INPUT_VALIDOS, particoes=[p]), None) for p in particoes])
+    enriquecido = ler_tabela(run_aggregate.OUTPUT_ENRIQUECIDO)
+    chaves = ["REG_ANS", "Ano", "Trimestre", "ValorDespesas"]
+    pdt.assert_frame_equal(
+        _comparavel(enriquecido[esperado.columns], chaves), _comparavel(esperado, chaves), check_dtype=False
+    )
+
+    assert len(agregado) == len(agregar_dados(esperado))
+    if not esperado.empty:
+        pdt.assert_frame_equal(
+            _comparavel(agregado, ["RegistroANS", "Ano"]), _comparavel(agregar_dados(esperado), ["RegistroANS", "Ano"]),
+            check_exact=False, rtol=1e-9,
+        )
@@ -0,0 +1,34 @@
+import zipfile
+from collections import Counter
+
+from scripts import run_integration
+
+CABECALHO = "DATA;REG_ANS;CD_CONTA_CONTABIL;DESCRICAO;VL_SALDO_INICIAL;VL_SALDO_FINAL\n"
+
+
+def test_process_zip_inspeciona_cada_membro_uma_vez(tmp_path, monkeypatch):
+    linhas = "".join(
+        f"2024-04-01;{300000 + i};411;DESPESAS COM EVENTOS / SINISTROS;1.000,{i % 100:02d};2,00\n" for i in range(500)
+    )
+    path = tmp_path / "2T2024.zip"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("2T2024.csv", CABECALHO + linhas)
+        zf.writestr("outro.csv", "a;b;c\n1;2;3\n")
+        zf.writestr("LEIAME.txt", "Demonstrações contábeis\n")
+        zf.writestr("logo.png", b"\x89PNG")
+
+    aberturas = Counter()
+    abrir = zipfile.ZipFile.open
+
+    def open(self, nome, *args, **kwargs):
+        aberturas[getattr(nome, "filename", nome)] += 1
+        return abrir(self, nome, *args, **kwargs)
+
+    monkeypatch.setattr(zipfile.ZipFile, "open", open)
+    df = run_integration.process_zip((path, 2024, 2))
+
+    assert len(df) == 500
+    # Cabeçalho (inspecionar_membro) + um único stream para pré-varredura e parser
+    assert aberturas["2T2024.csv"] == 2
+    assert aberturas["outro.csv"] == aberturas["LEIAME.txt"] == 1
+    assert aberturas["logo.png"] == 0
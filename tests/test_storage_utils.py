@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import storage_utils
+from utils.schema_utils import tipar_colunas
+from utils.storage_utils import PARQUET_DISPONIVEL, exportar_csv, salvar_tabela, caminho_tabela
+
+COLUNAS = ["REG_ANS", "CNPJ", "RazaoSocial", "Trimestre", "Ano", "ValorDespesas"]
+
+pytestmark = pytest.mark.skipif(not PARQUET_DISPONIVEL, reason="pyarrow não instalado")
+
+
+def _consolidado(n: int = 1_000) -> pd.DataFrame:
+    rng = np.random.default_rng(5)
+    registros = rng.integers(300_000, 300_050, n)
+    df = pd.DataFrame({
+        "REG_ANS": registros,
+        "CNPJ": [f"{r:014d}" for r in registros],
+        "RazaoSocial": [f"OPERADORA DE SAÚDE {r}" for r in registros],
+        "Trimestre": rng.choice([1.0, 2.0, 3.0, np.nan], n),
+        "Ano": rng.choice([2023.0, 2024.0, np.nan], n),
+        "ValorDespesas": rng.normal(1_000, 300, n).round(2),
+    })
+    # Mesma ordem das linhas que a exportação por partição (Ano, Trimestre, nulos por último)
+    return df.sort_values(["Ano", "Trimestre"], na_position="last", kind="stable").reset_index(drop=True)
+
+
+@pytest.mark.parametrize("particionar", [True, False])
+def test_exportar_csv_igual_ao_pipeline_em_csv(tmp_path, particionar):
+    # As etapas gravam o DataFrame já no esquema do pipeline (Ano/Trimestre inteiros, textos como categoria)
+    df = tipar_colunas(_consolidado())
+    salvar_tabela(df, tmp_path / "csv" / "consolidado", formato="csv")
+    salvar_tabela(df, tmp_path / "parquet" / "consolidado", particionar=particionar, formato="parquet")
+
+    destino = exportar_csv(tmp_path / "parquet" / "consolidado", COLUNAS)
+
+    assert destino == caminho_tabela(tmp_path / "parquet" / "consolidado", "csv")
+    assert destino.read_bytes() == caminho_tabela(tmp_path / "csv" / "consolidado", "csv").read_bytes()
+    assert not destino.with_name(destino.name + ".tmp").exists()
+
+
+def test_exportar_csv_sem_nada_a_fazer_em_csv(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_utils, "FORMATO_SAIDA", "csv")
+    salvar_tabela(_consolidado(10), tmp_path / "consolidado")
+    antes = caminho_tabela(tmp_path / "consolidado").stat().st_mtime_ns
+
+    destino = exportar_csv(tmp_path / "consolidado", COLUNAS)
+
+    assert destino.stat().st_mtime_ns == antes
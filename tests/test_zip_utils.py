@@ -0,0 +1,133 @@
+import os
+import types
+import zipfile
+
+import numpy as np
+import pytest
+
+from utils import zip_utils
+from utils.zip_utils import zip_dir
+
+
+@pytest.fixture(autouse=True)
+def manifest_temporario(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_utils, "ZIP_MANIFEST_DIR", tmp_path / "manifest")
+
+
+def _conteudo(tamanho: int, seed: int = 0) -> bytes:
+    # Texto repetitivo com trechos aleatórios: comprime, mas não é trivial
+    rng = np.random.default_rng(seed)
+    linhas = (f"{i};{rng.integers(0, 10**6)};DESPESAS COM EVENTOS\n" for i in range(tamanho // 20 + 1))
+    return "".join(linhas).encode("utf-8")[:tamanho]
+
+
+def _ler_zip(path) -> dict:
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        return {info.filename: zf.read(info) for info in zf.infolist()}
+
+
+def _escrever(pasta, arquivos: dict):
+    for nome, dados in arquivos.items():
+        destino = pasta / nome
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        destino.write_bytes(dados)
+
+
+def test_ida_e_volta_com_varios_blocos_e_membro_vazio(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_utils, "TAMANHO_BLOCO_ZIP", 64 * 2**10)
+    arquivos = {
+        "grande.csv": _conteudo(1_000_000),
+        "exato.csv": _conteudo(2 * 64 * 2**10, seed=1),
+        "vazio.csv": b"",
+        "sub/pequeno.csv": b"REG_ANS;CNPJ\n123;00000000000191\n",
+        "sub/acentuação.txt": "Razão Social".encode("utf-8"),
+    }
+    _escrever(tmp_path / "origem", arquivos)
+
+    contagem = zip_dir(tmp_path / "origem", tmp_path / "saida.zip", max_workers=4)
+
+    assert contagem == {"comprimidos": len(arquivos), "reaproveitados": 0}
+    assert _ler_zip(tmp_path / "saida.zip") == arquivos
+
+
+@pytest.mark.parametrize("nivel", [0, 1, 9])
+def test_niveis_de_compressao(tmp_path, monkeypatch, nivel):
+    monkeypatch.setattr(zip_utils, "TAMANHO_BLOCO_ZIP", 64 * 2**10)
+    arquivos = {"a.csv": _conteudo(300_000)}
+    _escrever(tmp_path / "origem", arquivos)
+
+    zip_dir(tmp_path / "origem", tmp_path / "saida.zip", nivel=nivel)
+
+    assert _ler_zip(tmp_path / "saida.zip") == arquivos
+
+
+def test_membros_reaproveitados_do_zip_anterior(tmp_path, monkeypatch):
+    monkeypatch.setattr(zip_utils, "TAMANHO_BLOCO_ZIP", 64 * 2**10)
+    origem, saida = tmp_path / "origem", tmp_path / "saida.zip"
+    arquivos = {"a.csv": _conteudo(200_000), "b.csv": _conteudo(150_000, seed=2), "vazio.csv": b""}
+    _escrever(origem, arquivos)
+    zip_dir(origem, saida)
+
+    # Sem mudanças: tudo copiado já comprimido
+    assert zip_dir(origem, saida) == {"comprimidos": 0, "reaproveitados": 3}
+    assert _ler_zip(saida) == arquivos
+
+    # Conteúdo alterado é comprimido de novo; conteúdo renomeado é achado pelo hash
+    (origem / "b.csv").unlink()
+    arquivos.pop("b.csv")
+    arquivos["c.csv"] = _conteudo(150_000, seed=2)
+    arquivos["a.csv"] = _conteudo(200_000, seed=3)
+    _escrever(origem, arquivos)
+
+    assert zip_dir(origem, saida) == {"comprimidos": 1, "reaproveitados": 2}
+    assert _ler_zip(saida) == arquivos
+
+    # Outro nível de compressão invalida o reaproveitamento
+    assert zip_dir(origem, saida, nivel=1) == {"comprimidos": 3, "reaproveitados": 0}
+    assert _ler_zip(saida) == arquivos
+
+
+def test_cabecalho_local_zip64(tmp_path, monkeypatch):
+    # Limite zip64 reduzido só para o escritor: o cabeçalho local ganha o extra zip64
+    # (versão 45 e tamanhos 0xFFFFFFFF), e o leitor usa os tamanhos do diretório central
+    zipfile_reduzido = types.SimpleNamespace(**vars(zipfile))
+    zipfile_reduzido.ZIP64_LIMIT = 1_000
+    monkeypatch.setattr(zip_utils, "zipfile", zipfile_reduzido)
+    monkeypatch.setattr(zip_utils, "TAMANHO_BLOCO_ZIP", 64 * 2**10)
+
+    arquivos = {"pequeno.csv": b"x" * 10, "grande.csv": _conteudo(200_000)}
+    _escrever(tmp_path / "origem", arquivos)
+    zip_dir(tmp_path / "origem", tmp_path / "saida.zip")
+    assert _ler_zip(tmp_path / "saida.zip") == arquivos
+
+    # O membro zip64 também é copiado corretamente numa nova execução
+    assert zip_dir(tmp_path / "origem", tmp_path / "saida.zip")["reaproveitados"] == 2
+    assert _ler_zip(tmp_path / "saida.zip") == arquivos
+
+
+@pytest.mark.skipif(not os.environ.get("ANS_TESTES_LENTOS"), reason="defina ANS_TESTES_LENTOS=1 (comprime 4 GiB)")
+def test_membro_maior_que_4gib(tmp_path):
+    origem = tmp_path / "origem"
+    origem.mkdir()
+    tamanho = 2**32 + 4096
+    with open(origem / "enorme.bin", "wb") as f:
+        # Arquivo esparso: ocupa poucos blocos em disco e comprime para poucos MB
+        f.truncate(tamanho)
+    (origem / "depois.csv").write_bytes(b"ultimo membro\n")
+
+    zip_dir(origem, tmp_path / "saida.zip", nivel=1)
+
+    with zipfile.ZipFile(tmp_path / "saida.zip") as zf:
+        assert zf.testzip() is None
+        assert zf.getinfo("enorme.bin").file_size == tamanho
+        assert zf.read("depois.csv") == b"ultimo membro\n"
+
+
+def test_zip_so_com_as_extensoes_pedidas(tmp_path):
+    arquivos = {"entrega.csv": b"a,b\n1,2\n", "sub/outra.CSV": b"x\n"}
+    _escrever(tmp_path / "origem", {**arquivos, "tabela.parquet/parte-0.parquet": b"PAR1", ".gitkeep": b""})
+
+    zip_dir(tmp_path / "origem", tmp_path / "saida.zip", extensoes=(".csv",))
+
+    assert _ler_zip(tmp_path / "saida.zip") == arquivos
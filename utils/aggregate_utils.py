@@ -1,17 +1,154 @@
+from typing import Iterable
+
+import numpy as np
 import pandas as pd
 
-def agregar_dados(df: pd.DataFrame) -> pd.DataFrame:
-    return (
-        df.groupby(
-            ["REG_ANS", "CNPJ", "RazaoSocial", "Modalidade", "UF", "Ano"],
-            dropna=False
+# Chave do agrupamento (uma linha por operadora e ano)
+CHAVES = ["REG_ANS", "CNPJ", "RazaoSocial", "Modalidade", "UF", "Ano"]
+
+
+def _codigos_grupo(chaves: pd.DataFrame) -> tuple[np.ndarray, int]:
+    """
+    Código inteiro do grupo de cada linha (0..G-1, na ordem de primeira aparição).
+    Cada coluna é fatorada separadamente (NaN conta como valor) e os códigos são
+    combinados em base mista, sem ordenar nem comparar as strings de novo.
+    """
+    codigos = np.zeros(len(chaves), dtype=np.int64)
+    cardinalidade = 1
+    for coluna in chaves.columns:
+        cod, unicos = pd.factorize(chaves[coluna], use_na_sentinel=False)
+        if cardinalidade * len(unicos) >= 2**62:
+            # Evita overflow: recompacta os códigos já combinados
+            codigos, combinados = pd.factorize(codigos)
+            cardinalidade = len(combinados)
+        codigos = codigos * len(unicos) + cod
+        cardinalidade *= len(unicos)
+
+    codigos, unicos = pd.factorize(codigos)
+    return codigos, len(unicos)
+
+
+class AgregadorDespesas:
+    """
+    Agregação incremental de ValorDespesas por CHAVES.
+
+    Cada bloco é reduzido a (n, soma, média, M2) por grupo, usando códigos inteiros
+    (_codigos_grupo) em vez das colunas de texto. Os parciais são combinados pela fórmula de
+    Chan et al. para variância em paralelo, o que dá o mesmo resultado de um
+    groupby sobre todos os dados (soma, média e desvio padrão amostral, ddof=1).
+    As colunas descritivas só voltam a ser associadas aos números em resultado().
+    """
+
+    def __init__(self):
+        self._chaves = None            # chaves únicas; a posição de cada linha é o código global
+        self._n = np.zeros(0)
+        self._soma = np.zeros(0)
+        self._media = np.zeros(0)
+        self._m2 = np.zeros(0)
+
+    def _codigos_globais(self, chaves_bloco: pd.DataFrame) -> np.ndarray:
+        """ Converte as chaves únicas do bloco em códigos globais, registrando as novas. """
+        if self._chaves is None:
+            self._chaves = chaves_bloco.reset_index(drop=True)
+            return np.arange(len(chaves_bloco))
+
+        # merge casa NaN com NaN, como o groupby(dropna=False)
+        casados = chaves_bloco.merge(
+            self._chaves.assign(_codigo=np.arange(len(self._chaves))),
+            on=CHAVES, how="left", sort=False
+        )["_codigo"].to_numpy(dtype=float, copy=True)
+
+        novos = np.isnan(casados)
+        casados[novos] = len(self._chaves) + np.arange(novos.sum())
+        if novos.any():
+            self._chaves = pd.concat([self._chaves, chaves_bloco[novos]], ignore_index=True)
+
+        return casados.astype(np.int64)
+
+    def adicionar(self, df: pd.DataFrame):
+        if df.empty:
+            return
+
+        chaves = df[CHAVES]
+        locais, n_grupos = _codigos_grupo(chaves)
+
+        # Uma linha representante por grupo local: a primeira ocorrência
+        primeiras = np.empty(n_grupos, dtype=np.int64)
+        primeiras[locais[::-1]] = np.arange(len(locais) - 1, -1, -1)
+        unicas = chaves.iloc[primeiras].reset_index(drop=True)
+
+        # Categorias podem variar entre blocos: as chaves globais guardam os valores
+        categoricas = [c for c in CHAVES if isinstance(unicas[c].dtype, pd.CategoricalDtype)]
+        if categoricas:
+            unicas = unicas.astype({c: unicas[c].cat.categories.dtype for c in categoricas})
+
+        codigos = self._codigos_globais(unicas)[locais]
+
+        valores = df["ValorDespesas"].to_numpy(dtype=float, na_value=np.nan)
+        validos = ~np.isnan(valores)
+        codigos_validos, valores = codigos[validos], valores[validos]
+
+        tamanho = len(self._chaves)
+        n_b = np.bincount(codigos_validos, minlength=tamanho).astype(float)
+        soma_b = np.bincount(codigos_validos, weights=valores, minlength=tamanho)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            media_b = np.where(n_b > 0, soma_b / n_b, 0.0)
+        m2_b = np.bincount(codigos_validos, weights=(valores - media_b[codigos_validos]) ** 2, minlength=tamanho)
+
+        self._combinar(n_b, soma_b, media_b, m2_b)
+
+    def _combinar(self, n_b, soma_b, media_b, m2_b):
+        tamanho = len(n_b)
+        faltam = tamanho - len(self._n)
+        if faltam:
+            self._n, self._soma, self._media, self._m2 = (
+                np.concatenate([a, np.zeros(faltam)]) for a in (self._n, self._soma, self._media, self._m2)
+            )
+
+        n = self._n + n_b
+        delta = media_b - self._media
+        with np.errstate(invalid="ignore", divide="ignore"):
+            peso = np.where(n > 0, n_b / n, 0.0)
+            self._m2 = self._m2 + m2_b + np.where(n > 0, delta ** 2 * self._n * n_b / n, 0.0)
+        self._media = self._media + delta * peso
+        self._soma = self._soma + soma_b
+        self._n = n
+
+    def resultado(self) -> pd.DataFrame:
+        colunas = CHAVES + ["total_despesas", "media_trimestral", "desvio_padrao"]
+        if self._chaves is None:
+            return pd.DataFrame(columns=colunas).rename(columns={"REG_ANS": "RegistroANS"})
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            media = np.where(self._n > 0, self._media, np.nan)
+            desvio = np.where(self._n > 1, np.sqrt(self._m2 / (self._n - 1)), np.nan)
+
+        df = self._chaves.assign(
+            total_despesas=self._soma,
+            media_trimestral=media,
+            desvio_padrao=desvio,
         )
-        .agg(
-            total_despesas=("ValorDespesas", "sum"),
-            media_trimestral=("ValorDespesas", "mean"),
-            desvio_padrao=("ValorDespesas", "std")
+
+        # Mesma ordem do groupby(sort=True) antes de ordenar pelo total
+        return (
+            df.sort_values(CHAVES, na_position="last", kind="stable")
+            .reset_index(drop=True)
+            .rename(columns={"REG_ANS": "RegistroANS"})
+            .sort_values("total_despesas", ascending=False)
         )
-        .reset_index()
-        .rename(columns={"REG_ANS": "RegistroANS"})
-        .sort_values("total_despesas", ascending=False)
-    )
+
+
+def agregar_blocos(blocos: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """ Agrega um iterável de DataFrames (ex.: partições Ano/Trimestre) sem concatená-los. """
+    agregador = AgregadorDespesas()
+    for bloco in blocos:
+        agregador.adicionar(bloco)
+    return agregador.resultado()
+
+
+def agregar_dados(df: pd.DataFrame, tamanho_bloco: int | None = None) -> pd.DataFrame:
+    """ Total, média e desvio padrão das despesas por operadora e ano. """
+    if not tamanho_bloco:
+        return agregar_blocos([df])
+    return agregar_blocos(df.iloc[i:i + tamanho_bloco] for i in range(0, len(df), tamanho_bloco))
+
@@ -1,4 +1,5 @@
 import re
+import numpy as np
 import pandas as pd
 
 def valida_cnpj(cnpj: str) -> bool:
@@ -28,3 +29,70 @@ def normalizar_cnpj(cnpj: str) -> str | None:
     if pd.isna(cnpj):
         return None
     return re.sub(r"\D", "", str(cnpj)).zfill(14)
+
+
+# Pesos dos dígitos verificadores (módulo 11)
+PESOS_D1 = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+PESOS_D2 = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+
+
+def _digito_verificador(digitos: np.ndarray, pesos: np.ndarray) -> np.ndarray:
+    resto = (digitos @ pesos) % 11
+    return np.where(resto < 2, 0, 11 - resto)
+
+
+def valida_cnpj_series(serie: pd.Series) -> pd.Series:
+    """
+    Versão vetorizada de valida_cnpj: calcula os dois dígitos verificadores
+    de toda a coluna de uma vez (matriz de dígitos NumPy + produto escalar).
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Categoria: valida cada valor distinto uma vez e propaga pelos códigos
+        por_categoria = valida_cnpj_series(pd.Series(serie.cat.categories, dtype=object)).to_numpy()
+        codigos = serie.cat.codes.to_numpy()
+        return pd.Series(np.append(por_categoria, False)[codigos], index=serie.index)
+
+    resultado = np.zeros(len(serie), dtype=bool)
+    if len(serie) == 0:
+        return pd.Series(resultado, index=serie.index)
+
+    nulos = serie.isna().to_numpy()
+    texto = serie.astype(str)
+
+    # Texto não ASCII (ex.: dígitos Unicode) segue pelo cálculo escalar para manter o mesmo resultado
+    nao_ascii = ~nulos & ~texto.str.isascii().fillna(True).to_numpy(dtype=bool)
+    for pos in np.flatnonzero(nao_ascii):
+        resultado[pos] = valida_cnpj(serie.iloc[pos])
+
+    limpo = texto.str.replace(r"[^0-9]", "", regex=True)
+    candidatos = ~nulos & ~nao_ascii & (limpo.str.len() == 14).fillna(False).to_numpy(dtype=bool)
+
+    if candidatos.any():
+        concatenado = "".join(limpo.to_numpy()[candidatos])
+        digitos = (
+            np.frombuffer(concatenado.encode("ascii"), dtype=np.uint8)
+            .reshape(-1, 14)
+            .astype(np.int64) - ord("0")
+        )
+
+        repetidos = (digitos == digitos[:, :1]).all(axis=1)
+        d1 = _digito_verificador(digitos[:, :12], PESOS_D1)
+        d2 = _digito_verificador(np.column_stack([digitos[:, :12], d1]), PESOS_D2)
+
+        resultado[candidatos] = (
+            ~repetidos & (digitos[:, 12] == d1) & (digitos[:, 13] == d2)
+        )
+
+    return pd.Series(resultado, index=serie.index)
+
+
+def normalizar_cnpj_series(serie: pd.Series) -> pd.Series:
+    """ Versão vetorizada de normalizar_cnpj (equivalente a serie.apply(normalizar_cnpj)). """
+    texto = serie.astype(str)
+    normalizado = texto.str.replace(r"[^0-9]", "", regex=True).str.zfill(14).astype(object)
+
+    nao_ascii = ~texto.str.isascii().fillna(True).to_numpy(dtype=bool)
+    for pos in np.flatnonzero(nao_ascii):
+        normalizado.iloc[pos] = normalizar_cnpj(serie.iloc[pos])
+
+    return normalizado.where(serie.notna())
@@ -1,157 +1,491 @@
+import io
+import re
+import zipfile
+from collections import deque
+from itertools import islice
+from functools import lru_cache
+from typing import NamedTuple
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from .cnpj_utils import valida_cnpj
+from .cnpj_utils import valida_cnpj_series
 from .file_utils import ARQUIVO_REGEX
+from .schema_utils import tipar_colunas, concatenar
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    ARROW_DISPONIVEL = True
+except ImportError:  # sem pyarrow, os valores são convertidos pelo caminho do pandas
+    ARROW_DISPONIVEL = False
 
 # Expressão regular para identificar linhas de despesas com eventos ou sinistros
 REGEX_SINISTROS = r"Despesas.*(?:Eventos|Sinistros)"
 
-def load_table(path: Path) -> pd.DataFrame:
-    """ Carrega arquivos de diferentes formatos (CSV, TXT, Excel) com tratamento de erros e encoding. """
+# A mesma expressão sobre os bytes brutos, já em minúsculas: os termos são ASCII, então vale para
+# UTF-8 e Latin-1. Comparar com bytes.lower() é bem mais rápido que re.IGNORECASE.
+# (o "." não casa com quebra de linha, então cada ocorrência fica dentro de uma linha)
+PADRAO_SINISTROS_BYTES = re.compile(REGEX_SINISTROS.lower().encode("ascii"))
+
+# Número já no formato "1234.56" (após remover o separador de milhar e trocar a vírgula)
+REGEX_NUMERO = r"^\s*[-+]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][-+]?[0-9]+)?\s*$"
+
+COLUNAS_SAIDA = ["REG_ANS", "CNPJ", "RazaoSocial", "Trimestre", "Ano", "ValorDespesas"]
+
+# Motivos de separação do consolidado (bits de classificar_consolidado)
+FLAG_VALOR_NEGATIVO = 1
+FLAG_VALOR_ZERO = 2
+FLAG_CNPJ_INVALIDO = 4
+FLAG_VALOR_AUSENTE = 8
+
+# Grupos gerados por separar_consolidados, nesta ordem
+GRUPOS_CONSOLIDADO = ["validos", "negativos", "zero", "cnpj_invalido"]
+
+# Quantidade de linhas lidas por bloco no modo streaming (limita o pico de memória por worker)
+CHUNK_SIZE = 200_000
+
+# Bytes iniciais usados para detectar encoding e separador
+TAMANHO_AMOSTRA = 64 * 1024
+
+# Tamanho das leituras ao percorrer um trecho de membro do ZIP
+TAMANHO_BLOCO_TRECHO = 1024 * 1024
+
+# Bytes guardados pela pré-varredura (_varrer_sinistros) até a primeira linha de Eventos/Sinistros,
+# que o parser reaproveita sem descomprimir o trecho de novo
+LIMITE_PRE_VARREDURA = 16 * 1024 * 1024
+
+EXTENSOES_TEXTO = (".csv", ".txt")
+EXTENSOES_EXCEL = (".xls", ".xlsx")
+
+def detectar_formato(amostra: bytes) -> tuple[str, str]:
+    """ Detecta encoding e separador a partir dos primeiros bytes de um arquivo texto. """
+    if amostra.startswith(b"\xef\xbb\xbf"):
+        encoding = "utf-8-sig"
+        texto = amostra[3:].decode("utf-8", errors="ignore")
+    else:
+        try:
+            texto = amostra.decode("utf-8")
+            encoding = "utf-8"
+        except UnicodeDecodeError as e:
+            # A amostra pode cortar um caractere multibyte no final: isso não invalida o UTF-8
+            if e.start >= len(amostra) - 3:
+                texto = amostra[:e.start].decode("utf-8", errors="ignore")
+                encoding = "utf-8"
+            else:
+                # Fallback Latin-1 (comum em arquivos da ANS)
+                texto = amostra.decode("latin1")
+                encoding = "latin1"
+
+    cabecalho = texto.splitlines()[0] if texto else ""
+    sep = max([";", ",", "\t", "|"], key=cabecalho.count)
+    return encoding, sep
+
+
+class FormatoMembro(NamedTuple):
+    """ Formato de um membro CSV/TXT do ZIP, lido só do cabeçalho. """
+    encoding: str
+    sep: str
+    usecols: list[int]  # posições das colunas usadas na normalização
+
+
+def inspecionar_membro(zf: zipfile.ZipFile, member: str) -> FormatoMembro | None:
+    """
+    Lê apenas os primeiros bytes de um membro CSV/TXT, direto do ZIP, e decide se ele pode conter
+    demonstrações da ANS: o cabeçalho precisa ter descrição, registro ANS e valor (as colunas
+    exigidas por mascara_sinistros e normalize_and_parse). Retorna None para membros descartados.
+    """
+    if Path(member).suffix.lower() not in EXTENSOES_TEXTO:
+        return None
+
+    with zf.open(member) as fh:
+        amostra = fh.read(TAMANHO_AMOSTRA)
+    encoding, sep = detectar_formato(amostra)
+
+    # Só o cabeçalho é parseado; a amostra pode cortar um caractere multibyte no final
+    cabecalho = amostra.split(b"\n", 1)[0]
     try:
-        if path.suffix.lower() in [".csv", ".txt"]:
-            try: 
-                # Tenta leitura automática (sniffing de separador) com UTF-8
-                return pd.read_csv(path, sep=None, engine="python", encoding="utf-8", on_bad_lines='skip')
-            except: 
-                # Fallback para ponto-e-vírgula e codificação Latin-1 (comum em arquivos da ANS)
-                return pd.read_csv(path, sep=";", engine="python", encoding="latin1", on_bad_lines='skip')
-        elif path.suffix.lower() in [".xls", ".xlsx"]:
-            return pd.read_excel(path)
+        try:
+            colunas = pd.read_csv(io.BytesIO(cabecalho), sep=sep, encoding=encoding, nrows=0).columns
+        except UnicodeDecodeError:
+            encoding = "latin1"
+            colunas = pd.read_csv(io.BytesIO(cabecalho), sep=sep, encoding=encoding, nrows=0).columns
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, ValueError):
+        return None
+
+    mapa = _mapear_colunas(tuple(colunas))
+    if not (mapa.descricao and mapa.registro and mapa.valor):
+        return None
+
+    # Só as colunas do mapa são parseadas; como são as primeiras ocorrências de cada chave,
+    # o mapeamento refeito sobre elas em cada bloco é o mesmo
+    usadas = set(mapa) - {None}
+    return FormatoMembro(encoding, sep, [i for i, c in enumerate(colunas) if c in usadas])
+
+
+class _Blocos(io.RawIOBase):
+    """ Arquivo somente-leitura sobre um iterador de blocos de bytes. """
+
+    def __init__(self, blocos):
+        self._blocos = iter(blocos)
+        self._buffer = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        while not self._buffer:
+            try:
+                # memoryview: consumir o início do bloco não copia o restante
+                self._buffer = memoryview(next(self._blocos))
+            except StopIteration:
+                return 0
+
+        n = min(len(destino), len(self._buffer))
+        destino[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+class _TrechoMembro(_Blocos):
+    """
+    Arquivo somente-leitura com o cabeçalho de um membro do ZIP seguido do trecho
+    [inicio, fim) (em bytes descomprimidos), alinhado a quebras de linha: cada linha
+    pertence ao trecho em que começa, então trechos vizinhos não repetem nem perdem linhas.
+    """
+
+    def __init__(self, zf: zipfile.ZipFile, member: str, inicio: int, fim: int | None):
+        super().__init__(self._ler(zf, member, inicio, fim))
+
+    @staticmethod
+    def _ler(zf, member, inicio, fim):
+        with zf.open(member) as fh:
+            cabecalho = fh.readline()
+            yield cabecalho
+            pos = len(cabecalho)
+
+            if inicio > pos:
+                # Descarta até o byte anterior ao início e completa a linha em andamento
+                falta = inicio - 1 - pos
+                while falta > 0:
+                    lido = len(fh.read(min(TAMANHO_BLOCO_TRECHO, falta)))
+                    if not lido:
+                        return
+                    falta -= lido
+                pos = inicio - 1 + len(fh.readline())
+
+            ultimo = b"\n"
+            while fim is None or pos < fim:
+                bloco = fh.read(TAMANHO_BLOCO_TRECHO if fim is None else min(TAMANHO_BLOCO_TRECHO, fim - pos))
+                if not bloco:
+                    return
+                pos += len(bloco)
+                ultimo = bloco[-1:]
+                yield bloco
+
+            # A última linha começou antes de `fim`: lê até o fim dela
+            if ultimo != b"\n":
+                yield fh.readline()
+
+
+def _abrir_trecho(zf: zipfile.ZipFile, member: str, inicio: int, fim: int | None):
+    """ Membro inteiro ou apenas o trecho [inicio, fim) dele (ver _TrechoMembro), como arquivo binário. """
+    if inicio or fim is not None:
+        return io.BufferedReader(_TrechoMembro(zf, member, inicio, fim), buffer_size=TAMANHO_BLOCO_TRECHO)
+    return zf.open(member)
+
+
+def _varrer_sinistros(fh, limite: int = 0) -> tuple[bool, deque | None]:
+    """
+    Varre os bytes de `fh` até a primeira linha que casa com REGEX_SINISTROS (ver contem_sinistros).
+    Retorna se achou e os blocos lidos até ali, para o parser continuar do mesmo arquivo sem reler;
+    None quando passaram de `limite` bytes e deixaram de ser guardados.
+    """
+    lidos, total, resto = deque(), 0, b""
+    while bloco := fh.read(TAMANHO_BLOCO_TRECHO):
+        total += len(bloco)
+        if lidos is not None and total <= limite:
+            lidos.append(bloco)
+        else:
+            lidos = None
+
+        dados = resto + bloco
+        # Busca só até a última quebra de linha; a linha incompleta segue para o próximo bloco
+        corte = dados.rfind(b"\n") + 1
+        if PADRAO_SINISTROS_BYTES.search(dados.lower(), 0, corte):
+            return True, lidos
+        resto = dados[corte:]
+    return PADRAO_SINISTROS_BYTES.search(resto.lower()) is not None, lidos
+
+
+def contem_sinistros(fh) -> bool:
+    """
+    Pré-varredura dos bytes brutos de um arquivo texto, sem decodificar nem parsear: True assim que
+    alguma linha casa com REGEX_SINISTROS. A busca é na linha inteira (não só na coluna de descrição),
+    então pode haver falso positivo, mas nunca falso negativo.
+    """
+    return _varrer_sinistros(fh)[0]
+
+
+def _continuar(lidos: deque, fh):
+    """ Os blocos já lidos pela pré-varredura seguidos do restante de `fh` (cada bloco é liberado ao ser entregue). """
+    while lidos:
+        yield lidos.popleft()
+    while bloco := fh.read(TAMANHO_BLOCO_TRECHO):
+        yield bloco
+
+
+def _ler_csv(fh, formato: FormatoMembro, chunksize: int):
+    """ Blocos de `chunksize` linhas de um CSV/TXT da ANS, com o parser C e só as colunas de `formato`. """
+    with pd.read_csv(
+        fh,
+        sep=formato.sep,
+        encoding=formato.encoding,
+        usecols=formato.usecols,
+        dtype=str,
+        engine="c",
+        on_bad_lines="skip",
+        chunksize=chunksize,
+    ) as reader:
+        yield from reader
+
+
+def _ler_trecho(zf: zipfile.ZipFile, member: str, inicio: int, fim: int | None, formato: FormatoMembro, chunksize: int):
+    """
+    Pré-varredura (contem_sinistros) e parser de um trecho. Quando há Eventos/Sinistros, a varredura
+    para na primeira ocorrência e o parser recebe os bytes já descomprimidos seguidos do restante do
+    mesmo stream. Só quando ela vem depois de LIMITE_PRE_VARREDURA bytes o trecho é aberto de novo.
+    """
+    with _abrir_trecho(zf, member, inicio, fim) as fh:
+        encontrou, lidos = _varrer_sinistros(fh, LIMITE_PRE_VARREDURA)
+        if not encontrou:
+            return
+        if lidos is not None:
+            continuacao = io.BufferedReader(_Blocos(_continuar(lidos, fh)), buffer_size=TAMANHO_BLOCO_TRECHO)
+            yield from _ler_csv(continuacao, formato, chunksize)
+            return
+
+    with _abrir_trecho(zf, member, inicio, fim) as fh:
+        yield from _ler_csv(fh, formato, chunksize)
+
+
+def iter_zip_member_chunks(
+    zf: zipfile.ZipFile,
+    member: str,
+    chunksize: int = CHUNK_SIZE,
+    inicio: int = 0,
+    fim: int | None = None,
+    formato: FormatoMembro | None = None,
+):
+    """
+    Lê um membro CSV/TXT direto do ZIP (sem extração) em blocos de `chunksize` linhas com o parser C.
+    `inicio`/`fim` limitam a leitura a um trecho do membro (ver _TrechoMembro).
+    `formato` (de inspecionar_membro) evita ler o cabeçalho de novo; membros descartados não geram blocos.
+    Sem nenhuma linha de Eventos/Sinistros no trecho, nenhum DataFrame é montado (ver _ler_trecho).
+
+    O encoding vem só da amostra inicial e é decodificado sem substituições: se um byte inválido
+    aparece depois dela, o trecho é relido como latin1 (que aceita qualquer byte) e os blocos já
+    entregues são pulados. A divisão em linhas e colunas não depende do encoding (separadores e
+    quebras de linha são ASCII), então os blocos relidos começam exatamente onde os anteriores pararam.
+    """
+    formato = formato or inspecionar_membro(zf, member)
+    if formato is None:
+        return
+
+    entregues = 0
+    try:
+        for bloco in _ler_trecho(zf, member, inicio, fim, formato, chunksize):
+            yield bloco
+            entregues += 1
+    except UnicodeDecodeError as e:
+        if formato.encoding == "latin1":
+            raise
+        print(f"[WARN] {member}: conteúdo inválido em {formato.encoding} após a amostra ({e.reason}); relendo como latin1")
+        latin1 = formato._replace(encoding="latin1")
+        yield from islice(_ler_trecho(zf, member, inicio, fim, latin1, chunksize), entregues, None)
+
+def stream_zip_member(
+    zf: zipfile.ZipFile,
+    member: str,
+    chunksize: int = CHUNK_SIZE,
+    inicio: int = 0,
+    fim: int | None = None,
+    formato: FormatoMembro | None = None,
+) -> pd.DataFrame:
+    """
+    Processa um membro do ZIP em modo streaming: cada bloco é filtrado por
+    REGEX_SINISTROS e normalizado antes do próximo ser lido.
+    Com `inicio`/`fim`, processa apenas esse trecho (em bytes descomprimidos) de um CSV/TXT.
+    """
+    fname = Path(member).name
+    suffix = Path(member).suffix.lower()
+    partes = []
+
+    try:
+        if suffix in EXTENSOES_TEXTO:
+            blocos = iter_zip_member_chunks(zf, member, chunksize, inicio, fim, formato)
+        elif suffix in EXTENSOES_EXCEL:
+            # Excel não permite leitura em blocos: lido em memória, ainda sem extração para disco
+            blocos = [pd.read_excel(io.BytesIO(zf.read(member)))]
+        else:
+            return pd.DataFrame()
+
+        for chunk in blocos:
+            # somente continua se houver evidência de Eventos/Sinistros no bloco;
+            # a mesma máscara é reaproveitada no filtro de linhas
+            mascara = mascara_sinistros(chunk)
+            if mascara is None or not mascara.any():
+                continue
+
+            df_norm = normalize_and_parse(chunk, fname, mascara=mascara)
+            if not df_norm.empty:
+                partes.append(df_norm)
     except Exception as e:
-        print(f"Erro ao abrir {path}: {e}")
-    return pd.DataFrame()
-
-def normalize_and_parse(df, fname=None):
-    """ Filtra as LINHAS internamente e padroniza as colunas. """
-    df = df.copy()
-    
-    # 1. Filtro de Linhas (Se não fizer isso aqui, o CSV final terá lixo)
-    desc_col = "DESCRICAO" if "DESCRICAO" in df.columns else next((c for c in df.columns if "descr" in c.lower()), None)
-    
-    if desc_col:
-        mask = df[desc_col].astype(str).str.contains(REGEX_SINISTROS, case=False, na=False, regex=True)
-        df = df[mask].copy()
-    
-    if df.empty:
-        return pd.DataFrame()
+        print(f"Erro ao ler {member}: {e}")
+
+    return concatenar(partes) if partes else pd.DataFrame()
+
+class MapaColunas(NamedTuple):
+    """ Colunas de origem usadas na normalização (None quando ausentes no arquivo). """
+    descricao: str | None
+    registro: str | None
+    cnpj: str | None
+    valor: str | None
+    data: str | None
+    razao: str | None
+
 
-    # 2. Mapeamento de colunas (Resto do seu código original...)
-    reg_col = next((c for c in df.columns if "reg" in c.lower()), None)
-    cnpj_col = next((c for c in df.columns if "cnpj" in c.lower()), None)
-    valor_col = next((c for c in df.columns if "vl_" in c.lower() or "valor" in c.lower()), None)
-    data_col = next((c for c in df.columns if "data" in c.lower()), None)
-    razao_col = next((c for c in df.columns if "razao" in c.lower()), None)
-    
-    if not reg_col or not valor_col: return pd.DataFrame()
-
-    # --- PASSO 3: LIMPEZA ---
-    df["REG_ANS"] = df[reg_col].astype(str).str.strip()
-    df["CNPJ"] = df[cnpj_col].astype(str).str.replace(r"\D", "", regex=True) if cnpj_col else ""
-    df["RazaoSocial"] = df[razao_col].astype(str).str.strip() if razao_col else ""
-    
-    df["ValorDespesas"] = pd.to_numeric(
-        df[valor_col].astype(str).str.replace(r"\.", "", regex=True).str.replace(",", ".", regex=False),
-        errors='coerce'
+@lru_cache(maxsize=256)
+def _mapear_colunas(colunas: tuple) -> MapaColunas:
+    def achar(*chaves):
+        return next((c for c in colunas if any(k in c.lower() for k in chaves)), None)
+
+    return MapaColunas(
+        descricao="DESCRICAO" if "DESCRICAO" in colunas else achar("descr"),
+        registro=achar("reg"),
+        cnpj=achar("cnpj"),
+        valor=achar("vl_", "valor"),
+        data=achar("data"),
+        razao=achar("razao"),
     )
 
-    # --- PASSO 4: ANO E TRIMESTRE ---
-    # Se não encontrar no CSV, tentamos no nome do arquivo
-    df["_ano"] = pd.NA
-    df["_trimestre"] = pd.NA
 
-    if data_col:
-        try:
-            dates = pd.to_datetime(df[data_col], errors='coerce')
-            df["_ano"] = dates.dt.year
-            df["_trimestre"] = dates.dt.quarter
-        except:
-            pass
+def mapear_colunas(df: pd.DataFrame) -> MapaColunas:
+    """ Detecta as colunas relevantes uma vez por cabeçalho (blocos do mesmo arquivo reutilizam o resultado). """
+    return _mapear_colunas(tuple(df.columns))
 
-    if fname:
-        match = ARQUIVO_REGEX.search(fname)
-        if match:
-            # fillna garante que se a data_col falhou, o nome do arquivo salva
-            try:
-                ano_fname = int(match.group("ano") or match.group("ano2"))
-                tri_fname = int(match.group("trimestre") or match.group("trimestre2"))
-                df["_ano"] = df["_ano"].fillna(ano_fname)
-                df["_trimestre"] = df["_trimestre"].fillna(tri_fname)
-            except:
-                pass
-
-    df["Ano"] = df["_ano"].astype("Int64")
-    df["Trimestre"] = df["_trimestre"].astype("Int64")
-    
-    return df[["REG_ANS", "CNPJ", "RazaoSocial", "Trimestre", "Ano", "ValorDespesas"]]
 
-def separar_consolidados(df_full: pd.DataFrame, validar_cnpj: bool = True ):
-    """ Divide o dataframe consolidado em quatro categorias para relatórios de qualidade de dados. """
-    df = df_full.copy()
+def mascara_sinistros(df: pd.DataFrame, mapa: MapaColunas | None = None) -> pd.Series | None:
+    """ Linhas cuja descrição casa com REGEX_SINISTROS (None se não houver coluna de descrição). """
+    mapa = mapa or mapear_colunas(df)
+    if not mapa.descricao:
+        return None
+    return df[mapa.descricao].astype(str).str.contains(REGEX_SINISTROS, case=False, na=False, regex=True)
 
-    # Aplica função de validação de CNPJ (Módulo externo)
-    if validar_cnpj:
-        df["CNPJ_valido"] = df["CNPJ"].apply(valida_cnpj)
-    else:
-        df["CNPJ_valido"] = True
 
-    # Marca valores negativos ou zerados como inválidos
-    df["valor_invalido"] = df["ValorDespesas"] <= 0
+def parse_valor_br(serie: pd.Series) -> pd.Series:
+    """
+    Converte valores no formato brasileiro ("1.234,56") para float em uma única passada vetorizada.
+    Valores que não são números viram NaN.
+    """
+    if ARROW_DISPONIVEL:
+        arr = pa.array(serie, type=pa.string(), from_pandas=True)
+        arr = pc.replace_substring(pc.replace_substring(arr, ".", ""), ",", ".")
+        valido = pc.match_substring_regex(arr, REGEX_NUMERO)
+        numeros = pc.cast(pc.utf8_trim_whitespace(pc.if_else(valido, arr, None)), pa.float64())
+        return pd.Series(numeros.to_numpy(zero_copy_only=False), index=serie.index, name=serie.name)
 
-    # Grupo 1: Dados prontos para uso (Valor > 0 e CNPJ válido)
-    df_validos = df[
-        (df["ValorDespesas"] > 0) & (df["CNPJ_valido"])
-    ].copy()
+    return pd.to_numeric(
+        serie.str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+        errors="coerce"
+    )
 
-    # Grupos de Auditoria: Negativos, Zeros e CNPJs mal formatados
-    df_negativos = df[df["ValorDespesas"] < 0].copy()
-    df_zero = df[df["ValorDespesas"] == 0].copy()
-    df_cnpj_invalido = df[~df["CNPJ_valido"]].copy()
 
-    # Limpa colunas auxiliares antes de retornar
-    col_aux = ["CNPJ_valido", "valor_invalido"]
-    for d in (df_validos, df_negativos, df_zero, df_cnpj_invalido):
-        d.drop(columns=[c for c in col_aux if c in d.columns], inplace=True)
+def normalize_and_parse(df, fname=None, mascara: pd.Series | None = None):
+    """
+    Filtra as LINHAS internamente e padroniza as colunas.
+    `mascara` permite reaproveitar o filtro de sinistros já calculado pelo chamador.
+    """
+    mapa = mapear_colunas(df)
 
-    return df_validos, df_negativos, df_zero, df_cnpj_invalido
+    if not mapa.registro or not mapa.valor:
+        return pd.DataFrame()
 
-def is_eventos_sinistros_df(df: pd.DataFrame) -> bool:
-    """ Retorna True APENAS se encontrar a palavra chave na coluna correta. """
-    if df is None or df.empty:
-        return False
+    # 1. Filtro de Linhas: só as colunas usadas são copiadas
+    usadas = list(dict.fromkeys(c for c in (mapa.registro, mapa.cnpj, mapa.valor, mapa.data, mapa.razao) if c))
+    if mascara is None:
+        mascara = mascara_sinistros(df, mapa)
+    df = df.loc[mascara, usadas] if mascara is not None else df[usadas]
 
-    # Identifica a coluna
-    desc_col = "DESCRICAO" if "DESCRICAO" in df.columns else next((c for c in df.columns if "descr" in c.lower()), None)
+    if df.empty:
+        return pd.DataFrame()
 
-    if not desc_col:
-        return False
+    # 2. Limpeza
+    out = pd.DataFrame(index=df.index)
+    out["REG_ANS"] = df[mapa.registro].astype(str).str.strip()
+    out["CNPJ"] = df[mapa.cnpj].astype(str).str.replace(r"\D", "", regex=True) if mapa.cnpj else ""
+    out["RazaoSocial"] = df[mapa.razao].astype(str).str.strip() if mapa.razao else ""
 
-    # Verifica o conteúdo (case=False para garantir que pegue DESPESAS ou despesas)
-    possui_sinistro = df[desc_col].astype(str).str.contains(REGEX_SINISTROS, case=False, na=False, regex=True).any()
-    return possui_sinistro
-    if df is None or df.empty:
-        return False
+    # 3. Ano e trimestre: coluna de data e, na falta dela, o nome do arquivo
+    ano = trimestre = None
+    if mapa.data:
+        try:
+            dates = pd.to_datetime(df[mapa.data], errors='coerce')
+            ano, trimestre = dates.dt.year, dates.dt.quarter
+        except Exception:
+            pass
 
-    desc_col = "DESCRICAO" if "DESCRICAO" in df.columns else next((c for c in df.columns if "descr" in c.lower()), None)
+    ano = pd.Series(pd.NA, index=df.index, dtype="Int64") if ano is None else ano.astype("Int64")
+    trimestre = pd.Series(pd.NA, index=df.index, dtype="Int64") if trimestre is None else trimestre.astype("Int64")
 
-    if not desc_col:
-        return False
+    if fname:
+        match = ARQUIVO_REGEX.search(fname)
+        if match:
+            ano = ano.fillna(int(match.group("ano") or match.group("ano2")))
+            trimestre = trimestre.fillna(int(match.group("trimestre") or match.group("trimestre2")))
+
+    out["Trimestre"] = trimestre
+    out["Ano"] = ano
+    out["ValorDespesas"] = parse_valor_br(df[mapa.valor].astype(str))
 
-    # Mudamos aqui também para evitar o Warning
-    return df[desc_col].astype(str).str.contains(REGEX_SINISTROS, case=False, na=False, regex=True).any()
-    """ Verifica se o dataframe contém as palavras-chave de sinistros na coluna de descrição. """
-    if df is None or df.empty:
-        return False
+    # Esquema do pipeline (utils.schema_utils): REG_ANS inteiro, textos como categoria
+    return tipar_colunas(out[COLUNAS_SAIDA])
 
-    # Procura especificamente pela coluna 'DESCRICAO' ou variações
-    desc_col = "DESCRICAO" if "DESCRICAO" in df.columns else None
-    
-    if not desc_col:
-        # Tenta localizar qualquer coluna que contenha "descr" no nome
-        desc_col = next((c for c in df.columns if "descr" in c.lower()), None)
+def classificar_consolidado(df: pd.DataFrame, validar_cnpj: bool = True) -> np.ndarray:
+    """
+    Código de cada linha do consolidado, em uma única passada vetorizada: a soma (OR) dos
+    FLAG_* que se aplicam a ela. 0 = linha válida; uma linha pode ter mais de um motivo.
+    """
+    valores = df["ValorDespesas"].to_numpy(dtype=float, na_value=np.nan)
+
+    codigos = (
+        (valores < 0) * FLAG_VALOR_NEGATIVO
+        | (valores == 0) * FLAG_VALOR_ZERO
+        | np.isnan(valores) * FLAG_VALOR_AUSENTE
+    )
+    if validar_cnpj:
+        # Aplica função de validação de CNPJ (Módulo externo)
+        codigos |= ~valida_cnpj_series(df["CNPJ"]).to_numpy() * FLAG_CNPJ_INVALIDO
 
-    if not desc_col:
-        return False
+    return codigos.astype(np.uint8)
 
-    # Retorna True se pelo menos uma linha satisfizer a Regex de sinistros
-    return df[desc_col].astype(str).str.contains(REGEX_SINISTROS, case=False, na=False, regex=True).any()
\ No newline at end of file
+
+def indices_consolidados(df: pd.DataFrame, validar_cnpj: bool = True) -> dict[str, np.ndarray]:
+    """
+    Posições das linhas de cada grupo de GRUPOS_CONSOLIDADO, sem copiar o DataFrame:
+    o chamador materializa (df.take) e grava um grupo por vez.
+    """
+    codigos = classificar_consolidado(df, validar_cnpj)
+    return {
+        # Dados prontos para uso (Valor > 0 e CNPJ válido)
+        "validos": np.flatnonzero(codigos == 0),
+        # Grupos de Auditoria: Negativos, Zeros e CNPJs mal formatados
+        "negativos": np.flatnonzero(codigos & FLAG_VALOR_NEGATIVO),
+        "zero": np.flatnonzero(codigos & FLAG_VALOR_ZERO),
+        "cnpj_invalido": np.flatnonzero(codigos & FLAG_CNPJ_INVALIDO),
+    }
+
+
+def separar_consolidados(df_full: pd.DataFrame, validar_cnpj: bool = True ):
+    """ Divide o dataframe consolidado em quatro categorias para relatórios de qualidade de dados. """
+    grupos = indices_consolidados(df_full, validar_cnpj)
+    return tuple(df_full.take(grupos[g]) for g in GRUPOS_CONSOLIDADO)
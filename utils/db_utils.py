@@ -0,0 +1,49 @@
+import os
+
+import pandas as pd
+import psycopg
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Mesmas variáveis usadas pelo backend (backend/app/core/config.py)
+DB_HOST = os.environ.get("POSTGRES_HOST", "localhost")
+DB_PORT = os.environ.get("POSTGRES_PORT", "5432")
+DB_NAME = os.environ.get("POSTGRES_DB", "ans_db")
+DB_USER = os.environ.get("POSTGRES_USER", "ans_user")
+DB_PASSWORD = os.environ.get("POSTGRES_PASSWORD", "ans_pass")
+DB_SSLMODE = os.environ.get("POSTGRES_SSLMODE", "require")   # `disable` para um Postgres local
+
+# Linhas serializadas por vez durante o COPY
+COPY_CHUNK_SIZE = 100_000
+
+
+def conectar():
+    return psycopg.connect(
+        host=DB_HOST,
+        port=DB_PORT,
+        dbname=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        sslmode=DB_SSLMODE
+    )
+
+
+def _blocos_csv(df: pd.DataFrame, chunksize: int):
+    """ Serializa o DataFrame em CSV sob demanda, `chunksize` linhas por vez. """
+    for i in range(0, len(df), chunksize):
+        yield df.iloc[i:i + chunksize].to_csv(index=False, header=False).encode("utf-8")
+
+
+def copiar_dataframe(cur, df: pd.DataFrame, tabela: str, colunas: list[str], chunksize: int = COPY_CHUNK_SIZE) -> int:
+    """
+    Envia o DataFrame para `tabela` via COPY FROM STDIN (CSV), sem arquivo
+    intermediário nem volume compartilhado com o servidor. Retorna as linhas copiadas.
+    """
+    if df.empty:
+        return 0
+
+    with cur.copy(f"COPY {tabela} ({', '.join(colunas)}) FROM STDIN WITH (FORMAT csv)") as copy:
+        for bloco in _blocos_csv(df[colunas], chunksize):
+            copy.write(bloco)
+    return len(df)
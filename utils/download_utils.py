@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Raiz do portal de dados abertos; pode apontar para um servidor local (ex.: http://localhost:8000)
+ANS_BASE_URL = os.environ.get("ANS_BASE_URL", "https://dadosabertos.ans.gov.br/FTP/PDA").rstrip("/")
+
+# Cache persistente entre execuções:
+#   objetos/<sha256[:2]>/<sha256><ext>  conteúdo endereçado pelo hash
+#   urls/<sha1(url)>.json               url -> sha256, etag, last_modified, size
+#   parciais/<sha1(url)>.part           download interrompido (retomado via Range)
+CACHE_DIR = Path(os.environ.get("ANS_CACHE_DIR", "temp/cache"))
+
+MAX_TENTATIVAS = int(os.environ.get("ANS_DOWNLOAD_TENTATIVAS", "4"))
+BACKOFF_INICIAL = 1.0   # segundos; dobra a cada tentativa
+TIMEOUT = (10, 120)     # (conexão, leitura)
+TAMANHO_BLOCO = 64 * 1024
+
+# Respostas que valem nova tentativa; os demais 4xx falham na hora
+STATUS_TRANSITORIOS = {408, 429, 500, 502, 503, 504}
+
+_sessao = None
+
+
+def sessao() -> requests.Session:
+    """ Sessão HTTP compartilhada (keep-alive) com pool dimensionado para os downloads paralelos. """
+    global _sessao
+    if _sessao is None:
+        s = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        s.mount("http://", adaptador)
+        s.mount("https://", adaptador)
+        _sessao = s
+    return _sessao
+
+
+def _chave_url(url: str) -> str:
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+
+def _caminho_objeto(sha256: str, sufixo: str) -> Path:
+    return CACHE_DIR / "objetos" / sha256[:2] / f"{sha256}{sufixo}"
+
+
+def _ler_json(path: Path) -> dict | None:
+    """ Conteúdo de um JSON do cache; None se não existir ou estiver corrompido. """
+    try:
+        dados = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, UnicodeDecodeError, json.JSONDecodeError):
+        return None
+    return dados if isinstance(dados, dict) else None
+
+
+def _gravar_json(path: Path, dados: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(dados, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def entrada_cache(url: str) -> dict | None:
+    """
+    Metadados do cache para a URL, se o objeto correspondente ainda existir inteiro.
+    Entradas corrompidas e objetos com tamanho diferente do registrado (ex.: truncados)
+    são descartados, e o próximo download é completo, sem GET condicional.
+    """
+    entrada = _ler_json(CACHE_DIR / "urls" / f"{_chave_url(url)}.json")
+    if not entrada or not entrada.get("sha256"):
+        return None
+
+    objeto = _caminho_objeto(entrada["sha256"], entrada.get("sufixo", ""))
+    try:
+        tamanho = objeto.stat().st_size
+    except FileNotFoundError:
+        return None
+
+    if entrada.get("size") is not None and tamanho != entrada["size"]:
+        print(f"[WARN] Objeto do cache com tamanho inesperado, descartado: {objeto}")
+        objeto.unlink(missing_ok=True)
+        return None
+    return entrada
+
+
+def _remover_objeto_orfao(sha256: str, sufixo: str):
+    """ Remove um objeto que não é mais referenciado por nenhuma URL do cache. """
+    for path in (CACHE_DIR / "urls").glob("*.json"):
+        entrada = _ler_json(path)
+        if entrada and entrada.get("sha256") == sha256:
+            return
+    _caminho_objeto(sha256, sufixo).unlink(missing_ok=True)
+
+
+def _validador(resp: requests.Response) -> str | None:
+    """ Validador usado em If-Range: ETag forte ou, na falta dele, Last-Modified. """
+    etag = resp.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return resp.headers.get("Last-Modified")
+
+
+def _tentar_download(url: str, entrada: dict | None, parcial: Path, meta_parcial: Path):
+    """
+    Uma tentativa de download. Retorna a entrada do cache atualizada.
+    Lança requests.RequestException em falhas (transitórias ou não).
+    """
+    headers = {}
+
+    # Pedido condicional: o servidor responde 304 se o objeto em cache ainda vale
+    if entrada:
+        if entrada.get("etag"):
+            headers["If-None-Match"] = entrada["etag"]
+        if entrada.get("last_modified"):
+            headers["If-Modified-Since"] = entrada["last_modified"]
+
+    # Retomada: pede só o que falta, desde que o arquivo remoto seja o mesmo (If-Range)
+    meta = _ler_json(meta_parcial) if parcial.exists() else None
+    if meta and meta.get("validador"):
+        headers["Range"] = f"bytes={parcial.stat().st_size}-"
+        headers["If-Range"] = meta["validador"]
+
+    with sessao().get(url, headers=headers, stream=True, timeout=TIMEOUT) as resp:
+        if resp.status_code == 304 and entrada:
+            return entrada
+
+        if resp.status_code == 416:
+            # Parcial maior que o arquivo remoto: recomeça do zero
+            parcial.unlink(missing_ok=True)
+            meta_parcial.unlink(missing_ok=True)
+            raise requests.RequestException(f"Range inválido para {url}, reiniciando")
+
+        resp.raise_for_status()
+
+        h = hashlib.sha256()
+        if resp.status_code == 206:
+            # Continua o parcial: o hash precisa incluir os bytes já baixados
+            with open(parcial, "rb") as f:
+                for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b""):
+                    h.update(bloco)
+            modo = "ab"
+        else:
+            modo = "wb"
+            _gravar_json(meta_parcial, {"url": url, "validador": _validador(resp)})
+
+        total = resp.headers.get("Content-Range", "").rpartition("/")[2] or resp.headers.get("Content-Length")
+        esperado = int(total) if total and total.isdigit() else None
+        if resp.status_code != 206 and esperado is not None and resp.headers.get("Content-Encoding"):
+            esperado = None  # Content-Length do corpo comprimido
+
+        parcial.parent.mkdir(parents=True, exist_ok=True)
+        with open(parcial, modo) as f:
+            for bloco in resp.iter_content(TAMANHO_BLOCO):
+                f.write(bloco)
+                h.update(bloco)
+
+        tamanho = parcial.stat().st_size
+        if esperado is not None and tamanho != esperado:
+            # Conexão caiu no meio: o parcial fica para a próxima tentativa
+            raise requests.RequestException(f"Download incompleto de {url}: {tamanho}/{esperado} bytes")
+
+        sha256 = h.hexdigest()
+        sufixo = Path(url.split("?")[0]).suffix
+        destino = _caminho_objeto(sha256, sufixo)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(parcial, destino)
+        meta_parcial.unlink(missing_ok=True)
+
+        nova = {
+            "url": url,
+            "sha256": sha256,
+            "sufixo": sufixo,
+            "size": tamanho,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+        }
+        _gravar_json(CACHE_DIR / "urls" / f"{_chave_url(url)}.json", nova)
+
+        if entrada and entrada["sha256"] != sha256:
+            _remover_objeto_orfao(entrada["sha256"], entrada.get("sufixo", ""))
+
+        return nova
+
+
+def baixar(url: str, tentativas: int = MAX_TENTATIVAS) -> tuple[Path, str]:
+    """
+    Baixa `url` para o cache local e retorna (caminho, sha256).
+
+    - Se já estiver em cache, faz um GET condicional (ETag / If-Modified-Since)
+      e reaproveita o objeto quando o servidor responde 304.
+    - Downloads interrompidos são retomados com Range a partir do arquivo .part.
+    - Falhas de rede e respostas 5xx/429 são repetidas com backoff exponencial.
+    """
+    chave = _chave_url(url)
+    parcial = CACHE_DIR / "parciais" / f"{chave}.part"
+    meta_parcial = CACHE_DIR / "parciais" / f"{chave}.json"
+
+    espera = BACKOFF_INICIAL
+    for tentativa in range(1, tentativas + 1):
+        entrada = entrada_cache(url)
+        try:
+            entrada = _tentar_download(url, entrada, parcial, meta_parcial)
+            return _caminho_objeto(entrada["sha256"], entrada.get("sufixo", "")), entrada["sha256"]
+
+        except requests.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            if status not in STATUS_TRANSITORIOS or tentativa == tentativas:
+                raise
+
+        except requests.RequestException:
+            if tentativa == tentativas:
+                raise
+
+        print(f"[WARN] Falha ao baixar {url} (tentativa {tentativa}/{tentativas}), nova tentativa em {espera:.0f}s")
+        time.sleep(espera)
+        espera *= 2
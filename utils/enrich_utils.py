@@ -1,31 +1,89 @@
+import numpy as np
 import pandas as pd
-from utils.cnpj_utils import valida_cnpj, normalizar_cnpj
+from pandas.api.extensions import take
+
+from utils.cnpj_utils import valida_cnpj_series, normalizar_cnpj_series
+from utils.schema_utils import tipar_colunas
+
+
+def _posicoes_cadastro(registros: pd.Series, dimensao: pd.DataFrame) -> np.ndarray:
+    """
+    Posição de cada despesa na dimensão de operadoras (-1 = sem cadastro).
+    O REG_ANS é convertido e procurado no índice uma vez por valor distinto.
+    """
+    codigos, distintos = pd.factorize(registros)
+    numericos = pd.to_numeric(pd.Series(distintos, dtype=object), errors="coerce")
+    posicoes = dimensao.index.get_indexer(numericos)
+    # códigos -1 (REG_ANS nulo) caem no -1 acrescentado ao final
+    return np.append(posicoes, -1)[codigos]
+
+
+def _categoria_com_reserva(
+    codigos: np.ndarray, valores: np.ndarray, posicoes: np.ndarray, cadastro: np.ndarray
+) -> tuple[pd.Categorical, np.ndarray]:
+    """
+    Categoria com o valor próprio da despesa (`valores[codigos]`) e, na falta dele, o do
+    cadastro (`cadastro[posicoes]`), montada só com inteiros: os dois vetores de valores
+    distintos são unidos e cada linha recebe o código do valor escolhido.
+    Retorna também o índice de cada linha no vetor unido (-1 = nulo).
+    """
+    unidos = np.concatenate([valores, cadastro])
+    indice = np.where(codigos >= 0, codigos, np.where(posicoes >= 0, len(valores) + posicoes, -1))
+
+    codigos_unidos, categorias = pd.factorize(unidos)
+    categoria = pd.Categorical.from_codes(np.append(codigos_unidos, -1)[indice], categories=categorias)
+    return categoria, indice
+
 
 def enriquecer_dados(despesas: pd.DataFrame, operadoras: pd.DataFrame) -> pd.DataFrame:
-    operadoras_sel = (
-        operadoras[
-            ["REG_ANS", "CNPJ", "RazaoSocial", "Modalidade", "UF"]
-        ]
-        .drop_duplicates("REG_ANS")
-    )
+    """
+    Acrescenta CNPJ, RazaoSocial, Modalidade e UF do cadastro às despesas e descarta
+    as linhas com CNPJ inválido.
+
+    `operadoras` é a dimensão de utils.operadoras_utils (indexada por registro_ans, com o
+    CNPJ já normalizado e validado). CNPJs vindos das próprias despesas são normalizados e
+    validados uma vez por valor distinto; nada é refeito linha a linha. O resultado segue o
+    esquema de utils.schema_utils (textos como categoria).
+    """
+    despesas = tipar_colunas(despesas)
+    posicoes = _posicoes_cadastro(despesas["REG_ANS"], operadoras)
 
-    df = despesas.merge(
-        operadoras_sel,
-        on="REG_ANS",
-        how="left",
-        validate="m:1",
-        suffixes=("", "_cad")
+    # CNPJ: o das despesas tem prioridade; na falta dele, o do cadastro
+    codigos_cnpj, cnpjs = pd.factorize(despesas["CNPJ"])
+    cnpjs = normalizar_cnpj_series(pd.Series(cnpjs, dtype=object))
+
+    cnpj, indice = _categoria_com_reserva(
+        codigos_cnpj,
+        cnpjs.to_numpy(dtype=object),
+        posicoes,
+        operadoras["cnpj"].to_numpy(dtype=object, na_value=np.nan),
+    )
+    valido = take(
+        np.concatenate([valida_cnpj_series(cnpjs).to_numpy(), operadoras["cnpj_valido"].to_numpy(dtype=bool)]),
+        indice, allow_fill=True, fill_value=False,
     )
 
-    # Preferir cadastro ANS
-    df["CNPJ"] = df["CNPJ"].fillna(df["CNPJ_cad"])
-    df["RazaoSocial"] = df["RazaoSocial"].fillna(df["RazaoSocial_cad"])
+    codigos_razao, razoes = pd.factorize(despesas["RazaoSocial"])
+    razao, _ = _categoria_com_reserva(
+        codigos_razao,
+        np.asarray(razoes, dtype=object),
+        posicoes,
+        operadoras["razao_social"].to_numpy(dtype=object, na_value=np.nan),
+    )
 
-    # Normalização + validação
-    df["CNPJ"] = df["CNPJ"].apply(normalizar_cnpj)
-    df = df[df["CNPJ"].apply(valida_cnpj)]
+    df = pd.DataFrame({
+        "REG_ANS": despesas["REG_ANS"],
+        "CNPJ": pd.Series(cnpj, index=despesas.index),
+        "RazaoSocial": pd.Series(razao, index=despesas.index),
+        "Modalidade": take(operadoras["modalidade"].array, posicoes, allow_fill=True),
+        "UF": take(operadoras["uf"].array, posicoes, allow_fill=True),
+        "Trimestre": despesas["Trimestre"],
+        "Ano": despesas["Ano"],
+        "ValorDespesas": despesas["ValorDespesas"],
+    }, index=despesas.index)
 
-    return df[
-        ["REG_ANS", "CNPJ", "RazaoSocial", "Modalidade", "UF",
-         "Trimestre", "Ano", "ValorDespesas"]
-    ]
+    # Categorias de valores que só apareciam em linhas descartadas deixam de ocupar espaço
+    df = df[valido.astype(bool)]
+    for coluna in ("CNPJ", "RazaoSocial"):
+        df[coluna] = df[coluna].cat.remove_unused_categories()
+    return df
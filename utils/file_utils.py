@@ -1,12 +1,31 @@
+import os
 import re
-import zipfile
+import time
+import json
+import shutil
+import hashlib
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 
-BASE_URL = "https://dadosabertos.ans.gov.br/FTP/PDA/demonstracoes_contabeis"
+from utils.storage_utils import ler_tabela
+from utils.download_utils import ANS_BASE_URL, CACHE_DIR, baixar, sessao
+
+try:
+    import lxml  # noqa: F401
+    PARSER_HTML = "lxml"
+except ImportError:  # lxml é opcional: cai para o parser nativo do Python
+    PARSER_HTML = "html.parser"
+
+BASE_URL = f"{ANS_BASE_URL}/demonstracoes_contabeis"
+CADOP_URL = f"{ANS_BASE_URL}/operadoras_de_plano_de_saude_ativas/Relatorio_cadop.csv"
+
+# Listagem da ANS em cache: evita refazer o crawl a cada execução
+LISTAGEM_CACHE = CACHE_DIR / "listagem.json"
+LISTAGEM_TTL = int(os.environ.get("ANS_LISTAGEM_TTL", str(6 * 3600)))  # segundos
+MAX_WORKERS_LISTAGEM = 8
 
 ARQUIVO_REGEX = re.compile(
     r"(?:(?P<trimestre>[1-4])\s*[Tt]?[-_]*\s*(?P<ano>\d{4})|"
@@ -18,64 +37,116 @@ ARQUIVO_REGEX = re.compile(
 # Helpers
 # =========================
 def _get_html(url: str) -> BeautifulSoup:
-    resp = requests.get(url, timeout=60)
+    resp = sessao().get(url, timeout=60)
     resp.raise_for_status()
-    return BeautifulSoup(resp.text, "html.parser")
+    # Só os links interessam: o parser ignora o resto da página
+    return BeautifulSoup(resp.text, PARSER_HTML, parse_only=SoupStrainer("a"))
 
 
-# =========================
-# Listagem de arquivos ANS
-# =========================
-def list_files_api(ultimos_trimestres_por_ano: int = 3, verbose: bool = True):
+def _arquivos_do_ano(year: str) -> list[dict]:
+    """ Lista os ZIPs trimestrais de um diretório de ano da ANS. """
+    soup_year = _get_html(f"{BASE_URL}/{year}")
+
+    files = []
+    for a in soup_year.find_all("a"):
+        href = a.get("href")
+        if not href or not href.endswith(".zip"):
+            continue
+
+        match = ARQUIVO_REGEX.search(href)
+        if not match:
+            continue
+
+        ano = match.group("ano") or match.group("ano2")
+        trimestre = match.group("trimestre") or match.group("trimestre2")
+
+        if ano and trimestre:
+            files.append(
+                {
+                    "ano": int(ano),
+                    "trimestre": int(trimestre),
+                    "filepath": f"{year}/{href}",
+                }
+            )
+
+    return files
+
+
+def _ler_listagem_cache() -> list[dict] | None:
+    try:
+        cache = json.loads(LISTAGEM_CACHE.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if cache.get("base_url") != BASE_URL or time.time() - cache.get("gerado_em", 0) > LISTAGEM_TTL:
+        return None
+    return cache["arquivos"]
+
+
+def _gravar_listagem_cache(files: list[dict]):
+    LISTAGEM_CACHE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = LISTAGEM_CACHE.with_suffix(".tmp")
+    tmp.write_text(
+        json.dumps({"base_url": BASE_URL, "gerado_em": time.time(), "arquivos": files}, indent=2),
+        encoding="utf-8"
+    )
+    os.replace(tmp, LISTAGEM_CACHE)
+
+
+def listar_arquivos_ans(verbose: bool = True, usar_cache: bool = True) -> list[dict]:
     """
-    Retorna lista ordenada de tuplas:
-    (ano, trimestre, filepath)
+    Faz o crawl completo da ANS (todos os anos, todos os trimestres).
+    Os diretórios de ano são lidos em paralelo; o resultado fica em cache por LISTAGEM_TTL segundos.
     """
-    try:
-        soup = _get_html(BASE_URL)
-
-        years = sorted(
-            [
-                a.get("href").strip("/")
-                for a in soup.find_all("a")
-                if a.get("href") and a.get("href").strip("/").isdigit()
-            ],
-            key=int
-        )
+    if usar_cache:
+        files = _ler_listagem_cache()
+        if files is not None:
+            if verbose:
+                print(f"[INFO] Listagem da ANS lida do cache ({len(files)} arquivos).")
+            return files
+
+    soup = _get_html(BASE_URL)
+
+    years = sorted(
+        {
+            a.get("href").strip("/")
+            for a in soup.find_all("a")
+            if a.get("href") and a.get("href").strip("/").isdigit()
+        },
+        key=int
+    )
 
-        files = []
+    def _listar(year):
+        try:
+            return _arquivos_do_ano(year)
+        except Exception as e:
+            if verbose:
+                print(f"[WARN] Falha ao acessar {year}: {e}")
+            return None
 
-        for year in years:
-            year_url = f"{BASE_URL}/{year}"
-            try:
-                soup_year = _get_html(year_url)
-            except Exception as e:
-                if verbose:
-                    print(f"[WARN] Falha ao acessar {year}: {e}")
-                continue
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS_LISTAGEM) as executor:
+        por_ano = list(executor.map(_listar, years))
 
-            for a in soup_year.find_all("a"):
-                href = a.get("href")
-                if not href or not href.endswith(".zip"):
-                    continue
+    files = [f for ano_files in por_ano if ano_files for f in ano_files]
+    files.sort(key=lambda x: (x["ano"], x["trimestre"]))
 
-                match = ARQUIVO_REGEX.search(href)
-                if not match:
-                    continue
+    # Crawl parcial não vai para o cache: a próxima execução tenta de novo
+    if files and all(ano_files is not None for ano_files in por_ano):
+        _gravar_listagem_cache(files)
 
-                ano = match.group("ano") or match.group("ano2")
-                trimestre = match.group("trimestre") or match.group("trimestre2")
+    return files
 
-                if ano and trimestre:
-                    files.append(
-                        {
-                            "ano": int(ano),
-                            "trimestre": int(trimestre),
-                            "filepath": f"{year}/{href}",
-                        }
-                    )
 
-        files.sort(key=lambda x: (x["ano"], x["trimestre"]))
+# =========================
+# Listagem de arquivos ANS
+# =========================
+def list_files_api(ultimos_trimestres_por_ano: int = 3, verbose: bool = True, usar_cache: bool = True):
+    """
+    Retorna lista ordenada de tuplas:
+    (ano, trimestre, filepath)
+    """
+    try:
+        files = listar_arquivos_ans(verbose=verbose, usar_cache=usar_cache)
 
         result = []
         for ano in sorted({f["ano"] for f in files}):
@@ -93,29 +164,30 @@ def list_files_api(ultimos_trimestres_por_ano: int = 3, verbose: bool = True):
 # =========================
 # Download
 # =========================
-def download_file(item, download_dir: Path):
+def url_arquivo(filepath: str) -> str:
+    return f"{BASE_URL}/{filepath}" if not filepath.startswith("http") else filepath
+
+
+def download_file(item, download_dir: Path | None = None):
     """
     item: (ano, trimestre, filepath)
+    Baixa para o cache local (utils.download_utils) e retorna (zip_path, ano, trimestre).
+    Com `download_dir`, o arquivo também é copiado para lá com o nome original.
     """
     ano, trimestre, filepath = item
-    download_dir = Path(download_dir)
-    download_dir.mkdir(parents=True, exist_ok=True)
-
-    zip_path = download_dir / Path(filepath).name
-    url = f"{BASE_URL}/{filepath}" if not filepath.startswith("http") else filepath
 
     try:
-        resp = requests.get(url, stream=True, timeout=120)
-        resp.raise_for_status()
+        zip_path, _ = baixar(url_arquivo(filepath))
 
-        with open(zip_path, "wb") as f:
-            for chunk in resp.iter_content(1024 * 1024):
-                f.write(chunk)
+        if download_dir is not None:
+            download_dir = Path(download_dir)
+            download_dir.mkdir(parents=True, exist_ok=True)
+            zip_path = Path(shutil.copyfile(zip_path, download_dir / Path(filepath).name))
 
         return zip_path, ano, trimestre
 
     except Exception as e:
-        print(f"[DOWNLOAD FALHOU] {zip_path.name}: {e}")
+        print(f"[DOWNLOAD FALHOU] {Path(filepath).name}: {e}")
         return None, ano, trimestre
 
 
@@ -125,86 +197,75 @@ def download_static_file(url: str, download_dir: str | Path) -> Path:
 
     output_path = download_dir / Path(url).name
 
-    resp = requests.get(url, stream=True, timeout=60)
-    resp.raise_for_status()
-
-    with open(output_path, "wb") as f:
-        for chunk in resp.iter_content(1024 * 1024):
-            f.write(chunk)
+    origem, _ = baixar(url)
+    shutil.copyfile(origem, output_path)
 
     return output_path
 
 
-# =========================
-# ZIP
-# =========================
-def extract_zip(zip_path: Path, extract_to: Path) -> Path:
-    extract_to.mkdir(parents=True, exist_ok=True)
-
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        zf.extractall(extract_to)
-
-    return extract_to
-
-def carregar_despesas(csv_path: Path) -> pd.DataFrame:
-    if not csv_path.exists():
-        raise FileNotFoundError(f"Arquivo não encontrado: {csv_path.resolve()}")
-
-    df = pd.read_csv(csv_path, dtype=str)
-
-    # normalizações mínimas esperadas pelo pipeline
-    df["REG_ANS"] = df["REG_ANS"].astype(str).str.strip()
-    df["ValorDespesas"] = df["ValorDespesas"].astype(float)
+def metadados_remotos(item) -> dict:
+    """
+    Consulta (HEAD) os metadados de um arquivo remoto sem baixá-lo.
+    item: (ano, trimestre, filepath)
+    Retorna dict com size, etag e last_modified (vazio se a consulta falhar).
+    """
+    _, _, filepath = item
+    url = url_arquivo(filepath)
 
-    return df
+    try:
+        resp = sessao().head(url, timeout=30, allow_redirects=True)
+        resp.raise_for_status()
+    except Exception as e:
+        print(f"[WARN] Falha ao consultar metadados de {filepath}: {e}")
+        return {}
+
+    size = resp.headers.get("Content-Length")
+    return {
+        "size": int(size) if size and size.isdigit() else None,
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+    }
+
+
+def hash_arquivo(path: Path, bloco: int = 1024 * 1024) -> str:
+    """ Calcula o SHA-256 do conteúdo de um arquivo lendo em blocos. """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(bloco), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def carregar_despesas(
+    path: Path,
+    colunas: list[str] | None = None,
+    particoes: list[tuple[int, int]] | None = None,
+    anos: list[int] | None = None,
+) -> pd.DataFrame:
+    """
+    Carrega a tabela de despesas gravada pela integração (Parquet ou CSV).
+    `colunas`, `particoes` [(ano, trimestre)] e `anos` limitam o que é lido do disco.
+    """
+    # Já volta no esquema do pipeline (utils.schema_utils): REG_ANS inteiro, textos como
+    # categoria e strings vazias como nulos, para o enriquecimento usar o cadastro
+    return ler_tabela(path, colunas=colunas, particoes=particoes, anos=anos)
 
 
-def carregar_operadoras(operadoras_dir: Path) -> pd.DataFrame:
+def caminho_cadop(operadoras_dir: Path) -> Path:
+    """ Caminho do Relatorio_cadop.csv em `operadoras_dir`, baixando-o se ainda não existir. """
     operadoras_dir = Path(operadoras_dir)
     operadoras_dir.mkdir(parents=True, exist_ok=True)
 
     csv_path = operadoras_dir / "Relatorio_cadop.csv"
 
     if not csv_path.exists():
-        from utils.file_utils import download_static_file  # evita import circular
         csv_path = download_static_file(
-            url="https://dadosabertos.ans.gov.br/FTP/PDA/operadoras_de_plano_de_saude_ativas/Relatorio_cadop.csv",
+            url=CADOP_URL,
             download_dir=operadoras_dir
         )
 
-    df = pd.read_csv(
-        csv_path,
-        sep=";",
-        encoding="latin1",
-        dtype=str
-    )
-
-    df.columns = df.columns.str.strip().str.replace('"', '')
-
-    df = df.rename(columns={
-        "REGISTRO_OPERADORA": "REG_ANS",
-        "Razao_Social": "RazaoSocial"
-    })
-
-    # garante colunas mínimas
-    for col in ["CNPJ", "REG_ANS", "RazaoSocial", "Modalidade", "UF"]:
-        if col not in df.columns:
-            df[col] = pd.NA
-        df[col] = df[col].astype(str).str.strip()
-
-    return df
-
-def zip_dir(source_dir: Path, output_zip: Path):
-    if not source_dir.exists():
-        raise FileNotFoundError(f"Pasta não encontrada: {source_dir.resolve()}")
+    return csv_path
 
-    with zipfile.ZipFile(output_zip, "w", zipfile.ZIP_DEFLATED) as zf:
-        for file in source_dir.rglob("*"):
-            if file.is_file():
-                zf.write(
-                    file,
-                    arcname=file.relative_to(source_dir)
-                )
 
 def rename_csv_columns(df: pd.DataFrame, columns_map: dict) -> pd.DataFrame:
     """
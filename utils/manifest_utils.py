@@ -0,0 +1,72 @@
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+
+VERSAO_MANIFEST = 1
+
+
+def carregar_manifest(path: Path) -> dict:
+    """ Lê o manifest de arquivos já processados (ou retorna um manifest vazio). """
+    path = Path(path)
+    if not path.exists():
+        return {"versao": VERSAO_MANIFEST, "arquivos": {}}
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[WARN] Manifest ilegível ({path}), reprocessando tudo: {e}")
+        return {"versao": VERSAO_MANIFEST, "arquivos": {}}
+
+    if manifest.get("versao") != VERSAO_MANIFEST:
+        return {"versao": VERSAO_MANIFEST, "arquivos": {}}
+
+    return manifest
+
+
+def salvar_manifest(manifest: dict, path: Path):
+    """ Grava o manifest de forma atômica (arquivo temporário + rename). """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    tmp.replace(path)
+
+
+def arquivo_mudou(entrada: dict | None, remoto: dict) -> bool:
+    """
+    Decide se um arquivo remoto precisa ser baixado novamente.
+    Usa ETag quando disponível; senão, tamanho + Last-Modified.
+    Sem metadados remotos o arquivo é considerado alterado (o hash decide depois).
+    """
+    if not entrada or not remoto:
+        return True
+
+    if remoto.get("etag") and entrada.get("etag"):
+        return remoto["etag"] != entrada["etag"]
+
+    if remoto.get("size") is None or remoto.get("last_modified") is None:
+        return True
+
+    return (
+        remoto["size"] != entrada.get("size")
+        or remoto["last_modified"] != entrada.get("last_modified")
+    )
+
+
+def registrar_arquivo(manifest: dict, item, remoto: dict, sha256: str, linhas: int):
+    """ Registra (ou atualiza) um arquivo processado no manifest. """
+    ano, trimestre, filepath = item
+    manifest["arquivos"][filepath] = {
+        "ano": ano,
+        "trimestre": trimestre,
+        "filepath": filepath,
+        "size": remoto.get("size"),
+        "etag": remoto.get("etag"),
+        "last_modified": remoto.get("last_modified"),
+        "sha256": sha256,
+        "linhas": linhas,
+        "processado_em": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
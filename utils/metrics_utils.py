@@ -0,0 +1,196 @@
+import os
+import sys
+import json
+import time
+import uuid
+import cProfile
+import tracemalloc
+from pathlib import Path
+from contextlib import contextmanager
+
+from utils.schema_utils import memoria_mb
+
+try:
+    import resource
+except ImportError:  # Windows: sem getrusage
+    resource = None
+
+# Métricas de cada etapa, uma linha JSON por etapa ("" desativa a gravação)
+METRICAS_PATH = os.environ.get("ANS_METRICAS", "data/metricas/pipeline.jsonl")
+
+# Perfis opcionais por etapa: nomes separados por vírgula ou "all"
+#   ANS_PROFILE=processamento,enriquecimento  -> cProfile (.prof em PERFIS_DIR)
+#   ANS_TRACEMALLOC=all                       -> pico e maiores alocações Python (tracemalloc)
+PERFIS_DIR = Path(os.environ.get("ANS_PERFIS_DIR", "data/metricas/perfis"))
+TOP_ALOCACOES = 10
+
+# Identifica as linhas de uma mesma execução do pipeline
+EXECUCAO_ID = os.environ.get("ANS_EXECUCAO_ID") or f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+_pilha = []
+
+
+def _habilitado(variavel: str, nome: str) -> bool:
+    valor = os.environ.get(variavel, "").strip().lower()
+    if not valor:
+        return False
+    return valor in ("1", "all", "true") or nome.lower() in {v.strip() for v in valor.split(",")}
+
+
+def _ler_vmhwm_mb() -> float | None:
+    """ Pico de RSS do processo (Linux, /proc/self/status). """
+    try:
+        with open("/proc/self/status") as f:
+            for linha in f:
+                if linha.startswith("VmHWM:"):
+                    return int(linha.split()[1]) / 2**10
+    except OSError:
+        pass
+    return None
+
+
+def _zerar_vmhwm() -> bool:
+    """ Reinicia o pico de RSS (Linux >= 4.0); permite medir o pico de cada etapa. """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _pico_rss_mb() -> float | None:
+    pico = _ler_vmhwm_mb()
+    if pico is not None or resource is None:
+        return pico
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 2**20 if sys.platform == "darwin" else maxrss / 2**10
+
+
+def tamanho_em_disco(path) -> int:
+    """ Bytes de um arquivo ou diretório (ex.: dataset Parquet particionado). """
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return 0
+
+
+class Etapa:
+    """ Contadores de uma etapa; preenchidos pelo código instrumentado dentro do `with`. """
+
+    def __init__(self, nome: str, **extra):
+        self.nome = nome
+        self.extra = extra
+        self.linhas_entrada = None
+        self.linhas_saida = None
+        self.bytes_lidos = None
+        self.bytes_escritos = None
+        self.memoria_df_mb = None
+        self._pico_filhas = 0.0
+
+    def leu(self, path):
+        self.bytes_lidos = (self.bytes_lidos or 0) + tamanho_em_disco(path)
+
+    def escreveu(self, path):
+        self.bytes_escritos = (self.bytes_escritos or 0) + tamanho_em_disco(path)
+
+    def memoria(self, df):
+        """ Memória ocupada pelo DataFrame produzido pela etapa (ver utils.schema_utils). """
+        self.memoria_df_mb = round(memoria_mb(df), 1)
+
+
+def registrar(registro: dict):
+    """ Acrescenta um registro ao arquivo de métricas (JSON lines). """
+    if not METRICAS_PATH:
+        return
+    path = Path(METRICAS_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+
+
+@contextmanager
+def etapa(nome: str, **extra):
+    """
+    Mede uma etapa do pipeline: duração, linhas/bytes (informados via objeto retornado)
+    e pico de memória. Etapas podem ser aninhadas; o registro é gravado ao sair do bloco.
+
+        with etapa("enriquecimento") as m:
+            m.linhas_entrada = len(despesas)
+            df = enriquecer_dados(despesas, operadoras)
+            m.linhas_saida = len(df)
+    """
+    m = Etapa(nome, **extra)
+
+    # O pico acumulado até aqui pertence à etapa externa, antes de zerar o contador
+    if _pilha:
+        _pilha[-1]._pico_filhas = max(_pilha[-1]._pico_filhas, _ler_vmhwm_mb() or 0.0)
+    pico_por_etapa = _zerar_vmhwm()
+    _pilha.append(m)
+
+    perfil = cProfile.Profile() if _habilitado("ANS_PROFILE", nome) else None
+    rastrear = _habilitado("ANS_TRACEMALLOC", nome) and not tracemalloc.is_tracing()
+    if rastrear:
+        tracemalloc.start()
+    if perfil:
+        perfil.enable()
+
+    inicio = time.time()
+    t0 = time.perf_counter()
+    status, erro = "ok", None
+    try:
+        yield m
+    except BaseException as e:
+        status, erro = "erro", f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        duracao = time.perf_counter() - t0
+        if perfil:
+            perfil.disable()
+        _pilha.pop()
+
+        pico = max(_pico_rss_mb() or 0.0, m._pico_filhas) or None
+        if _pilha and pico:
+            _pilha[-1]._pico_filhas = max(_pilha[-1]._pico_filhas, pico)
+
+        registro = {
+            "execucao": EXECUCAO_ID,
+            "etapa": nome,
+            "pai": _pilha[-1].nome if _pilha else None,
+            "inicio": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(inicio)),
+            "duracao_s": round(duracao, 3),
+            "status": status,
+            "erro": erro,
+            "linhas_entrada": m.linhas_entrada,
+            "linhas_saida": m.linhas_saida,
+            "bytes_lidos": m.bytes_lidos,
+            "bytes_escritos": m.bytes_escritos,
+            "pico_rss_mb": round(pico, 1) if pico else None,
+            "memoria_df_mb": m.memoria_df_mb,
+            # Sem /proc/self/clear_refs o pico é o do processo desde o início, não o da etapa
+            "pico_rss_escopo": "etapa" if pico_por_etapa else "processo",
+            **m.extra,
+        }
+
+        if rastrear:
+            _, pico_python = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics("lineno")[:TOP_ALOCACOES]
+            tracemalloc.stop()
+            registro["tracemalloc_pico_mb"] = round(pico_python / 2**20, 1)
+            registro["tracemalloc_top"] = [
+                {"local": str(s.traceback[0]), "mb": round(s.size / 2**20, 2), "blocos": s.count} for s in top
+            ]
+
+        if perfil:
+            PERFIS_DIR.mkdir(parents=True, exist_ok=True)
+            destino = PERFIS_DIR / f"{EXECUCAO_ID}_{nome}.prof"
+            perfil.dump_stats(destino)
+            registro["perfil"] = str(destino)
+
+        registrar(registro)
+
+        linhas = f", {m.linhas_saida} linhas" if m.linhas_saida is not None else ""
+        memoria = f", {m.memoria_df_mb} MB em memória" if m.memoria_df_mb is not None else ""
+        print(f"[INFO] Etapa {nome}: {duracao:.2f}s{linhas}{memoria} ({status})")
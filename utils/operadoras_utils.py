@@ -0,0 +1,120 @@
+import json
+import hashlib
+from pathlib import Path
+
+import pandas as pd
+
+from utils.cnpj_utils import normalizar_cnpj_series, valida_cnpj_series
+from utils.download_utils import CACHE_DIR
+from utils.file_utils import caminho_cadop, hash_arquivo
+from utils.storage_utils import salvar_tabela, ler_tabela, existe_tabela
+
+# Dimensão de operadoras: uma linha por registro ANS, já normalizada e tipada.
+# Fica em cache (Parquet) e só é reconstruída quando o Relatorio_cadop.csv muda.
+DIMENSAO_DIR = CACHE_DIR / "dimensoes"
+
+# Incrementar quando montar_dimensao_operadoras mudar: invalida os caches antigos
+VERSAO_DIMENSAO = 1
+
+COLUNAS_CADOP = {
+    "REGISTRO_OPERADORA": "registro_ans",
+    "CNPJ": "cnpj",
+    "Razao_Social": "razao_social",
+    "Nome_Fantasia": "nome_fantasia",
+    "Modalidade": "modalidade",
+    "UF": "uf",
+    "Data_Registro_ANS": "data_registro_ans",
+}
+COLUNAS_DIMENSAO = [
+    "registro_ans", "cnpj", "cnpj_valido", "razao_social", "nome_fantasia",
+    "modalidade", "uf", "data_registro_ans",
+]
+
+
+def montar_dimensao_operadoras(cadop: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converte o cadastro bruto da ANS (lido com dtype=str) na dimensão de operadoras:
+    registro_ans inteiro e único, CNPJ normalizado e validado uma única vez por operadora,
+    modalidade/UF como categoria e data de registro como data.
+    """
+    cadop = cadop.rename(columns=lambda c: str(c).strip().replace('"', ""))
+    df = cadop.reindex(columns=list(COLUNAS_CADOP)).rename(columns=COLUNAS_CADOP)
+
+    texto = [c for c in df.columns if c != "registro_ans"]
+    df[texto] = df[texto].apply(lambda s: s.str.strip())
+    df[texto] = df[texto].mask(df[texto] == "")
+
+    df["registro_ans"] = pd.to_numeric(df["registro_ans"], errors="coerce")
+    df = df.dropna(subset=["registro_ans"]).drop_duplicates("registro_ans")
+
+    df["registro_ans"] = df["registro_ans"].astype("int64")
+    df["cnpj"] = normalizar_cnpj_series(df["cnpj"])
+    df["cnpj_valido"] = valida_cnpj_series(df["cnpj"])
+    df["data_registro_ans"] = pd.to_datetime(df["data_registro_ans"], errors="coerce")
+
+    return _tipar_dimensao(df[COLUNAS_DIMENSAO].reset_index(drop=True))
+
+
+def _tipar_dimensao(df: pd.DataFrame) -> pd.DataFrame:
+    """ Tipos da dimensão (também reaplicados quando o cache está em CSV, sem pyarrow). """
+    if df["cnpj_valido"].dtype != bool:
+        df["cnpj_valido"] = df["cnpj_valido"].astype(str).str.lower() == "true"
+    df["registro_ans"] = df["registro_ans"].astype("int64")
+    df["modalidade"] = df["modalidade"].astype("category")
+    df["uf"] = df["uf"].astype("category")
+    df["data_registro_ans"] = pd.to_datetime(df["data_registro_ans"], errors="coerce")
+    return df.set_index("registro_ans", drop=False)
+
+
+def _assinatura(csv_path: Path) -> dict:
+    stat = csv_path.stat()
+    return {
+        "versao": VERSAO_DIMENSAO,
+        "origem": str(csv_path.resolve()),
+        "tamanho": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def carregar_dimensao_operadoras(operadoras_dir: Path, usar_cache: bool = True) -> pd.DataFrame:
+    """
+    Dimensão de operadoras indexada por registro_ans (inteiro).
+
+    O cache é revalidado pelo tamanho/mtime do Relatorio_cadop.csv; se só o mtime mudou
+    (ex.: o mesmo arquivo baixado de novo), o SHA-256 decide se é preciso reconstruir.
+    """
+    csv_path = caminho_cadop(operadoras_dir)
+    assinatura = _assinatura(csv_path)
+
+    # Um cache por arquivo de origem (dados reais e de benchmark não se sobrescrevem)
+    chave = hashlib.sha1(assinatura["origem"].encode("utf-8")).hexdigest()[:16]
+    base = DIMENSAO_DIR / f"operadoras_{chave}"
+    meta_path = DIMENSAO_DIR / f"operadoras_{chave}.json"
+
+    meta = None
+    if usar_cache and meta_path.exists() and existe_tabela(base, formato="parquet"):
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            meta = None
+
+    if meta and meta.get("versao") == VERSAO_DIMENSAO:
+        mesmo_arquivo = all(meta.get(k) == assinatura[k] for k in ("tamanho", "mtime_ns"))
+        if not mesmo_arquivo and meta.get("tamanho") == assinatura["tamanho"]:
+            assinatura["sha256"] = hash_arquivo(csv_path)
+            mesmo_arquivo = meta.get("sha256") == assinatura["sha256"]
+            if mesmo_arquivo:
+                meta_path.write_text(json.dumps({**meta, **assinatura}), encoding="utf-8")
+
+        if mesmo_arquivo:
+            return _tipar_dimensao(ler_tabela(base, formato="parquet"))
+
+    print(f"[INFO] Montando dimensão de operadoras a partir de {csv_path}")
+    cadop = pd.read_csv(csv_path, sep=";", encoding="latin1", dtype=str)
+    dimensao = montar_dimensao_operadoras(cadop)
+
+    salvar_tabela(dimensao, base, formato="parquet")
+    assinatura.setdefault("sha256", hash_arquivo(csv_path))
+    meta_path.write_text(json.dumps(assinatura), encoding="utf-8")
+
+    return dimensao
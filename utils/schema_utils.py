@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Esquema tipado das tabelas do pipeline (consolidado, válidos, enriquecido e agregado).
+# Texto repetido em muitas linhas vira categoria (um código inteiro por linha e cada valor
+# guardado uma vez) e os inteiros usam o menor tipo que comporta o domínio.
+TIPOS_COLUNAS = {
+    "REG_ANS": "Int32",             # registro ANS (6 dígitos)
+    "RegistroANS": "Int32",
+    "CNPJ": "category",
+    "RazaoSocial": "category",
+    "Modalidade": "category",
+    "UF": "category",
+    "Ano": "Int16",
+    "Trimestre": "Int8",
+    "ValorDespesas": "float64",
+    "total_despesas": "float64",
+    "media_trimestral": "float64",
+    "desvio_padrao": "float64",
+}
+
+
+def _inteiro(serie: pd.Series, tipo: str) -> pd.Series:
+    """ Converte para o inteiro `tipo`; texto inválido, frações e valores fora da faixa viram nulo. """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Partições Hive podem voltar como categoria
+        serie = serie.astype(serie.cat.categories.dtype)
+    numeros = pd.to_numeric(serie, errors="coerce")
+
+    limites = np.iinfo(tipo.lower())
+    cabe = numeros.between(limites.min, limites.max) & (numeros % 1 == 0)
+    return numeros.where(cabe).astype(tipo)
+
+
+def tipar_colunas(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aplica os tipos de TIPOS_COLUNAS às colunas presentes no DataFrame.
+    Colunas já tipadas não são convertidas de novo; em colunas de texto, "" vira nulo.
+    """
+    pendentes = [c for c, t in TIPOS_COLUNAS.items() if c in df.columns and str(df[c].dtype) != t]
+    if not pendentes:
+        return df
+
+    df = df.copy(deep=False)
+    for coluna in pendentes:
+        tipo = TIPOS_COLUNAS[coluna]
+        if tipo == "category":
+            serie = df[coluna]
+            df[coluna] = serie.mask(serie == "").astype("category")
+        elif tipo.startswith("Int"):
+            df[coluna] = _inteiro(df[coluna], tipo)
+        else:
+            df[coluna] = df[coluna].astype(tipo)
+    return df
+
+
+def concatenar(partes: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    pd.concat que preserva as categorias: cada bloco tem o próprio dicionário de valores,
+    e o concat comum voltaria a texto (object) quando eles diferem.
+    """
+    partes = [p for p in partes if not p.empty] or partes[:1]
+    if len(partes) <= 1:
+        return partes[0].reset_index(drop=True) if partes else pd.DataFrame()
+
+    categoricas = [c for c in partes[0].columns if isinstance(partes[0][c].dtype, pd.CategoricalDtype)]
+    for coluna in categoricas:
+        if not all(isinstance(p[coluna].dtype, pd.CategoricalDtype) for p in partes):
+            continue
+        categorias = union_categoricals([p[coluna].array for p in partes]).categories
+        partes = [p.assign(**{coluna: p[coluna].cat.set_categories(categorias)}) for p in partes]
+
+    return pd.concat(partes, ignore_index=True)
+
+
+def memoria_mb(df: pd.DataFrame) -> float:
+    """ Memória ocupada pelo DataFrame, incluindo o conteúdo das strings. """
+    return df.memory_usage(deep=True).sum() / 2**20
@@ -0,0 +1,233 @@
+import os
+import shutil
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+from utils.schema_utils import TIPOS_COLUNAS, tipar_colunas
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    PARQUET_DISPONIVEL = True
+except ImportError:  # pyarrow é opcional: sem ele o pipeline volta a trocar CSV entre as etapas
+    PARQUET_DISPONIVEL = False
+
+# Formato usado para trocar dados entre as etapas do pipeline ("parquet" ou "csv")
+FORMATO_SAIDA = os.environ.get("ANS_FORMATO_SAIDA", "parquet").lower()
+COMPRESSAO_PARQUET = "zstd"
+
+# Colunas de particionamento (layout Hive: Ano=AAAA/Trimestre=T/)
+COLUNAS_PARTICAO = ["Ano", "Trimestre"]
+
+# Nome do diretório das linhas com Ano/Trimestre nulos (padrão do pyarrow e do Hive)
+PARTICAO_NULA = "__HIVE_DEFAULT_PARTITION__"
+
+EXTENSOES = {"parquet": ".parquet", "csv": ".csv"}
+
+
+def resolver_formato(formato: str | None = None) -> str:
+    """ Retorna o formato efetivo, caindo para CSV quando o pyarrow não está instalado. """
+    formato = (formato or FORMATO_SAIDA).lower()
+    if formato not in EXTENSOES:
+        raise ValueError(f"Formato de saída desconhecido: {formato}")
+    if formato == "parquet" and not PARQUET_DISPONIVEL:
+        return "csv"
+    return formato
+
+
+def caminho_tabela(base: Path, formato: str | None = None) -> Path:
+    """ Caminho físico de uma tabela: `base` + extensão do formato (diretório se for Parquet particionado). """
+    return Path(base).with_suffix(EXTENSOES[resolver_formato(formato)])
+
+
+def existe_tabela(base: Path, formato: str | None = None) -> bool:
+    return caminho_tabela(base, formato).exists()
+
+
+def _schema_arrow(df: pd.DataFrame) -> "pa.Schema":
+    """
+    Schema Arrow do DataFrame com índices de dicionário int32 em todas as categorias.
+    O pandas usa int8/int16 conforme o número de categorias; partes gravadas em separado
+    teriam tipos diferentes e não poderiam ser lidas juntas como um dataset.
+    """
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    for i, campo in enumerate(schema):
+        if pa.types.is_dictionary(campo.type):
+            valores = pa.string() if pa.types.is_null(campo.type.value_type) else campo.type.value_type
+            schema = schema.set(i, campo.with_type(pa.dictionary(pa.int32(), valores)))
+    return schema
+
+
+def remover_tabela(base: Path, formato: str | None = None):
+    """ Apaga a tabela (arquivo ou diretório de partições), se existir. """
+    destino = caminho_tabela(base, formato)
+    if destino.is_dir():
+        shutil.rmtree(destino)
+    elif destino.exists():
+        destino.unlink()
+
+
+def salvar_tabela(
+    df: pd.DataFrame, base: Path, particionar: bool = False, formato: str | None = None, acrescentar: bool = False
+) -> Path:
+    """
+    Grava um DataFrame no formato configurado.
+    Em Parquet, `particionar=True` gera um dataset particionado por Ano/Trimestre; com
+    `acrescentar=True` os arquivos vão para as partições sem apagar o que já foi gravado
+    (uma partição por vez: o chamador limpa a tabela com remover_tabela antes da primeira).
+    """
+    formato = resolver_formato(formato)
+    destino = caminho_tabela(base, formato)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+
+    if formato == "csv":
+        df.to_csv(destino, index=False, encoding="utf-8")
+        return destino
+
+    if acrescentar and particionar and df.empty:
+        # Nada a acrescentar; gravar um arquivo vazio no lugar do diretório de partições quebraria o dataset
+        return destino
+
+    df = tipar_colunas(df)
+
+    # to_parquet com partition_cols acrescenta arquivos: limpa a versão anterior
+    if not (acrescentar and particionar):
+        remover_tabela(base, formato)
+
+    schema = _schema_arrow(df)
+    if particionar and not df.empty and all(c in df.columns for c in COLUNAS_PARTICAO):
+        df.to_parquet(
+            destino, partition_cols=COLUNAS_PARTICAO, compression=COMPRESSAO_PARQUET, index=False, schema=schema
+        )
+    else:
+        df.to_parquet(destino, compression=COMPRESSAO_PARQUET, index=False, schema=schema)
+
+    return destino
+
+
+def salvar_parte(df: pd.DataFrame, base: Path, nome: str, formato: str | None = None) -> Path:
+    """
+    Grava `df` como uma das partes da tabela `base` (diretório com um arquivo por parte).
+    Usado por workers que escrevem o próprio resultado em paralelo; ler_tabela lê as partes juntas.
+    """
+    formato = resolver_formato(formato)
+    return salvar_tabela(df, caminho_tabela(base, formato) / nome, formato=formato)
+
+
+def _valor_particao(valor) -> int | None:
+    return None if pd.isna(valor) else int(valor)
+
+
+def _ordem_particao(particao: tuple) -> tuple:
+    # Partições nulas por último
+    return tuple((v is None, v or 0) for v in particao)
+
+
+def listar_particoes(base: Path, formato: str | None = None) -> list[tuple[int | None, int | None]]:
+    """
+    Pares (Ano, Trimestre) presentes na tabela, em ordem. Linhas sem Ano ou Trimestre
+    formam partições com None (diretório PARTICAO_NULA no Parquet).
+    """
+    formato = resolver_formato(formato)
+    origem = caminho_tabela(base, formato)
+
+    if formato == "parquet" and origem.is_dir():
+        # Dataset particionado: basta olhar os diretórios Ano=AAAA/Trimestre=T
+        particoes = set()
+        for pasta in origem.glob("Ano=*/Trimestre=*"):
+            if pasta.is_dir() and any(pasta.iterdir()):
+                valores = (pasta.parent.name.split("=", 1)[1], pasta.name.split("=", 1)[1])
+                if all(v.isdigit() or v == PARTICAO_NULA for v in valores):
+                    particoes.add(tuple(int(v) if v.isdigit() else None for v in valores))
+        return sorted(particoes, key=_ordem_particao)
+
+    df = ler_tabela(base, colunas=COLUNAS_PARTICAO, formato=formato).drop_duplicates()
+    particoes = {(_valor_particao(a), _valor_particao(t)) for a, t in df.itertuples(index=False)}
+    return sorted(particoes, key=_ordem_particao)
+
+
+def _condicao_particao(coluna: str, valor: int | None):
+    return ds.field(coluna).is_null() if valor is None else ds.field(coluna) == valor
+
+
+def ler_tabela(
+    base: Path,
+    colunas: list[str] | None = None,
+    particoes: list[tuple[int, int]] | None = None,
+    anos: list[int] | None = None,
+    formato: str | None = None,
+) -> pd.DataFrame:
+    """
+    Lê uma tabela gravada por salvar_tabela.
+    Em Parquet, apenas as colunas e partições (Ano/Trimestre) pedidas são lidas do disco.
+    """
+    formato = resolver_formato(formato)
+    origem = caminho_tabela(base, formato)
+
+    if not origem.exists():
+        raise FileNotFoundError(f"Arquivo não encontrado: {origem.resolve()}")
+
+    if formato == "csv":
+        if origem.is_dir():
+            # Tabela gravada em partes (salvar_parte)
+            partes = [pd.read_csv(p, usecols=colunas, dtype=str, encoding="utf-8") for p in sorted(origem.glob("*.csv"))]
+            df = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=colunas)
+        else:
+            df = pd.read_csv(origem, usecols=colunas, dtype=str, encoding="utf-8")
+        if particoes is not None:
+            alvo = set(particoes)
+            chaves = zip(*([_valor_particao(v) for v in pd.to_numeric(df[c])] for c in COLUNAS_PARTICAO))
+            df = df[np.fromiter((chave in alvo for chave in chaves), dtype=bool, count=len(df))]
+        if anos is not None:
+            df = df[pd.to_numeric(df["Ano"]).isin(anos)]
+        return tipar_colunas(df.reset_index(drop=True))
+
+    dataset = ds.dataset(origem, format="parquet")
+    faltam = [c for c in COLUNAS_PARTICAO if c not in dataset.schema.names]
+    if origem.is_dir() and faltam:
+        # Dataset particionado: Ano/Trimestre vêm do caminho (Ano=AAAA/Trimestre=T/), com os tipos do esquema
+        particionamento = ds.partitioning(
+            pa.schema([(c, pa.from_numpy_dtype(np.dtype(TIPOS_COLUNAS[c].lower()))) for c in faltam]),
+            flavor="hive"
+        )
+        dataset = ds.dataset(origem, format="parquet", partitioning=particionamento)
+
+    filtro = None
+    if particoes is not None:
+        # Lista vazia de partições: nenhum registro
+        filtro = ds.field("Ano").isin([])
+        for ano, trimestre in particoes:
+            cond = _condicao_particao("Ano", ano) & _condicao_particao("Trimestre", trimestre)
+            filtro = filtro | cond
+    if anos is not None:
+        cond = ds.field("Ano").isin(list(anos))
+        filtro = cond if filtro is None else filtro & cond
+
+    tabela = dataset.to_table(columns=colunas, filter=filtro)
+    return tipar_colunas(tabela.to_pandas(ignore_metadata=True))
+
+
+def exportar_csv(base: Path, colunas: list[str] | None = None) -> Path:
+    """
+    Grava a versão CSV de uma tabela (`base`.csv), que é o arquivo de entrega: vai para os ZIPs e é o
+    que o sql/staging/03_load_csv.sql lê. O Parquet continua sendo o formato entre as etapas.
+    Em Parquet particionado, uma partição Ano/Trimestre é lida e acrescentada por vez; `colunas` define
+    a ordem do cabeçalho (as colunas de partição voltam do dataset por último).
+    Com o pipeline já em CSV, a própria tabela é a entrega e nada é gravado.
+    """
+    destino = caminho_tabela(base, "csv")
+    if resolver_formato() == "csv":
+        return destino
+
+    origem = caminho_tabela(base)
+    particionada = origem.is_dir() and any(origem.glob("Ano=*"))
+    lotes = ([[p] for p in listar_particoes(base)] if particionada else None) or [None]
+
+    temporario = destino.with_name(destino.name + ".tmp")
+    with open(temporario, "w", encoding="utf-8", newline="") as f:
+        for i, particoes in enumerate(lotes):
+            df = ler_tabela(base, colunas=colunas, particoes=particoes)
+            df[colunas or df.columns].to_csv(f, index=False, header=i == 0)
+    os.replace(temporario, destino)
+    return destino
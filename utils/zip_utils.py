@@ -0,0 +1,292 @@
+import os
+import json
+import zlib
+import struct
+import hashlib
+import zipfile
+from pathlib import Path
+from collections import deque
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.download_utils import CACHE_DIR
+from utils.file_utils import hash_arquivo
+
+# Nível do deflate (0-9) e threads de compressão dos ZIPs de saída do pipeline
+NIVEL_ZIP = int(os.environ.get("ANS_ZIP_NIVEL", "6"))
+MAX_WORKERS_ZIP = int(os.environ.get("ANS_ZIP_WORKERS", "0")) or os.cpu_count() or 1
+
+# Cada arquivo é comprimido em blocos independentes, em paralelo (como o pigz). Cada bloco usa
+# os últimos 32 KiB do anterior como dicionário, então a taxa de compressão quase não muda.
+TAMANHO_BLOCO_ZIP = 4 * 2**20
+JANELA_DEFLATE = 32 * 2**10
+
+# Hash do conteúdo de cada membro do último ZIP gerado: membros sem mudança são copiados
+# já comprimidos do ZIP anterior
+ZIP_MANIFEST_DIR = CACHE_DIR / "zips"
+
+# Formato ZIP (APPNOTE.TXT): cabeçalho local, diretório central e fim do diretório (e zip64)
+_CABECALHO_LOCAL = struct.Struct("<IHHHHHIIIHH")
+_CABECALHO_CENTRAL = struct.Struct("<IHHHHHHIIIHHHHHII")
+_FIM_DIRETORIO = struct.Struct("<IHHHHIIH")
+_FIM_DIRETORIO_64 = struct.Struct("<IQHHIIQQQQ")
+_LOCALIZADOR_64 = struct.Struct("<IIQI")
+_LIMITE_32 = 0xFFFFFFFF
+_VERSAO_ZIP, _VERSAO_ZIP64 = 20, 45
+_FEITO_EM_UNIX = 3 << 8
+_FLAG_UTF8 = 0x800
+
+
+def _comprimir_bloco(bloco: bytes, dicionario: bytes, nivel: int, ultimo: bool) -> bytes:
+    """
+    Deflate cru de um bloco. Os blocos intermediários terminam com Z_SYNC_FLUSH (alinhados
+    em byte, sem marcar fim de stream), então a concatenação de todos é um único stream válido.
+    """
+    if dicionario:
+        comp = zlib.compressobj(nivel, zlib.DEFLATED, -15, zlib.DEF_MEM_LEVEL, zlib.Z_DEFAULT_STRATEGY, dicionario)
+    else:
+        comp = zlib.compressobj(nivel, zlib.DEFLATED, -15)
+    return comp.compress(bloco) + comp.flush(zlib.Z_FINISH if ultimo else zlib.Z_SYNC_FLUSH)
+
+
+def _data_dos(date_time: tuple) -> tuple[int, int]:
+    ano, mes, dia, hora, minuto, segundo = date_time
+    return (hora << 11) | (minuto << 5) | (segundo // 2), ((ano - 1980) << 9) | (mes << 5) | dia
+
+
+class _EscritorZip:
+    """
+    Escrita de um ZIP com dados já comprimidos (deflate). O zipfile da biblioteca padrão
+    sempre comprime o que recebe; aqui os blocos chegam prontos dos workers ou copiados de
+    outro ZIP. O cabeçalho local é reescrito com CRC e tamanhos quando o membro termina.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self._membros = []
+        self._atual = None
+
+    def _cabecalho_local(self, info: zipfile.ZipInfo, crc: int, comprimido: int, zip64: bool) -> bytes:
+        nome = info.filename.encode("utf-8")
+        hora, data = _data_dos(info.date_time)
+        flags = 0 if info.filename.isascii() else _FLAG_UTF8
+        extra = struct.pack("<HHQQ", 1, 16, info.file_size, comprimido) if zip64 else b""
+        return _CABECALHO_LOCAL.pack(
+            0x04034B50, _VERSAO_ZIP64 if zip64 else _VERSAO_ZIP, flags, zipfile.ZIP_DEFLATED,
+            hora, data, crc,
+            _LIMITE_32 if zip64 else comprimido,
+            _LIMITE_32 if zip64 else info.file_size,
+            len(nome), len(extra),
+        ) + nome + extra
+
+    def iniciar(self, info: zipfile.ZipInfo):
+        # zip64 decidido antes dos dados (o cabeçalho reescrito precisa ter o mesmo tamanho)
+        zip64 = info.file_size >= zipfile.ZIP64_LIMIT
+        offset = self.fp.tell()
+        self.fp.write(self._cabecalho_local(info, 0, 0, zip64))
+        self._atual = (info, offset, self.fp.tell(), zip64)
+
+    def escrever(self, dados: bytes):
+        self.fp.write(dados)
+
+    def concluir(self, crc: int):
+        info, offset, inicio_dados, zip64 = self._atual
+        fim = self.fp.tell()
+        comprimido = fim - inicio_dados
+
+        self.fp.seek(offset)
+        self.fp.write(self._cabecalho_local(info, crc, comprimido, zip64))
+        self.fp.seek(fim)
+
+        self._membros.append((info, crc, comprimido, offset))
+        self._atual = None
+
+    def copiar(self, info: zipfile.ZipInfo, origem, info_origem: zipfile.ZipInfo):
+        """ Copia os bytes comprimidos de um membro de outro ZIP (já aberto em `origem`). """
+        origem.seek(info_origem.header_offset)
+        local = _CABECALHO_LOCAL.unpack(origem.read(_CABECALHO_LOCAL.size))
+        origem.seek(info_origem.header_offset + _CABECALHO_LOCAL.size + local[9] + local[10])
+
+        self.iniciar(info)
+        falta = info_origem.compress_size
+        while falta:
+            dados = origem.read(min(TAMANHO_BLOCO_ZIP, falta))
+            if not dados:
+                raise zipfile.BadZipFile(f"Membro truncado no ZIP anterior: {info_origem.filename}")
+            self.escrever(dados)
+            falta -= len(dados)
+        self.concluir(info_origem.CRC)
+
+    def fechar(self):
+        inicio_diretorio = self.fp.tell()
+        for info, crc, comprimido, offset in self._membros:
+            nome = info.filename.encode("utf-8")
+            hora, data = _data_dos(info.date_time)
+
+            # Campos que não cabem em 32 bits vão para o extra zip64, nesta ordem
+            campos = [v for v in (info.file_size, comprimido, offset) if v >= _LIMITE_32]
+            extra = struct.pack(f"<HH{len(campos)}Q", 1, 8 * len(campos), *campos) if campos else b""
+            versao = _VERSAO_ZIP64 if campos else _VERSAO_ZIP
+
+            self.fp.write(_CABECALHO_CENTRAL.pack(
+                0x02014B50, _FEITO_EM_UNIX | versao, versao,
+                0 if info.filename.isascii() else _FLAG_UTF8, zipfile.ZIP_DEFLATED,
+                hora, data, crc,
+                min(comprimido, _LIMITE_32), min(info.file_size, _LIMITE_32),
+                len(nome), len(extra), 0, 0, 0, info.external_attr, min(offset, _LIMITE_32),
+            ) + nome + extra)
+
+        fim_diretorio = self.fp.tell()
+        total, tamanho = len(self._membros), fim_diretorio - inicio_diretorio
+
+        if total >= 0xFFFF or inicio_diretorio >= _LIMITE_32 or tamanho >= _LIMITE_32:
+            self.fp.write(_FIM_DIRETORIO_64.pack(
+                0x06064B50, _FIM_DIRETORIO_64.size - 12, _FEITO_EM_UNIX | _VERSAO_ZIP64, _VERSAO_ZIP64,
+                0, 0, total, total, tamanho, inicio_diretorio,
+            ))
+            self.fp.write(_LOCALIZADOR_64.pack(0x07064B50, 0, fim_diretorio, 1))
+
+        self.fp.write(_FIM_DIRETORIO.pack(
+            0x06054B50, 0, 0, min(total, 0xFFFF), min(total, 0xFFFF),
+            min(tamanho, _LIMITE_32), min(inicio_diretorio, _LIMITE_32), 0,
+        ))
+
+
+def _caminho_manifest(output_zip: Path) -> Path:
+    chave = hashlib.sha1(str(Path(output_zip).resolve()).encode("utf-8")).hexdigest()[:16]
+    return ZIP_MANIFEST_DIR / f"{Path(output_zip).stem}_{chave}.json"
+
+
+def _ler_manifest(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def zip_dir(
+    source_dir: Path,
+    output_zip: Path,
+    nivel: int | None = None,
+    max_workers: int | None = None,
+    extensoes: tuple[str, ...] | None = None,
+) -> dict:
+    """
+    Compacta os arquivos de um diretório em um arquivo ZIP (deflate, nível `nivel`).
+    `extensoes` limita o ZIP aos arquivos com esses sufixos (ex.: só os CSV de entrega).
+
+    Os arquivos são lidos em blocos de TAMANHO_BLOCO_ZIP comprimidos em paralelo por threads
+    (o zlib libera o GIL), e os blocos são gravados em ordem. Arquivos com o mesmo conteúdo (SHA-256,
+    ou tamanho e mtime iguais aos do mesmo nome) de algum membro do ZIP anterior não são comprimidos
+    de novo: os bytes comprimidos são copiados dele. Retorna as contagens de membros comprimidos e reaproveitados.
+    """
+    source_dir, output_zip = Path(source_dir), Path(output_zip)
+    if not source_dir.exists():
+        raise FileNotFoundError(f"Pasta não encontrada: {source_dir.resolve()}")
+
+    nivel = NIVEL_ZIP if nivel is None else nivel
+    max_workers = max_workers or MAX_WORKERS_ZIP
+    temporario = output_zip.with_name(output_zip.name + ".tmp")
+
+    arquivos = sorted(
+        p for p in source_dir.rglob("*")
+        if p.is_file() and p.resolve() not in (output_zip.resolve(), temporario.resolve())
+        and (extensoes is None or p.suffix.lower() in extensoes)
+    )
+
+    manifest_path = _caminho_manifest(output_zip)
+    anterior = _ler_manifest(manifest_path) if output_zip.exists() else {}
+    reaproveitaveis = anterior.get("membros", {}) if anterior.get("nivel") == nivel else {}
+    por_hash = {m["sha256"]: nome for nome, m in reaproveitaveis.items()}
+    tamanhos_anteriores = {m["tamanho"] for m in reaproveitaveis.values()}
+    membros = {}
+    contagem = {"comprimidos": 0, "reaproveitados": 0}
+
+    with ExitStack() as pilha:
+        zip_anterior = None
+        if reaproveitaveis:
+            try:
+                zip_anterior = pilha.enter_context(zipfile.ZipFile(output_zip))
+                origem = pilha.enter_context(open(output_zip, "rb"))
+            except (zipfile.BadZipFile, OSError):
+                zip_anterior = None
+
+        fp = pilha.enter_context(open(temporario, "wb"))
+        executor = pilha.enter_context(ThreadPoolExecutor(max_workers=max_workers))
+        escritor = _EscritorZip(fp)
+
+        # Fila em ordem de gravação; no máximo 2 blocos por worker em andamento
+        fila, blocos_na_fila = deque(), 0
+
+        def gravar(limite: int):
+            nonlocal blocos_na_fila
+            while fila and blocos_na_fila > limite or (fila and fila[0][0] != "bloco"):
+                tipo, *args = fila.popleft()
+                if tipo == "inicio":
+                    escritor.iniciar(*args)
+                elif tipo == "bloco":
+                    escritor.escrever(args[0].result())
+                    blocos_na_fila -= 1
+                elif tipo == "fim":
+                    escritor.concluir(*args)
+                else:
+                    escritor.copiar(*args)
+
+        for path in arquivos:
+            arcname = path.relative_to(source_dir).as_posix()
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            stat = path.stat()
+            meta = {"tamanho": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+            # Procura pelo conteúdo, não pelo nome: partes Parquet regravadas mudam de nome
+            if zip_anterior is not None and stat.st_size in tamanhos_anteriores:
+                antigo = reaproveitaveis.get(arcname, {})
+                if (antigo.get("tamanho"), antigo.get("mtime_ns")) == (stat.st_size, stat.st_mtime_ns):
+                    meta["sha256"] = antigo["sha256"]
+                else:
+                    meta["sha256"] = hash_arquivo(path)
+
+                try:
+                    info_antiga = zip_anterior.getinfo(por_hash.get(meta["sha256"], ""))
+                except KeyError:
+                    info_antiga = None
+
+                if info_antiga is not None and info_antiga.file_size == stat.st_size:
+                    fila.append(("copiar", info, origem, info_antiga))
+                    membros[arcname] = meta
+                    contagem["reaproveitados"] += 1
+                    gravar(max_workers * 2)
+                    continue
+
+            # Comprime: CRC-32 e SHA-256 calculados aqui, na ordem dos blocos
+            fila.append(("inicio", info))
+            crc, sha = 0, hashlib.sha256()
+            dicionario = b""
+            with open(path, "rb") as f:
+                bloco = f.read(TAMANHO_BLOCO_ZIP)
+                while True:
+                    proximo = f.read(TAMANHO_BLOCO_ZIP) if len(bloco) == TAMANHO_BLOCO_ZIP else b""
+                    fila.append(("bloco", executor.submit(_comprimir_bloco, bloco, dicionario, nivel, not proximo)))
+                    blocos_na_fila += 1
+                    crc = zlib.crc32(bloco, crc)
+                    sha.update(bloco)
+                    dicionario = bloco[-JANELA_DEFLATE:]
+                    gravar(max_workers * 2)
+                    if not proximo:
+                        break
+                    bloco = proximo
+
+            fila.append(("fim", crc))
+            meta["sha256"] = sha.hexdigest()
+            membros[arcname] = meta
+            contagem["comprimidos"] += 1
+
+        gravar(-1)
+        escritor.fechar()
+
+    os.replace(temporario, output_zip)
+
+    ZIP_MANIFEST_DIR.mkdir(parents=True, exist_ok=True)
+    manifest_path.write_text(json.dumps({"nivel": nivel, "membros": membros}), encoding="utf-8")
+
+    return contagem